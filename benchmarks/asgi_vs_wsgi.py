@@ -0,0 +1,140 @@
+"""
+Load test the invoice print view under ASGI (uvicorn) and WSGI (gunicorn).
+
+Starts each server against the configured database, drives it with a pool of
+keep-alive HTTP connections and prints requests/second and latency
+percentiles for both as JSON. The ASGI server is started with
+ASYNC_READ_VIEWS=1, so it serves the async print view. The database must
+already be migrated and seeded:
+
+    python manage.py migrate && python manage.py seed_data
+    pip install uvicorn gunicorn
+    python benchmarks/asgi_vs_wsgi.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from common import PROJECT_ROOT, setup_django
+from run_benchmarks import percentiles
+
+SERVERS = {
+    "asgi": "uvicorn ecommerce_project.asgi:application --host 127.0.0.1 --port {port} --workers {workers} "
+            "--log-level warning --no-access-log",
+    "wsgi": "gunicorn ecommerce_project.wsgi:application --bind 127.0.0.1:{port} --workers {workers} "
+            "--threads {threads} --log-level warning",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+async def fetch(reader, writer, path):
+    """Send one keep-alive GET and read the full response. Returns the status code."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: keep-alive\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length, chunked = 0, False
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+        elif name.lower() == b"transfer-encoding" and b"chunked" in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status
+
+
+async def load(port, paths, total, concurrency):
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for i in remaining:
+                started = time.perf_counter()
+                status = await fetch(reader, writer, paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        **percentiles(latencies),
+    }
+
+
+def run_server(kind, args, paths):
+    port = free_port()
+    command = SERVERS[kind].format(port=port, workers=args.workers, threads=args.threads).split()
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT)}
+    if kind == "asgi":
+        env["ASYNC_READ_VIEWS"] = "1"
+    server = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env)
+    try:
+        wait_for_port(port)
+        asyncio.run(load(port, paths, min(200, args.requests), args.concurrency))  # Warm up
+        return asyncio.run(load(port, paths, args.requests, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker.")
+    parser.add_argument("--invoices", type=int, default=100, help="Spread requests over this many invoices.")
+    parser.add_argument("--servers", nargs="*", default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    setup_django()
+    from ecommerce_app.models import Invoice
+    ids = list(Invoice.objects.order_by("pk").values_list("pk", flat=True)[:args.invoices])
+    if not ids:
+        sys.exit("No invoices found; run manage.py seed_data first.")
+    paths = [f"/invoice/{pk}/print/" for pk in ids]
+
+    results = {kind: run_server(kind, args, paths) for kind in args.servers}
+    print(json.dumps({"concurrency": args.concurrency, "workers": args.workers, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark the admin XLSX invoice export against a large synthetic dataset.
+
+Creates a throwaway test database, seeds it with synthetic invoices, runs the
+export the same way ``InvoiceAdmin.export_xlsx`` does and prints peak memory
+and wall time as JSON. Run from the project root:
+
+    python benchmarks/bench_xlsx_export.py --invoices 200000
+"""
+import argparse
+import datetime
+import json
+import time
+import tracemalloc
+from decimal import Decimal
+
+from common import peak_rss_mb, setup_django, temporary_database
+
+
+def seed_invoices(count, batch_size=5000):
+    from ecommerce_app.models import Invoice
+
+    today = datetime.date.today()
+    for start in range(0, count, batch_size):
+        Invoice.objects.bulk_create(
+            Invoice(
+                customer_name=f"Customer {i % 5000}",
+                due_date=today + datetime.timedelta(days=i % 90 - 30),
+                status="paid" if i % 3 else "unpaid",
+                total=Decimal(i % 100000) / 100,
+                line_count=1 + i % 5,
+            )
+            for i in range(start, min(start + batch_size, count))
+        )
+
+
+def export(queryset):
+    from ecommerce_app.exports import invoices_xlsx_response
+
+    response = invoices_xlsx_response(queryset)
+    return sum(len(chunk) for chunk in response.streaming_content)
+
+
+def run(invoices):
+    from ecommerce_app.models import Invoice
+
+    with temporary_database():
+        seed_invoices(invoices)
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        size = export(Invoice.objects.all())
+        elapsed = time.perf_counter() - started
+        rss_after = peak_rss_mb()
+        # tracemalloc slows allocation-heavy code a lot, so measure it separately.
+        tracemalloc.start()
+        export(Invoice.objects.all())
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            "invoices": invoices,
+            "wall_time_s": round(elapsed, 3),
+            "file_size_mb": round(size / 1024 / 1024, 2),
+            "python_peak_mb": round(traced_peak / 1024 / 1024, 2),
+            "peak_rss_before_mb": round(rss_before, 1),
+            "peak_rss_after_mb": round(rss_after, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invoices", type=int, default=200000)
+    args = parser.parse_args()
+    setup_django()
+    print(json.dumps(run(args.invoices), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark the ecommerce_app hot paths and write the results as JSON.
+
+Seeds a throwaway database with ``manage.py seed_data``, then times each path
+(admin changelists, XLSX export, invoice printing, ``total_price()``,
+``overdue_and_above``) and records latency percentiles, SQL query count and
+peak Python memory. Compare the output files of two commits to spot
+regressions. Run from the project root:
+
+    python benchmarks/run_benchmarks.py --invoices 20000 --output bench.json
+"""
+import argparse
+import datetime
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from common import PROJECT_ROOT, peak_rss_mb, setup_django, temporary_database
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {
+        "min_ms": round(samples[0] * 1000, 3),
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p90_ms": round(quantiles[89] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def measure(func, repeat, warmup=1):
+    """Time ``func`` and record its query count and peak Python allocation."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        func()
+    # The log is a bounded deque; once full its length stops changing.
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    tracemalloc.start()
+    func()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {
+        "repeat": repeat,
+        **percentiles(timings),
+        "queries": len(queries),
+        "python_peak_kb": round(traced_peak / 1024, 1),
+    }
+
+
+def consume(response):
+    assert response.status_code == 200, response.status_code
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def build_paths():
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.test import Client
+    from ecommerce_app import jobs
+    from ecommerce_app.models import Invoice
+
+    client = Client()
+    client.force_login(User.objects.create_superuser("bench", "bench@example.com", "bench"))
+    invoice_pks = list(Invoice.objects.order_by("pk").values_list("pk", flat=True)[:100])
+    sample_pk = invoice_pks[len(invoice_pks) // 2]
+
+    def print_cold():
+        cache.clear()
+        consume(client.get(f"/invoice/{sample_pk}/print/"))
+
+    def export_xlsx_all():
+        # Selecting across all pages queues a job; time queueing it and running it to the end.
+        response = client.post("/admin/ecommerce_app/invoice/", {
+            "action": "export_xlsx", "select_across": "1", "index": "0", "_selected_action": [sample_pk],
+        })
+        assert response.status_code == 302, response.status_code
+        job = jobs.claim_next_job()
+        assert jobs.run_job(job), job.error
+        jobs.get_result_path(job).unlink()
+
+    def total_price_100():
+        for invoice in Invoice.objects.filter(pk__in=invoice_pks):
+            invoice.total_price()
+
+    return {
+        "admin_invoice_changelist": lambda: consume(client.get("/admin/ecommerce_app/invoice/")),
+        "admin_purchase_order_changelist": lambda: consume(client.get("/admin/ecommerce_app/purchaseorder/")),
+        "export_xlsx_all": export_xlsx_all,
+        "print_invoice_cold": print_cold,
+        "print_invoice_cached": lambda: consume(client.get(f"/invoice/{sample_pk}/print/")),
+        "total_price_100_invoices": total_price_100,
+        "overdue_and_above": lambda: list(Invoice.objects.overdue_and_above(100)),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    from django.core.management import call_command
+
+    with temporary_database():
+        started = time.perf_counter()
+        call_command(
+            "seed_data", products=args.products, purchase_orders=args.purchase_orders,
+            invoices=args.invoices, seed=args.seed, verbosity=0, stdout=io.StringIO(),
+        )
+        seed_seconds = time.perf_counter() - started
+        results = {}
+        for name, func in build_paths().items():
+            if args.only and name not in args.only:
+                continue
+            repeat = max(3, args.repeat // 10) if name == "export_xlsx_all" else args.repeat
+            results[name] = measure(func, repeat)
+            # Progress goes to stderr, so the JSON on stdout can be redirected to a file.
+            print(f"{name}: p50 {results[name]['p50_ms']}ms, {results[name]['queries']} queries", file=sys.stderr)
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "dataset": {
+            "products": args.products,
+            "purchase_orders": args.purchase_orders,
+            "invoices": args.invoices,
+            "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "paths": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--purchase-orders", type=int, default=2000)
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=30, help="Timed iterations per path.")
+    parser.add_argument("--only", nargs="*", help="Only run the named paths.")
+    parser.add_argument("--output", help="Write the JSON results here instead of standard output.")
+    args = parser.parse_args()
+    setup_django()
+    results = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,125 @@
-from django.contrib import admin
+import functools
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.utils.dateparse import parse_date
 from django.utils.html import format_html
 from django.utils.timezone import now
-from django.db.models import Sum, F
 from django.urls import path, reverse
 from django.utils.safestring import mark_safe
-from django.shortcuts import render
-from django.http import HttpResponse
-from openpyxl import Workbook
-from import_export.admin import ExportMixin
-from import_export.resources import ModelResource
-from .models import Product, PurchaseOrder, PurchaseOrderLineItem, Invoice, InvoiceLineItem
+from . import jobs, reports, search, views
+from .changelists import KeysetChangeListMixin
+from .exports import invoices_xlsx_response
+from .models import Job, Product, PurchaseOrder, PurchaseOrderLineItem, Invoice, InvoiceLineItem, StockLevel
 
 class PurchaseOrderLineItemInline(admin.TabularInline):
     model = PurchaseOrderLineItem
     extra = 1
+    autocomplete_fields = ['product']
 
 class InvoiceLineItemInline(admin.TabularInline):
     model = InvoiceLineItem
     extra = 1
+    autocomplete_fields = ['product']
 
-# Export Invoices to XLSX
-class InvoiceResource(ModelResource):
-    class Meta:
-        model = Invoice
+@functools.cache
+def export_admin_class(admin_class):
+    """``admin_class`` with import_export's ExportMixin, built on the first export."""
+    from import_export.admin import ExportMixin
+    return type(admin_class.__name__, (ExportMixin, admin_class), {})
+
+class LazyExportMixin:
+    """
+    Serves import_export's export page at ``export/`` and links to it from the
+    changelist, without importing import_export (and tablib and openpyxl with
+    it) until someone exports.
+    """
+    change_list_template = 'admin/ecommerce_app/change_list_export.html'
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view), name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        return export_admin_class(type(self))(self.model, self.admin_site).export_action(request)
+
+class TotalRangeFilter(admin.SimpleListFilter):
+    """Filters a changelist on its stored total by fixed price bands."""
+    title = "total"
+    parameter_name = "total_range"
+    total_field = "total"
+    ranges = (
+        ('0-100', "Under $100", 0, 100),
+        ('100-1000', "$100 to $1,000", 100, 1000),
+        ('1000-10000', "$1,000 to $10,000", 1000, 10000),
+        ('10000-', "$10,000 and above", 10000, None),
+    )
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, label, low, high in self.ranges]
+
+    def queryset(self, request, queryset):
+        for key, label, low, high in self.ranges:
+            if self.value() == key:
+                queryset = queryset.filter(**{f"{self.total_field}__gte": low})
+                if high is not None:
+                    queryset = queryset.filter(**{f"{self.total_field}__lt": high})
+                return queryset
+        return queryset
+
+class TokenSearchMixin:
+    """Runs the changelist search against the search token index instead of ``icontains`` scans."""
+    search_help_text = "Search by the start of any word, or by ID."
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.search(queryset, search_term), False
+
+class InvoiceTotalFilter(TotalRangeFilter):
+    title = "total price"
+
+class PurchaseOrderTotalFilter(TotalRangeFilter):
+    title = "total cost"
 
 @admin.register(PurchaseOrder)
-class PurchaseOrderAdmin(admin.ModelAdmin):
+class PurchaseOrderAdmin(TokenSearchMixin, KeysetChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'vendor', 'order_date', 'status', 'total_cost')
+    list_filter = ('status', PurchaseOrderTotalFilter)
+    keyset_date_field = 'order_date'
+    search_fields = ('vendor',)
     inlines = [PurchaseOrderLineItemInline]
 
     def total_cost(self, obj):
-        total = obj.line_items.aggregate(total=Sum('cost'))['total']
-        return f"${total:.2f}" if total else "$0.00"
+        return f"${obj.total:.2f}"
     
     total_cost.short_description = "Total Cost"
+    total_cost.admin_order_field = 'total'
 
 @admin.register(Invoice)
-class InvoiceAdmin(ExportMixin, admin.ModelAdmin):
-    resource_class = InvoiceResource
+class InvoiceAdmin(TokenSearchMixin, KeysetChangeListMixin, LazyExportMixin, admin.ModelAdmin):
     list_display = ('id', 'customer_name', 'invoice_date', 'due_date', 'status', 'total_price', 'overdue_highlight', 'print_link')
+    list_filter = ('status', InvoiceTotalFilter)
+    keyset_date_field = 'invoice_date'
+    search_fields = ('customer_name',)
     inlines = [InvoiceLineItemInline]
-    actions = ['mark_as_paid', 'export_xlsx']
+    actions = ['mark_as_paid', 'export_xlsx', 'print_selected']
 
     def total_price(self, obj):
-        total = obj.line_items.aggregate(total=Sum(F('quantity') * F('price_each')))['total']
-        return f"${total:.2f}" if total else "$0.00"
+        return f"${obj.total:.2f}"
 
     total_price.short_description = "Total Price"
+    total_price.admin_order_field = 'total'
 
     def mark_as_paid(self, request, queryset):
-        updated_count = queryset.update(status='paid')
+        if selected_across(request):
+            return self.enqueue_job(request, 'mark_invoices_paid', queryset)
+        updated_count = queryset.update(status='paid', updated_at=now())
         self.message_user(request, f"{updated_count} invoice(s) marked as Paid.")
     
     mark_as_paid.short_description = "Mark selected invoices as Paid"
@@ -63,48 +133,174 @@ class InvoiceAdmin(ExportMixin, admin.ModelAdmin):
 
 
     overdue_highlight.short_description = "Status"
+    overdue_highlight.admin_order_field = 'due_date'
 
     # Custom Invoice Printing
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path('<int:invoice_id>/print/', self.admin_site.admin_view(self.print_invoice), name='invoice-print'),
+            path('aging/', self.admin_site.admin_view(self.aging_report_view), name='invoice-aging'),
         ]
         return custom_urls + urls
 
     def print_invoice(self, request, invoice_id):
-        invoice = Invoice.objects.get(pk=invoice_id)
-        return render(request, 'ecommerce_app/invoice_print.html', {'invoice': invoice})
+        return views.print_invoice(request, invoice_id)
         
+    def aging_report_view(self, request):
+        try:
+            as_of = parse_date(request.GET.get('as_of', ''))
+        except ValueError:
+            as_of = None
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Accounts receivable aging",
+            'report': reports.aging_report(as_of),
+        }
+        return TemplateResponse(request, 'admin/ecommerce_app/invoice/aging_report.html', context)
+
     def print_link(self, obj):
          return mark_safe(f'<a href="{reverse("print_invoice", args=[obj.pk])}" target="_blank">Print</a>')
 
     print_link.allow_tags = True
     print_link.short_description = "Print Invoice"
 
+    def print_selected(self, request, queryset):
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:settings.INVOICE_PRINT_BATCH_MAX + 1])
+        if len(ids) > settings.INVOICE_PRINT_BATCH_MAX:
+            self.message_user(
+                request,
+                f"At most {settings.INVOICE_PRINT_BATCH_MAX} invoices can be printed at once.",
+                messages.ERROR,
+            )
+            return None
+        return HttpResponseRedirect(f"{reverse('print_invoice_batch')}?ids={','.join(map(str, ids))}")
+
+    print_selected.short_description = "Print selected invoices"
+
     # Export Invoices to XLSX
     def export_xlsx(self, request, queryset):
-        wb = Workbook()
-        ws = wb.active
-        ws.append(["Invoice ID", "Customer", "Invoice Date", "Due Date", "Status", "Total Price"])
-
-        for invoice in queryset:
-            ws.append([
-                invoice.id,
-                invoice.customer_name,
-                invoice.invoice_date,
-                invoice.due_date,
-                invoice.status,
-                invoice.total_price(),
-            ])
-
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = 'attachment; filename="invoices.xlsx"'
-        wb.save(response)
-        return response
+        if selected_across(request):
+            return self.enqueue_job(request, 'export_invoices_xlsx', queryset)
+        return invoices_xlsx_response(queryset)
 
     export_xlsx.short_description = "Export selected invoices to XLSX"
 
-admin.site.register(Product)
+    def enqueue_job(self, request, kind, queryset):
+        job = jobs.enqueue(kind, queryset, request.user)
+        self.message_user(request, f"{job} queued. This page shows its progress.")
+        return HttpResponseRedirect(reverse('admin:ecommerce_app_job_change', args=[job.pk]))
+
+def selected_across(request):
+    """Whether an admin action was applied to every page of the changelist, not just the ticked rows."""
+    return request.POST.get('select_across') == '1'
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress_display', 'created_by', 'created_at', 'finished_at', 'download_link')
+    list_filter = ('status', 'kind')
+    list_select_related = ('created_by',)
+    fields = readonly_fields = (
+        'kind', 'status', 'progress_display', 'download_link', 'created_by',
+        'created_at', 'started_at', 'heartbeat_at', 'finished_at', 'error',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress_display(self, obj):
+        return f"{obj.progress()}% ({obj.processed} of {obj.total})"
+
+    progress_display.short_description = "Progress"
+
+    def download_link(self, obj):
+        if not obj.result_file:
+            return "-"
+        return format_html('<a href="{}">{}</a>', reverse('admin:job-download', args=[obj.pk]), obj.result_file)
+
+    download_link.short_description = "Result"
+
+    def get_urls(self):
+        return [
+            path('<int:job_id>/download/', self.admin_site.admin_view(self.download_view), name='job-download'),
+        ] + super().get_urls()
+
+    def has_download_permission(self, request, job):
+        """Users may download the results of their own jobs; others' need the download_any_job permission."""
+        return job.created_by_id == request.user.pk or request.user.has_perm('ecommerce_app.download_any_job')
+
+    def download_view(self, request, job_id):
+        job = get_object_or_404(Job, pk=job_id)
+        if not self.has_download_permission(request, job):
+            raise PermissionDenied
+        result_path = jobs.get_result_path(job)
+        if result_path is None:
+            raise Http404("This job has no result file.")
+        return FileResponse(open(result_path, 'rb'), as_attachment=True, filename=job.result_file)
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('sku', 'name', 'unit_price')
+    ordering = ('sku',)
+    # Also backs the product autocomplete in the line item inlines.
+    search_fields = ('sku', 'name')
+    search_help_text = "Search by the start of the SKU, with or without its punctuation, or of any word of the name."
+
+    def get_search_results(self, request, queryset, search_term):
+        """Match products through the search index, serving repeated searches from the cache."""
+        if not search_term.strip():
+            return queryset, False
+        ids = search.cached_product_ids(search_term)
+        if ids is not None:
+            return queryset.filter(pk__in=ids), False
+        return search.search(queryset, search_term), False
+
+    def get_urls(self):
+        return [
+            path('margins/', self.admin_site.admin_view(self.margin_report_view), name='product-margins'),
+        ] + super().get_urls()
+
+    def margin_report_view(self, request):
+        try:
+            start = parse_date(request.GET.get('start', ''))
+            end = parse_date(request.GET.get('end', ''))
+        except ValueError:
+            start = end = None
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Product margins",
+            'report': reports.margin_report(start, end),
+        }
+        return TemplateResponse(request, 'admin/ecommerce_app/product/margin_report.html', context)
+
+class LowStockFilter(admin.SimpleListFilter):
+    title = "stock"
+    parameter_name = "stock"
+
+    def lookups(self, request, model_admin):
+        return [('low', f"Low (at most {settings.LOW_STOCK_THRESHOLD})")]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'low':
+            return queryset.filter(on_hand__lte=settings.LOW_STOCK_THRESHOLD)
+        return queryset
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    """Stock on hand, maintained from the stock movement ledger; see inventory.py."""
+    list_display = ('product', 'on_hand', 'updated_at')
+    list_filter = (LowStockFilter,)
+    list_select_related = ('product',)
+    ordering = ('on_hand', 'product')
+    fields = readonly_fields = ('product', 'on_hand', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
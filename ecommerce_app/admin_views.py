@@ -0,0 +1,93 @@
+import datetime
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils.dateparse import parse_date
+from . import profiling
+from .models import (
+    ArchivedDailyProductSales, ArchivedDailyVendorSpend, DailyProductSales, DailyVendorSpend, RollupState,
+)
+from .rollups import merge_rows
+from .middleware import slow_requests as slow_request_log
+
+
+def slow_requests(request):
+    """List the slowest recent requests recorded by RequestInstrumentationMiddleware."""
+    if request.method == 'POST':
+        slow_request_log.clear()
+        return redirect('slow_requests')
+    context = {
+        **admin.site.each_context(request),
+        'title': "Slow requests",
+        'entries': slow_request_log.slowest(),
+    }
+    return TemplateResponse(request, 'admin/slow_requests.html', context)
+
+
+def profiles(request):
+    """List the profiles captured by ProfilingMiddleware and profile_command."""
+    context = {
+        **admin.site.each_context(request),
+        'title': "Captured profiles",
+        'profiles': [
+            {'name': path.name, 'size_kb': round(path.stat().st_size / 1024, 1), 'modified': datetime.datetime.fromtimestamp(path.stat().st_mtime)}
+            for path in profiling.list_profiles()
+        ],
+    }
+    return TemplateResponse(request, 'admin/profiles.html', context)
+
+
+def profile_detail(request, name):
+    """Show a profile's top functions by cumulative time, or download it with ?download=1."""
+    path = profiling.get_profile(name)
+    if path is None:
+        raise Http404("No such profile.")
+    if 'download' in request.GET:
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+    sort = request.GET.get('sort') if request.GET.get('sort') in ('cumulative', 'tottime', 'calls') else 'cumulative'
+    context = {
+        **admin.site.each_context(request),
+        'title': name,
+        'sort': sort,
+        'stats': profiling.top_functions(path, limit=60, sort=sort),
+    }
+    return TemplateResponse(request, 'admin/profile_detail.html', context)
+
+
+def sales_dashboard(request):
+    """Revenue by product and day, and spend by vendor, for ``?start=``/``?end=`` (default: last 30 days).
+
+    Reads only the daily rollups, so its cost depends on the number of days and
+    products in the period, not on the number of line items. Archived orders
+    are added in from their own rollups.
+    """
+    end = parse_date(request.GET.get('end') or '') or datetime.date.today()
+    start = parse_date(request.GET.get('start') or '') or end - datetime.timedelta(days=29)
+    daily = merge_rows(
+        ['date'], DailyProductSales.objects.by_day(start, end), ArchivedDailyProductSales.objects.by_day(start, end)
+    )
+    daily.sort(key=lambda day: day['date'])
+    products = merge_rows(
+        ['product_id'],
+        DailyProductSales.objects.by_product(start, end),
+        ArchivedDailyProductSales.objects.by_product(start, end),
+    )
+    products.sort(key=lambda product: (-product['revenue'], product['product_id']))
+    vendors = merge_rows(
+        ['vendor'], DailyVendorSpend.objects.by_vendor(start, end), ArchivedDailyVendorSpend.objects.by_vendor(start, end)
+    )
+    vendors.sort(key=lambda vendor: (-vendor['spend'], vendor['vendor']))
+    context = {
+        **admin.site.each_context(request),
+        'title': "Sales and purchasing",
+        'start': start,
+        'end': end,
+        'daily': daily,
+        'revenue': sum(day['revenue'] for day in daily),
+        'units': sum(day['units'] for day in daily),
+        'top_products': products[:20],
+        'vendors': vendors,
+        'refreshed': dict(RollupState.objects.values_list('name', 'watermark')),
+    }
+    return TemplateResponse(request, 'admin/sales_dashboard.html', context)
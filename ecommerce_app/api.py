@@ -0,0 +1,89 @@
+from django.db.models import F
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from .bulk import bulk_create_orders
+from .models import Invoice, InvoiceLineItem, Product, PurchaseOrder, PurchaseOrderLineItem
+from .serializers import (
+    InvoiceLineItemSerializer, InvoiceSerializer, NewInvoiceSerializer, ProductSerializer,
+    PurchaseOrderLineItemSerializer, PurchaseOrderSerializer, requested_fields,
+)
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination on the primary key: no COUNT and no OFFSET, whatever the page."""
+    ordering = 'pk'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
+
+
+class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+    """Orders with their line items embedded; ``?status=`` filters, ``?fields=`` trims the output."""
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        fields = requested_fields(self.request)
+        if fields is None or 'line_items' in fields:
+            queryset = self.model.objects.with_line_items()
+        else:
+            queryset = self.model.objects.all()
+        if self.request.query_params.get('status'):
+            queryset = queryset.filter(status=self.request.query_params['status'])
+        return queryset
+
+
+class InvoiceViewSet(OrderViewSet):
+    model = Invoice
+    serializer_class = InvoiceSerializer
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create a list of invoices with their line items.
+
+        Runs a fixed number of statements however many invoices are sent: one
+        query to check the products, then one batched insert each for the
+        invoices, their line items and their search tokens.
+        """
+        serializer = NewInvoiceSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        product_ids = {line['product'] for invoice in serializer.validated_data for line in invoice['line_items']}
+        unknown = product_ids - set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        if unknown:
+            raise ValidationError({'line_items': f"Unknown product IDs: {sorted(unknown)}"})
+
+        orders = []
+        for data in serializer.validated_data:
+            line_items = [
+                InvoiceLineItem(product_id=line['product'], quantity=line['quantity'], price_each=line['price_each'])
+                for line in data.pop('line_items')
+            ]
+            orders.append((Invoice(**data), line_items))
+        invoices = bulk_create_orders('invoice', orders)
+        return Response({'created': [invoice.pk for invoice in invoices]}, status=status.HTTP_201_CREATED)
+
+
+class PurchaseOrderViewSet(OrderViewSet):
+    model = PurchaseOrder
+    serializer_class = PurchaseOrderSerializer
+
+
+class InvoiceLineItemViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = InvoiceLineItem.objects.select_related('product').annotate(line_total=F('quantity') * F('price_each'))
+    serializer_class = InvoiceLineItemSerializer
+    pagination_class = KeysetPagination
+
+
+class PurchaseOrderLineItemViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = PurchaseOrderLineItem.objects.select_related('product')
+    serializer_class = PurchaseOrderLineItemSerializer
+    pagination_class = KeysetPagination
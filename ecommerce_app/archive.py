@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import (
+    ArchivedInvoice, ArchivedInvoiceLineItem, ArchivedPurchaseOrder, ArchivedPurchaseOrderLineItem, Invoice,
+    InvoiceLineItem, PurchaseOrder, PurchaseOrderLineItem, RollupDirtyDate,
+)
+from .rollups import rollup_for_parent
+from .search import unindex_objects
+from .signals import suppress_order_signals
+
+# What archive_orders moves: the live order and line item models, the line
+# item's foreign key, the order date that decides an order's age, the
+# statuses after which an order no longer changes, and the archive models.
+ARCHIVES = {
+    'invoices': {
+        'parent': Invoice,
+        'line_model': InvoiceLineItem,
+        'fk': 'invoice',
+        'date_field': 'invoice_date',
+        'statuses': ('paid',),
+        'archive': ArchivedInvoice,
+        'archive_line': ArchivedInvoiceLineItem,
+    },
+    'purchase_orders': {
+        'parent': PurchaseOrder,
+        'line_model': PurchaseOrderLineItem,
+        'fk': 'purchase_order',
+        'date_field': 'order_date',
+        'statuses': ('completed', 'canceled'),
+        'archive': ArchivedPurchaseOrder,
+        'archive_line': ArchivedPurchaseOrderLineItem,
+    },
+}
+
+
+def archivable(name, cutoff):
+    """Live orders of kind ``name`` that are settled and dated before ``cutoff``."""
+    spec = ARCHIVES[name]
+    return spec['parent'].objects.filter(
+        status__in=spec['statuses'], **{f"{spec['date_field']}__lt": cutoff}
+    )
+
+
+def archive_batch(name, cutoff, batch_size):
+    """
+    Move up to ``batch_size`` archivable orders and their line items to the
+    archive tables in one transaction. Returns ``(orders, line items)`` moved.
+
+    The orders are locked first, so none can be edited or gain line items
+    while they are copied. Deleting them skips the per-row delete receivers;
+    their search tokens and rollup dates are handled here in bulk instead.
+    """
+    spec = ARCHIVES[name]
+    parent, line_model, fk = spec['parent'], spec['line_model'], spec['fk']
+    with transaction.atomic():
+        pks = list(
+            archivable(name, cutoff).order_by('pk').select_for_update().values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return 0, 0
+        archived_at = timezone.now()
+        parent_fields = [field.attname for field in parent._meta.concrete_fields]
+        line_fields = [field.attname for field in line_model._meta.concrete_fields]
+        orders = list(parent.objects.filter(pk__in=pks).values(*parent_fields))
+        lines = list(line_model.objects.filter(**{f'{fk}__in': pks}).values(*line_fields))
+        spec['archive'].objects.bulk_create(
+            [spec['archive'](**order, archived_at=archived_at) for order in orders], batch_size=batch_size
+        )
+        spec['archive_line'].objects.bulk_create([spec['archive_line'](**line) for line in lines], batch_size=batch_size)
+
+        with suppress_order_signals():
+            line_model.objects.filter(**{f'{fk}__in': pks}).delete()
+            parent.objects.filter(pk__in=pks).delete()
+        unindex_objects(parent, pks)
+        # The live rollup must drop these days' archived orders, which its watermark cannot see.
+        rollup = rollup_for_parent(parent)
+        dates = {order[spec['date_field']] for order in orders}
+        RollupDirtyDate.objects.bulk_create(
+            [RollupDirtyDate(name=rollup, date=date) for date in dates], ignore_conflicts=True
+        )
+    return len(orders), len(lines)
+
+
+def archive_orders(name, cutoff, batch_size):
+    """Archive every archivable order of kind ``name``, a batch per transaction. Returns the totals moved."""
+    orders = lines = 0
+    while True:
+        moved_orders, moved_lines = archive_batch(name, cutoff, batch_size)
+        if not moved_orders:
+            return orders, lines
+        orders += moved_orders
+        lines += moved_lines
@@ -0,0 +1,42 @@
+from django.db import transaction
+from . import inventory
+from .models import Invoice, InvoiceLineItem, PurchaseOrder, PurchaseOrderLineItem
+from .search import index_objects
+
+# How each kind of order is written: parent model, line item model, and the
+# line item's foreign key to its parent.
+ORDER_MODELS = {
+    'invoice': (Invoice, InvoiceLineItem, 'invoice'),
+    'purchase_order': (PurchaseOrder, PurchaseOrderLineItem, 'purchase_order'),
+}
+
+
+def bulk_create_orders(kind, orders, batch_size=1000):
+    """
+    Insert ``orders`` of the given kind with a fixed number of statements.
+
+    ``orders`` is a list of ``(parent, line_items)`` pairs of unsaved instances.
+    The parents' stored ``total``/``line_count`` are computed here, since
+    ``bulk_create`` skips the bookkeeping done by ``ParentTotalsMixin.save``
+    and the search indexing and stock movements done by signals. Everything
+    is written in one transaction. Returns the saved parents.
+    """
+    parent_model, line_model, fk = ORDER_MODELS[kind]
+    for parent, line_items in orders:
+        parent.total = sum((line.amount() for line in line_items), 0)
+        parent.line_count = len(line_items)
+    with transaction.atomic():
+        parents = parent_model.objects.bulk_create([parent for parent, line_items in orders], batch_size=batch_size)
+        lines = []
+        for parent, line_items in orders:
+            for line in line_items:
+                setattr(line, f'{fk}_id', parent.pk)
+                lines.append(line)
+        line_model.objects.bulk_create(lines, batch_size=batch_size)
+        index_objects(parent_model, parents, replace=False)
+        if kind == 'invoice':
+            inventory.record_movements(inventory.sale_movements(lines), batch_size=batch_size)
+        else:
+            received = [line for parent, line_items in orders if parent.status == 'completed' for line in line_items]
+            inventory.record_movements(inventory.receipt_movements(received), batch_size=batch_size)
+    return parents
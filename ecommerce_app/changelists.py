@@ -0,0 +1,163 @@
+import hashlib
+from django.conf import settings
+from django.contrib.admin import ShowFacets
+from django.contrib.admin.options import IS_FACETS_VAR, IS_POPUP_VAR, TO_FIELD_VAR, IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+# Parameters that change which page is shown but not which rows match.
+NOT_FILTERS = (ALL_VAR, ORDER_VAR, AFTER_VAR, BEFORE_VAR, IS_FACETS_VAR, IS_POPUP_VAR, TO_FIELD_VAR)
+
+
+class CountAtLeast(int):
+    """A row count that stopped at the cap, shown as e.g. "10000+"."""
+
+    def __str__(self):
+        return f"{int(self)}+"
+
+
+def capped_count(queryset, cap):
+    """Count the rows of ``queryset``, reading at most ``cap + 1`` of them."""
+    count = queryset.order_by()[:cap + 1].count()
+    return CountAtLeast(cap) if count > cap else count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    A changelist that never counts the whole table.
+
+    With the admin's default ``(date, id)`` ordering, pages are found by
+    keyset: ``?after=`` and ``?before=`` carry the date and ID of the row at
+    the page edge, so a deep page is read from the index like the first one.
+    Any other ordering falls back to ``?p=`` offsets, still without a count.
+    Each page costs one query for its primary keys and one for its rows.
+    The "N invoices" total is counted up to ``ADMIN_CHANGELIST_COUNT_CAP``
+    and cached per filter combination.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for param in (AFTER_VAR, BEFORE_VAR):
+            lookup_params.pop(param, None)
+        return lookup_params
+
+    def get_results(self, request):
+        per_page = self.list_per_page
+        result_count = self.get_result_count()
+        can_show_all = result_count <= self.list_max_show_all
+        self.previous_url = self.next_url = None
+
+        if self.show_all and can_show_all:
+            result_list = self.queryset._clone()
+        else:
+            date_field = self.model_admin.keyset_date_field
+            # The ModelAdmin queryset is already ordered, so the changelist
+            # repeats those fields when it applies its own ordering.
+            ordering = list(dict.fromkeys(self.queryset.query.order_by))
+            if ordering == [f'-{date_field}', '-pk']:
+                keys = self.get_keyset_page(request, date_field, per_page)
+            else:
+                keys = self.get_offset_page(per_page)
+            result_list = self.queryset.filter(pk__in=[pk for date, pk in keys])
+
+        paged = self.previous_url or self.next_url
+        self.show_all_url = (
+            can_show_all and not self.show_all and paged
+            and self.get_query_string({ALL_VAR: ''}, [AFTER_VAR, BEFORE_VAR])
+        )
+        self.result_count = result_count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        # The admin's numbered pagination needs a full count, so it is never
+        # shown; the app's pagination.html links to the previous and next pages.
+        self.multi_page = False
+        self.paginator = None
+
+    def get_result_count(self):
+        params = sorted((key, value) for key, value in self.filter_params.items() if key not in NOT_FILTERS)
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()
+        cache_key = f"admin-count:{self.opts.label_lower}:{digest}"
+        count = cache.get(cache_key)
+        if count is None:
+            count = capped_count(self.queryset, settings.ADMIN_CHANGELIST_COUNT_CAP)
+            cache.set(cache_key, count, settings.ADMIN_CHANGELIST_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_keyset_page(self, request, date_field, per_page):
+        """Return the ``(date, pk)`` keys of the page at the ``after``/``before`` cursor."""
+        after = self.parse_cursor(request.GET.get(AFTER_VAR))
+        before = self.parse_cursor(request.GET.get(BEFORE_VAR))
+        keys = self.queryset.values_list(date_field, 'pk')
+        if before:
+            date, pk = before
+            keys = keys.filter(Q(**{f'{date_field}__gte': date}) & (Q(**{f'{date_field}__gt': date}) | Q(pk__gt=pk)))
+            keys = list(keys.order_by(date_field, 'pk')[:per_page + 1])
+            has_previous, has_next = len(keys) > per_page, True
+            keys = keys[:per_page][::-1]
+        else:
+            if after:
+                date, pk = after
+                keys = keys.filter(Q(**{f'{date_field}__lte': date}) & (Q(**{f'{date_field}__lt': date}) | Q(pk__lt=pk)))
+            keys = list(keys[:per_page + 1])
+            has_previous, has_next = bool(after), len(keys) > per_page
+            keys = keys[:per_page]
+        if keys and has_previous:
+            self.previous_url = self.get_query_string({BEFORE_VAR: self.format_cursor(keys[0]), AFTER_VAR: None})
+        if keys and has_next:
+            self.next_url = self.get_query_string({AFTER_VAR: self.format_cursor(keys[-1]), BEFORE_VAR: None})
+        return keys
+
+    def get_offset_page(self, per_page):
+        """Return the ``(None, pk)`` keys of page ``?p=`` under a non-default ordering."""
+        if self.page_num < 1:
+            raise IncorrectLookupParameters
+        offset = (self.page_num - 1) * per_page
+        keys = [(None, pk) for pk in self.queryset.values_list('pk', flat=True)[offset:offset + per_page + 1]]
+        if self.page_num > 1:
+            self.previous_url = self.get_query_string({PAGE_VAR: self.page_num - 1})
+        if len(keys) > per_page:
+            self.next_url = self.get_query_string({PAGE_VAR: self.page_num + 1})
+        return keys[:per_page]
+
+    @staticmethod
+    def parse_cursor(value):
+        if not value:
+            return None
+        date, _, pk = value.partition(',')
+        try:
+            date, pk = parse_date(date), int(pk)
+        except ValueError:
+            raise IncorrectLookupParameters
+        if date is None:
+            raise IncorrectLookupParameters
+        return date, pk
+
+    @staticmethod
+    def format_cursor(key):
+        date, pk = key
+        return f"{date.isoformat()},{pk}"
+
+
+class KeysetChangeListMixin:
+    """
+    ModelAdmin mixin for changelists over large tables, ordered newest first
+    by ``keyset_date_field`` and paginated by ``KeysetChangeList``.
+    """
+    keyset_date_field = None
+    show_full_result_count = False
+    # Facet counts run a COUNT per filter choice.
+    show_facets = ShowFacets.NEVER
+
+    def get_ordering(self, request):
+        return (f'-{self.keyset_date_field}', '-pk')
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,246 @@
+import hashlib
+import os
+import tempfile
+import time
+from django.http import FileResponse
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+INVOICE_EXPORT_HEADER = ["Invoice ID", "Customer", "Invoice Date", "Due Date", "Status", "Total Price"]
+INVOICE_EXPORT_FIELDS = ("id", "customer_name", "invoice_date", "due_date", "status", "total")
+
+# Exports below this size stay in memory; larger ones roll over to a temp file.
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def write_invoices_xlsx(queryset, fileobj, chunk_size=2000, progress=None):
+    """
+    Write the invoices in ``queryset`` to ``fileobj`` as an XLSX workbook.
+
+    Uses openpyxl's write-only mode, which flushes rows to disk as they are
+    appended, and reads the queryset in chunks so memory use does not grow
+    with the number of invoices. If given, ``progress`` is called with the
+    number of rows written after each chunk. Returns the number of rows written.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Invoices")
+    ws.append(INVOICE_EXPORT_HEADER)
+    count = 0
+    rows = queryset.order_by("pk").values_list(*INVOICE_EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        ws.append(row)
+        count += 1
+        if progress and count % chunk_size == 0:
+            progress(count)
+    wb.save(fileobj)
+    return count
+
+
+def spooled_file_response(write, filename, content_type):
+    """Run ``write(fileobj)`` into a spooled temp file and stream it back as an attachment."""
+    fileobj = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    write(fileobj)
+    fileobj.seek(0)
+    return FileResponse(fileobj, as_attachment=True, filename=filename, content_type=content_type)
+
+
+def invoices_xlsx_response(queryset, filename="invoices.xlsx"):
+    """Return a streaming response with the invoices in ``queryset`` as XLSX."""
+    return spooled_file_response(
+        lambda fileobj: write_invoices_xlsx(queryset, fileobj),
+        filename,
+        XLSX_CONTENT_TYPE,
+    )
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+# Header and line item columns for the streaming CSV/NDJSON exports. The
+# archive model has the same columns, and its line items the same ones too.
+STREAM_EXPORTS = {
+    "invoices": {
+        "model": "Invoice",
+        "archive_model": "ArchivedInvoice",
+        "fk": "invoice",
+        "date_field": "invoice_date",
+        "fields": ("id", "customer_name", "invoice_date", "due_date", "status", "total", "line_count"),
+        "line_fields": ("id", "product_id", "product__sku", "product__name", "quantity", "price_each"),
+    },
+    "purchase-orders": {
+        "model": "PurchaseOrder",
+        "archive_model": "ArchivedPurchaseOrder",
+        "fk": "purchase_order",
+        "date_field": "order_date",
+        "fields": ("id", "vendor", "order_date", "status", "total", "line_count"),
+        "line_fields": ("id", "product_id", "product__sku", "product__name", "quantity", "cost"),
+    },
+}
+
+
+def export_querysets(spec, include_archived=True, **filters):
+    """The live orders of an export matching ``filters``, then the archived ones if included."""
+    from django.apps import apps
+
+    models = [spec["model"], spec["archive_model"]] if include_archived else [spec["model"]]
+    return [apps.get_model("ecommerce_app", model).objects.filter(**filters) for model in models]
+
+
+def iter_keyset(queryset, fields, chunk_size=1000):
+    """
+    Yield lists of ``values()`` dicts from ``queryset`` in primary key order.
+
+    Each chunk is fetched with ``pk > last_pk`` rather than OFFSET, so the cost
+    of a chunk does not depend on how far into the table it is.
+    """
+    queryset = queryset.order_by("pk").values(*fields)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]["id"]
+
+
+def line_total(spec):
+    """The amount a line item adds to its parent's total, as an expression for ``annotate()``."""
+    from django.db.models import F
+
+    return F("quantity") * F("price_each") if "price_each" in spec["line_fields"] else F("cost")
+
+
+def iter_with_line_items(spec, queryset, chunk_size=1000, line_totals=False):
+    """
+    Yield ``(parent, line_items)`` pairs, loading line items with one query per chunk.
+
+    With ``line_totals``, each line item also has its ``line_total``, computed by the database.
+    """
+    line_model = queryset.model._meta.get_field("line_items").related_model
+    fk_attname = f"{spec['fk']}_id"
+    line_fields = line_field_names(spec, line_totals)
+    for chunk in iter_keyset(queryset, spec["fields"], chunk_size):
+        lines = {}
+        line_rows = line_model.objects.filter(**{f"{fk_attname}__in": [row["id"] for row in chunk]})
+        if line_totals:
+            line_rows = line_rows.annotate(line_total=line_total(spec))
+        for line in line_rows.order_by(fk_attname, "pk").values(fk_attname, *line_fields):
+            lines.setdefault(line.pop(fk_attname), []).append(line)
+        for row in chunk:
+            yield row, lines.get(row["id"], [])
+
+
+def line_field_names(spec, line_totals=False):
+    """The line item columns of an export, with ``line_total`` last when it is included."""
+    return (*spec["line_fields"], "line_total") if line_totals else spec["line_fields"]
+
+
+def iter_flat_rows(spec, querysets, chunk_size=1000, line_totals=False):
+    """
+    Yield a header, then one list per line item of the orders in each of
+    ``querysets`` with the parent columns repeated; parents without line
+    items get one row of their own.
+    """
+    line_fields = line_field_names(spec, line_totals)
+    yield list(spec["fields"]) + [f"line_{field.replace('__', '_')}" for field in line_fields]
+    for queryset in querysets:
+        for parent, lines in iter_with_line_items(spec, queryset, chunk_size, line_totals):
+            head = [parent[field] for field in spec["fields"]]
+            if not lines:
+                yield head
+            for line in lines:
+                yield head + [line[field] for field in line_fields]
+
+
+def stream_csv(spec, querysets, chunk_size=1000):
+    """Yield CSV lines with one row per line item, repeating the parent columns."""
+    import csv
+
+    writer = csv.writer(Echo())
+    for row in iter_flat_rows(spec, querysets, chunk_size):
+        yield writer.writerow(row)
+
+
+def stream_ndjson(spec, querysets, chunk_size=1000):
+    """Yield one JSON document per parent, with its line items nested."""
+    import json
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    encoder = DjangoJSONEncoder()
+    for queryset in querysets:
+        for parent, lines in iter_with_line_items(spec, queryset, chunk_size):
+            parent["line_items"] = lines
+            yield encoder.encode(parent) + "\n"
+
+
+STREAM_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fileobj:
+        for block in iter(lambda: fileobj.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_shard(shard, chunk_size=2000):
+    """
+    Export one shard planned by the ``export_shards`` command to its file.
+
+    ``shard`` is a dict with the export ``kind`` (a STREAM_EXPORTS key), the
+    ``model`` (live or archived orders), the ``filters`` selecting its
+    orders, the ``format`` (csv or xlsx) and the output ``path``. Rows are read in keyset chunks, with line totals computed
+    by the database. Returns the shard's manifest entry.
+    """
+    import csv
+    from django.apps import apps
+
+    started = time.monotonic()
+    spec = STREAM_EXPORTS[shard["kind"]]
+    queryset = apps.get_model("ecommerce_app", shard["model"]).objects.filter(**shard["filters"])
+    rows = iter_flat_rows(spec, [queryset], chunk_size, line_totals=True)
+    count = -1  # Not counting the header
+    if shard["format"] == "xlsx":
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(shard["kind"])
+        for row in rows:
+            ws.append(row)
+            count += 1
+        wb.save(shard["path"])
+    else:
+        with open(shard["path"], "w", newline="") as fileobj:
+            writer = csv.writer(fileobj)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    return {
+        "file": os.path.basename(shard["path"]),
+        "kind": shard["kind"],
+        "model": shard["model"],
+        "filters": {lookup: str(value) for lookup, value in shard["filters"].items()},
+        "rows": count,
+        "orders": queryset.count(),
+        "bytes": os.path.getsize(shard["path"]),
+        "sha256": file_sha256(shard["path"]),
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def setup_worker():
+    """Process pool initializer: a spawned worker sets Django up and opens its own connections."""
+    import django
+
+    django.setup()
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.utils import timezone
+from .models import InvoiceLineItem, PurchaseOrder, PurchaseOrderLineItem, StockLevel, StockMovement
+
+# Stock levels locked and updated per statement.
+LEVEL_CHUNK_SIZE = 500
+
+# The StockMovement.source_type of each kind of line item.
+SOURCE_TYPES = {InvoiceLineItem: 'invoice_line', PurchaseOrderLineItem: 'purchase_order_line'}
+
+
+def receipt_movements(line_items):
+    """Unsaved ledger entries adding the units of saved purchase order line items."""
+    return [
+        StockMovement(
+            product_id=line.product_id, kind='receipt', quantity=line.quantity, source_id=line.pk,
+            source_type='purchase_order_line',
+        )
+        for line in line_items
+    ]
+
+
+def sale_movements(line_items):
+    """Unsaved ledger entries removing the units of saved invoice line items."""
+    return [
+        StockMovement(
+            product_id=line.product_id, kind='sale', quantity=-line.quantity, source_id=line.pk,
+            source_type='invoice_line',
+        )
+        for line in line_items
+    ]
+
+
+def adjustment_movements(line, old, new):
+    """
+    Unsaved adjustments moving a line item's effect on stock from ``old`` to
+    ``new``, each a ``(product_id, quantity)`` pair or None (not in stock).
+    """
+    # Invoice lines take units out of stock, purchase order lines put them in.
+    sign = -1 if isinstance(line, InvoiceLineItem) else 1
+    deltas = defaultdict(int)
+    if old:
+        deltas[old[0]] -= sign * old[1]
+    if new:
+        deltas[new[0]] += sign * new[1]
+    return [
+        StockMovement(
+            product_id=product_id, kind='adjustment', quantity=units, source_id=line.pk,
+            source_type=SOURCE_TYPES[type(line)],
+        )
+        for product_id, units in deltas.items() if units
+    ]
+
+
+def in_stock(line):
+    """
+    Whether a line item's units are counted in the stock levels: it was sold,
+    or it was received and its purchase order is still completed.
+    """
+    if isinstance(line, InvoiceLineItem):
+        kind = 'sale'
+    elif PurchaseOrder.objects.filter(pk=line.purchase_order_id, status='completed').exists():
+        kind = 'receipt'
+    else:
+        return False
+    return StockMovement.objects.filter(kind=kind, source_id=line.pk).exists()
+
+
+def record_movements(movements, batch_size=1000):
+    """
+    Append ``movements`` to the ledger and apply them to the stock levels,
+    in one transaction. Returns the saved movements.
+    """
+    if not movements:
+        return []
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.product_id] += movement.quantity
+    with transaction.atomic():
+        movements = StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+        apply_to_levels(deltas)
+    return movements
+
+
+def apply_to_levels(deltas):
+    """
+    Add ``{product_id: units}`` to the stock levels, creating missing rows.
+
+    Rows are locked in product order before the ``F()`` update, so
+    concurrent orders touching the same products queue up instead of
+    deadlocking. Each chunk of products costs three statements.
+    """
+    product_ids = sorted(product_id for product_id, units in deltas.items() if units)
+    updated_at = timezone.now()
+    for i in range(0, len(product_ids), LEVEL_CHUNK_SIZE):
+        chunk = product_ids[i:i + LEVEL_CHUNK_SIZE]
+        locked = set(
+            StockLevel.objects.select_for_update().filter(product_id__in=chunk)
+            .order_by('product_id').values_list('product_id', flat=True)
+        )
+        missing = [StockLevel(product_id=product_id) for product_id in chunk if product_id not in locked]
+        if missing:
+            StockLevel.objects.bulk_create(missing, ignore_conflicts=True)
+        StockLevel.objects.filter(product_id__in=chunk).update(
+            on_hand=F('on_hand') + Case(
+                *[When(product_id=product_id, then=Value(deltas[product_id])) for product_id in chunk], default=Value(0)
+            ),
+            updated_at=updated_at,
+        )
+
+
+def receive_purchase_order(order_id):
+    """
+    Put the line items of a purchase order that became completed into stock.
+    Lines not in the ledger yet get receipts; lines received before the order
+    was reopened come back as adjustments. Returns the movements.
+    """
+    lines = list(PurchaseOrderLineItem.objects.filter(purchase_order_id=order_id).order_by('pk'))
+    received = set(
+        StockMovement.objects.filter(kind='receipt', source_id__in=[line.pk for line in lines])
+        .values_list('source_id', flat=True)
+    )
+    movements = receipt_movements([line for line in lines if line.pk not in received])
+    for line in lines:
+        if line.pk in received:
+            movements += adjustment_movements(line, None, (line.product_id, line.quantity))
+    return record_movements(movements)
+
+
+def reopen_purchase_order(order_id):
+    """Take the received line items of a purchase order that is no longer completed back out of stock."""
+    lines = PurchaseOrderLineItem.objects.filter(
+        Exists(StockMovement.objects.filter(kind='receipt', source_id=OuterRef('pk'))), purchase_order_id=order_id
+    )
+    movements = []
+    for line in lines.order_by('pk'):
+        movements += adjustment_movements(line, (line.product_id, line.quantity), None)
+    return record_movements(movements)
@@ -0,0 +1,130 @@
+import datetime
+import pickle
+import traceback
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .exports import write_invoices_xlsx
+from .models import Invoice, Job
+
+
+def enqueue(kind, queryset, user=None):
+    """Queue a job of the given kind over the rows of ``queryset``."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, query=pickle.dumps(queryset.query), created_by=user)
+
+
+def job_queryset(job, model):
+    """Rebuild the queryset a job was queued with."""
+    queryset = model.objects.all()
+    queryset.query = pickle.loads(job.query)
+    return queryset
+
+
+def fail_stale_jobs():
+    """
+    Mark running jobs whose worker has not reported progress for
+    ``JOBS_STALE_AFTER`` seconds as failed, e.g. after the worker was killed.
+    Returns the number of jobs failed.
+    """
+    now = timezone.now()
+    return Job.objects.filter(
+        status='running', heartbeat_at__lt=now - datetime.timedelta(seconds=settings.JOBS_STALE_AFTER),
+    ).update(
+        status='failed', finished_at=now,
+        error=f"The worker stopped reporting progress for over {settings.JOBS_STALE_AFTER} seconds.",
+    )
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running and return it, or None if none are queued.
+
+    The claim is an UPDATE that only matches while the job is still queued, so
+    two workers never run the same job, on any database backend. Stale jobs
+    are failed first.
+    """
+    fail_stale_jobs()
+    for pk in Job.objects.filter(status='queued').order_by('pk').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status='queued').update(status='running', started_at=now, heartbeat_at=now):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job to completion, recording its outcome. Returns True on success."""
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception:
+        job.status, job.error = 'failed', traceback.format_exc()
+    else:
+        job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'processed', 'total', 'result_file'])
+    return job.status == 'done'
+
+
+def report_progress(job, processed):
+    """Record progress, which also shows that the job's worker is still alive."""
+    job.processed = processed
+    Job.objects.filter(pk=job.pk).update(processed=processed, heartbeat_at=timezone.now())
+
+
+def start(job, queryset):
+    job.total = queryset.count()
+    Job.objects.filter(pk=job.pk).update(total=job.total, heartbeat_at=timezone.now())
+
+
+def mark_invoices_paid(job):
+    """
+    Mark the job's invoices as paid, ``JOBS_CHUNK_SIZE`` at a time.
+
+    Each chunk is its own short transaction, so a large update never holds
+    the database write lock for long and progress is visible as it goes.
+    """
+    queryset = job_queryset(job, Invoice).order_by('pk')
+    start(job, queryset)
+    processed = last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:settings.JOBS_CHUNK_SIZE])
+        if not pks:
+            break
+        with transaction.atomic():
+            Invoice.objects.filter(pk__in=pks).update(status='paid', updated_at=timezone.now())
+        processed += len(pks)
+        last_pk = pks[-1]
+        report_progress(job, processed)
+
+
+def export_invoices_xlsx(job):
+    """Write the job's invoices to an XLSX file in ``JOBS_DIR``."""
+    queryset = job_queryset(job, Invoice)
+    start(job, queryset)
+    jobs_dir = Path(settings.JOBS_DIR)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    name = f"job-{job.pk}-invoices.xlsx"
+    with open(jobs_dir / name, 'wb') as fileobj:
+        count = write_invoices_xlsx(
+            queryset, fileobj, chunk_size=settings.JOBS_CHUNK_SIZE,
+            progress=lambda processed: report_progress(job, processed),
+        )
+    job.processed = count
+    job.result_file = name
+
+
+def get_result_path(job):
+    """Return the path of a finished job's output file, or None."""
+    if not job.result_file:
+        return None
+    path = Path(settings.JOBS_DIR) / job.result_file
+    return path if path.is_file() else None
+
+
+# Job kinds and the functions that run them.
+JOB_HANDLERS = {
+    'mark_invoices_paid': mark_invoices_paid,
+    'export_invoices_xlsx': export_invoices_xlsx,
+}
@@ -0,0 +1,44 @@
+import datetime
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce_app.archive import ARCHIVES, archivable, archive_orders
+from ecommerce_app.rollups import refresh_rollup, rollup_for_parent
+
+
+class Command(BaseCommand):
+    help = (
+        "Move paid invoices and completed or canceled purchase orders older than --days, with their line items, "
+        "to the archive tables, then refresh the rollups they affect."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*', metavar='kind', help=f"What to archive ({', '.join(ARCHIVES)}); everything by default.",
+        )
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help="Archive orders dated more than this many days ago.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE, help="Orders moved per transaction.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be archived without moving it.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - set(ARCHIVES)
+        if unknown:
+            raise CommandError(f"Unknown kinds: {', '.join(sorted(unknown))}")
+        cutoff = datetime.date.today() - datetime.timedelta(days=options['days'])
+        for name in options['kinds'] or ARCHIVES:
+            if options['dry_run']:
+                self.stdout.write(f"{name}: {archivable(name, cutoff).count()} dated before {cutoff} would be archived")
+                continue
+            started = time.monotonic()
+            orders, lines = archive_orders(name, cutoff, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: archived {orders} with {lines} line items in {time.monotonic() - started:.1f}s"
+            ))
+            if orders:
+                # Reports read the rollups, which would otherwise miss the moved orders until the next refresh.
+                for model in (ARCHIVES[name]['parent'], ARCHIVES[name]['archive']):
+                    refresh_rollup(rollup_for_parent(model))
@@ -0,0 +1,191 @@
+import csv
+import itertools
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from ecommerce_app.bulk import ORDER_MODELS, bulk_create_orders
+from ecommerce_app.models import Invoice, InvoiceLineItem, Product, PurchaseOrder, PurchaseOrderLineItem
+
+
+class RejectedOrder(Exception):
+    pass
+
+
+def parse_value(value, parser, field, required=True):
+    if value in (None, ''):
+        if required:
+            raise RejectedOrder(f"missing {field}")
+        return None
+    try:
+        parsed = parser(value)
+    except (AttributeError, TypeError, ValueError, InvalidOperation):
+        parsed = None
+    if parsed is None:
+        raise RejectedOrder(f"invalid {field}: {value!r}")
+    return parsed
+
+
+def parse_text(value):
+    return value.strip() or None
+
+
+def parse_quantity(value):
+    quantity = int(value)
+    if quantity < 0:
+        raise ValueError
+    return quantity
+
+
+def parse_amount(value):
+    amount = Decimal(str(value)).quantize(Decimal('0.01'))
+    if not amount.is_finite() or amount < 0:
+        raise ValueError
+    return amount
+
+
+def read_jsonl(stream):
+    """Yield ``(line_number, record)`` with one order (and its line items) per line."""
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, RejectedOrder(f"invalid JSON: {e.msg}")
+
+
+def read_csv(stream):
+    """
+    Yield ``(line_number, record)`` from a CSV with one row per line item.
+
+    Consecutive rows with the same ``type`` and ``ref`` form one order; the
+    order columns are taken from its first row.
+    """
+    rows = csv.DictReader(stream)
+    for key, group in itertools.groupby(enumerate(rows, 2), key=lambda item: (item[1].get('type'), item[1].get('ref'))):
+        group = list(group)
+        number, first = group[0]
+        record = dict(first)
+        record['line_items'] = [row for _, row in group if row.get('sku')]
+        yield number, record
+
+
+class Command(BaseCommand):
+    help = (
+        "Import invoices and purchase orders with their line items from CSV or JSONL. "
+        "Rows are written with bulk_create in chunked transactions; invalid orders are "
+        "reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for standard input.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format. Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Line items written per transaction.")
+        parser.add_argument('--rejects', help="Write rejected orders to this file as JSONL.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError("Cannot tell the input format; pass --format csv or --format jsonl.")
+        self.sku_map = dict(Product.objects.values_list('sku', 'id'))
+        self.batch_size = options['batch_size']
+        self.pending = {kind: [] for kind in ORDER_MODELS}
+        self.pending_lines = 0
+        self.counts = {kind: 0 for kind in ORDER_MODELS}
+        self.line_count = 0
+        rejected = 0
+        rejects = open(options['rejects'], 'w') if options['rejects'] else None
+
+        started = time.perf_counter()
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            reader = read_csv if fmt == 'csv' else read_jsonl
+            for number, record in reader(stream):
+                try:
+                    if isinstance(record, RejectedOrder):
+                        raise record
+                    kind, parent, line_items = self.build_order(record)
+                except RejectedOrder as e:
+                    rejected += 1
+                    self.stderr.write(f"Line {number}: rejected, {e}")
+                    if rejects:
+                        rejects.write(json.dumps({'line': number, 'reason': str(e), 'record': record if isinstance(record, dict) else None}) + "\n")
+                    continue
+                self.pending[kind].append((parent, line_items))
+                self.pending_lines += len(line_items)
+                if self.pending_lines >= self.batch_size:
+                    self.flush()
+            self.flush()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects:
+                rejects.close()
+
+        elapsed = time.perf_counter() - started
+        rate = self.line_count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.counts['invoice']} invoices, {self.counts['purchase_order']} purchase orders and "
+            f"{self.line_count} line items in {elapsed:.1f}s ({rate:.0f} line items/s); {rejected} rejected."
+        ))
+
+    def flush(self):
+        for kind, orders in self.pending.items():
+            if orders:
+                bulk_create_orders(kind, orders, batch_size=self.batch_size)
+                self.counts[kind] += len(orders)
+                self.line_count += sum(len(line_items) for parent, line_items in orders)
+                orders.clear()
+        self.pending_lines = 0
+
+    def build_order(self, record):
+        if not isinstance(record, dict):
+            raise RejectedOrder(f"expected an object, got {type(record).__name__}")
+        kind = record.get('type')
+        if kind == 'invoice':
+            parent = Invoice(
+                customer_name=parse_value(record.get('customer_name'), parse_text, 'customer_name'),
+                due_date=parse_value(record.get('due_date'), parse_date, 'due_date'),
+                status=record.get('status') or 'unpaid',
+            )
+            date_field, choices = 'invoice_date', Invoice.STATUS_CHOICES
+        elif kind == 'purchase_order':
+            parent = PurchaseOrder(
+                vendor=parse_value(record.get('vendor'), parse_text, 'vendor'),
+                status=record.get('status') or 'pending',
+            )
+            date_field, choices = 'order_date', PurchaseOrder.STATUS_CHOICES
+        else:
+            raise RejectedOrder(f"unknown type {kind!r}")
+        if not isinstance(parent.status, str) or parent.status not in dict(choices):
+            raise RejectedOrder(f"invalid status {parent.status!r}")
+        order_date = parse_value(record.get(date_field) or record.get('date'), parse_date, date_field, required=False)
+        if order_date:
+            setattr(parent, date_field, order_date)
+
+        lines = record.get('line_items') or []
+        if not isinstance(lines, list):
+            raise RejectedOrder("line_items is not a list")
+        line_items = []
+        for line in lines:
+            if not isinstance(line, dict):
+                raise RejectedOrder(f"line item is not an object: {line!r}")
+            sku = line.get('sku')
+            if not isinstance(sku, str) or sku not in self.sku_map:
+                raise RejectedOrder(f"unknown SKU {sku!r}")
+            quantity = parse_value(line.get('quantity'), parse_quantity, 'quantity')
+            if kind == 'invoice':
+                line_items.append(InvoiceLineItem(
+                    product_id=self.sku_map[sku],
+                    quantity=quantity,
+                    price_each=parse_value(line.get('price_each'), parse_amount, 'price_each'),
+                ))
+            else:
+                line_items.append(PurchaseOrderLineItem(
+                    product_id=self.sku_map[sku],
+                    quantity=quantity,
+                    cost=parse_value(line.get('cost'), parse_amount, 'cost'),
+                ))
+        return kind, parent, line_items
@@ -0,0 +1,28 @@
+import cProfile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from ecommerce_app.profiling import save_profile, top_functions
+
+
+class Command(BaseCommand):
+    help = (
+        "Run another management command under cProfile and save the stats to PROFILING_DIR. "
+        "Example: manage.py profile_command reconcile_totals -- --dry-run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('command_name', help="The management command to profile.")
+        parser.add_argument('command_args', nargs='*', help="Arguments for the profiled command.")
+        parser.add_argument('--top', type=int, default=20, help="Print this many functions by cumulative time.")
+
+    def handle(self, *args, **options):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            call_command(options['command_name'], *options['command_args'], stdout=self.stdout, stderr=self.stderr)
+        finally:
+            profiler.disable()
+            path = save_profile(profiler, f"command {options['command_name']}")
+        self.stdout.write(self.style.SUCCESS(f"Profile saved to {path}"))
+        if options['top']:
+            self.stdout.write(top_functions(path, options['top']))
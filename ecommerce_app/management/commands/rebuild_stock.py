@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.utils import timezone
+from ecommerce_app import inventory
+from ecommerce_app.models import InvoiceLineItem, Product, PurchaseOrderLineItem, StockLevel, StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute stock levels by replaying the stock movement ledger and report drift. "
+        "--backfill first adds ledger entries for existing orders that have none."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Products (or line items) handled per transaction.")
+        parser.add_argument('--backfill', action='store_true', help="Add missing sales and receipts for existing orders.")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without correcting it.")
+
+    def handle(self, *args, **options):
+        if options['backfill'] and not options['dry_run']:
+            targets = (
+                (InvoiceLineItem.objects.all(), 'sale', inventory.sale_movements),
+                (PurchaseOrderLineItem.objects.filter(purchase_order__status='completed'), 'receipt', inventory.receipt_movements),
+            )
+            for lines, kind, build in targets:
+                added = self.backfill(lines, kind, build, options['batch_size'])
+                self.stdout.write(f"Added {added} missing {kind} movement(s).")
+        checked, drifted = self.rebuild(options['batch_size'], options['dry_run'])
+        message = f"Stock levels: checked {checked} products, {drifted} drifted"
+        if drifted and not options['dry_run']:
+            message += " (corrected)"
+        self.stdout.write(self.style.WARNING(message) if drifted else self.style.SUCCESS(message))
+
+    def backfill(self, lines, kind, build, batch_size):
+        """Write ledger entries for line items that have none, without touching stock levels."""
+        recorded = StockMovement.objects.filter(kind=kind, source_id=OuterRef('pk'))
+        lines = lines.filter(~Exists(recorded)).only('pk', 'product_id', 'quantity').order_by('pk')
+        added = 0
+        last_pk = 0
+        while True:
+            batch = list(lines.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return added
+            # Conflicts are movements recorded by orders entered meanwhile.
+            StockMovement.objects.bulk_create(build(batch), ignore_conflicts=True)
+            added += len(batch)
+            last_pk = batch[-1].pk
+
+    def rebuild(self, batch_size, dry_run):
+        """
+        Replace each product's stock level with the sum of its movements.
+
+        Levels are locked a chunk of products at a time, so orders entered
+        meanwhile either are in the sum or update the level after it.
+        """
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                product_ids = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not product_ids:
+                    break
+                levels = {
+                    level.product_id: level
+                    for level in StockLevel.objects.select_for_update().filter(product_id__in=product_ids).order_by('product_id')
+                }
+                actual = dict(
+                    StockMovement.objects.filter(product_id__in=product_ids)
+                    .values('product_id')
+                    .annotate(on_hand=Sum('quantity'))
+                    .order_by()
+                    .values_list('product_id', 'on_hand')
+                )
+                stale, missing = [], []
+                for product_id in product_ids:
+                    level = levels.get(product_id)
+                    on_hand = actual.get(product_id, 0)
+                    if level is None and product_id not in actual:
+                        continue
+                    stored = level.on_hand if level else None
+                    if stored != on_hand:
+                        self.stdout.write(f"  Product {product_id}: stored {stored}, actual {on_hand}")
+                        if level is None:
+                            missing.append(StockLevel(product_id=product_id, on_hand=on_hand))
+                        else:
+                            level.on_hand, level.updated_at = on_hand, timezone.now()
+                            stale.append(level)
+                if not dry_run:
+                    StockLevel.objects.bulk_update(stale, ['on_hand', 'updated_at'])
+                    StockLevel.objects.bulk_create(missing)
+                checked += len(product_ids)
+                drifted += len(stale) + len(missing)
+                last_pk = product_ids[-1]
+        return checked, drifted
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from ecommerce_app.models import Invoice, InvoiceLineItem, PurchaseOrder, PurchaseOrderLineItem
+
+
+class Command(BaseCommand):
+    help = "Recompute stored invoice and purchase order totals from their line items and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of parent rows checked per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without correcting it.")
+
+    def handle(self, *args, **options):
+        targets = (
+            (Invoice, InvoiceLineItem, 'invoice', F('quantity') * F('price_each')),
+            (PurchaseOrder, PurchaseOrderLineItem, 'purchase_order', F('cost')),
+        )
+        for parent_model, line_model, fk, amount in targets:
+            checked, drifted = self.reconcile(parent_model, line_model, fk, amount, options['batch_size'], options['dry_run'])
+            label = parent_model._meta.verbose_name_plural
+            message = f"{label}: checked {checked}, {drifted} drifted"
+            if drifted and not options['dry_run']:
+                message += " (corrected)"
+            self.stdout.write(self.style.WARNING(message) if drifted else self.style.SUCCESS(message))
+
+    def reconcile(self, parent_model, line_model, fk, amount, batch_size, dry_run):
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                parents = list(
+                    parent_model.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .select_for_update()
+                    .only('pk', 'total', 'line_count')[:batch_size]
+                )
+                if not parents:
+                    break
+                actual = {
+                    row[fk]: row
+                    for row in line_model.objects.filter(**{f"{fk}__in": [p.pk for p in parents]})
+                    .values(fk)
+                    .annotate(total=Sum(amount), line_count=Count('pk'))
+                    .order_by()
+                }
+                stale = []
+                for parent in parents:
+                    row = actual.get(parent.pk, {})
+                    total = Decimal(row.get('total') or 0).quantize(Decimal('0.01'))
+                    line_count = row.get('line_count', 0)
+                    if parent.total != total or parent.line_count != line_count:
+                        self.stdout.write(
+                            f"  {parent_model.__name__} {parent.pk}: stored {parent.total}/{parent.line_count}, "
+                            f"actual {total}/{line_count}"
+                        )
+                        parent.total, parent.line_count = total, line_count
+                        stale.append(parent)
+                if stale and not dry_run:
+                    parent_model.objects.bulk_update(stale, ['total', 'line_count'])
+                checked += len(parents)
+                drifted += len(stale)
+                last_pk = parents[-1].pk
+        return checked, drifted
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce_app.rollups import ROLLUPS, refresh_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the daily sales and purchasing rollups with orders changed since the last run. "
+        "Run it from cron; --full recomputes every day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'rollups', nargs='*', metavar='rollup', help=f"Rollups to refresh ({', '.join(ROLLUPS)}); all by default.",
+        )
+        parser.add_argument('--full', action='store_true', help="Recompute every day instead of only changed ones.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['rollups']) - set(ROLLUPS)
+        if unknown:
+            raise CommandError(f"Unknown rollups: {', '.join(sorted(unknown))}")
+        for name in options['rollups'] or ROLLUPS:
+            started = time.monotonic()
+            days = refresh_rollup(name, full=options['full'])
+            self.stdout.write(self.style.SUCCESS(f"{name}: recomputed {days} day(s) in {time.monotonic() - started:.1f}s"))
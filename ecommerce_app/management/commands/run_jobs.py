@@ -0,0 +1,58 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from ecommerce_app.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (long admin actions) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Number of jobs run at the same time.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help="Seconds an idle worker waits before checking for new jobs.",
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        if options['workers'] == 1:
+            self.work(options['once'], options['poll_interval'])
+            return
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                executor.submit(self.work_in_thread, options['once'], options['poll_interval'])
+                for _ in range(options['workers'])
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                # Let each worker finish its current job.
+                self.stop.set()
+                raise
+
+    def work_in_thread(self, once, poll_interval):
+        try:
+            self.work(once, poll_interval)
+        finally:
+            connection.close()
+
+    def work(self, once, poll_interval):
+        while not self.stop.is_set():
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    return
+                self.stop.wait(poll_interval)
+                continue
+            started = time.monotonic()
+            if run_job(job):
+                self.stdout.write(self.style.SUCCESS(f"{job}: {job.processed} rows in {time.monotonic() - started:.1f}s"))
+            else:
+                self.stderr.write(self.style.ERROR(f"{job}: failed\n{job.error}"))
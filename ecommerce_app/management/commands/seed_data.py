@@ -0,0 +1,119 @@
+import datetime
+import itertools
+import random
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from ecommerce_app.bulk import bulk_create_orders
+from ecommerce_app.search import index_objects
+from ecommerce_app.models import Invoice, InvoiceLineItem, Product, PurchaseOrder, PurchaseOrderLineItem
+
+ADJECTIVES = ["Compact", "Deluxe", "Ergonomic", "Portable", "Rugged", "Smart", "Wireless", "Classic", "Pro", "Eco"]
+NOUNS = ["Laptop", "Phone", "Monitor", "Keyboard", "Mouse", "Headset", "Router", "Tablet", "Camera", "Speaker"]
+
+
+
+def zipf_weights(count, exponent=0.8):
+    """Cumulative Zipf-like weights, for use with ``Random.choices(cum_weights=...)``."""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+class Command(BaseCommand):
+    help = "Seed the database with synthetic products, purchase orders, invoices and line items for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--purchase-orders', type=int, default=2000)
+        parser.add_argument('--invoices', type=int, default=10000)
+        parser.add_argument('--customers', type=int, default=2000, help="Size of the customer name pool.")
+        parser.add_argument('--vendors', type=int, default=50, help="Size of the vendor name pool.")
+        parser.add_argument('--max-lines', type=int, default=8, help="Maximum line items per order.")
+        parser.add_argument('--days', type=int, default=730, help="Spread order dates over this many past days.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Orders written per transaction.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible datasets.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.today = datetime.date.today()
+        self.options = options
+
+        self.products = self.seed_products(options['products'])
+        # Popular products, customers and vendors appear far more often than the rest.
+        self.product_weights = zipf_weights(len(self.products))
+        self.customers = [f"Customer {i}" for i in range(options['customers'])]
+        self.customer_weights = zipf_weights(len(self.customers))
+        self.vendors = [f"Vendor {i}" for i in range(options['vendors'])]
+        self.vendor_weights = zipf_weights(len(self.vendors))
+
+        self.seed_orders('purchase_order', options['purchase_orders'], self.build_purchase_order)
+        self.seed_orders('invoice', options['invoices'], self.build_invoice)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['products']} products, {options['purchase_orders']} purchase orders "
+            f"and {options['invoices']} invoices."
+        ))
+
+    def seed_products(self, count):
+        start = Product.objects.count()
+        new = []
+        for i in range(start, start + count):
+            # Prices are roughly log-normal: mostly cheap items, a long tail of expensive ones.
+            price = Decimal(min(self.rng.lognormvariate(4, 1), 99999)).quantize(Decimal('0.01'))
+            new.append(Product(
+                name=f"{self.rng.choice(ADJECTIVES)} {self.rng.choice(NOUNS)} {i}",
+                sku=f"SKU-{i:07d}",
+                unit_price=price,
+            ))
+        Product.objects.bulk_create(new, batch_size=self.options['batch_size'])
+        index_objects(Product, new, replace=False)
+        return list(Product.objects.values_list('id', 'unit_price'))
+
+    def seed_orders(self, kind, count, build):
+        for start in range(0, count, self.options['batch_size']):
+            orders = [build() for _ in range(start, min(start + self.options['batch_size'], count))]
+            bulk_create_orders(kind, orders)
+
+    def order_date(self):
+        # Recent dates are more common than old ones.
+        days_ago = min(int(self.rng.expovariate(3 / self.options['days'])), self.options['days'])
+        return self.today - datetime.timedelta(days=days_ago)
+
+    def pick_lines(self):
+        count = min(1 + int(self.rng.expovariate(0.5)), self.options['max_lines'])
+        return self.rng.choices(self.products, cum_weights=self.product_weights, k=count)
+
+    def build_purchase_order(self):
+        order_date = self.order_date()
+        age = (self.today - order_date).days
+        order = PurchaseOrder(
+            vendor=self.rng.choices(self.vendors, cum_weights=self.vendor_weights)[0],
+            order_date=order_date,
+            status='completed' if age > 14 and self.rng.random() < 0.95 else self.rng.choice(['pending', 'canceled']),
+        )
+        lines = []
+        for product_id, unit_price in self.pick_lines():
+            quantity = self.rng.randint(5, 200)
+            discount = Decimal(self.rng.uniform(0.5, 0.8)).quantize(Decimal('0.01'))
+            lines.append(PurchaseOrderLineItem(
+                product_id=product_id, quantity=quantity, cost=(unit_price * discount * quantity).quantize(Decimal('0.01'))
+            ))
+        return order, lines
+
+    def build_invoice(self):
+        invoice_date = self.order_date()
+        due_date = invoice_date + datetime.timedelta(days=self.rng.choice([15, 30, 30, 30, 60]))
+        # Older invoices are more likely to have been paid.
+        paid_probability = min(0.98, (self.today - invoice_date).days / 60)
+        invoice = Invoice(
+            customer_name=self.rng.choices(self.customers, cum_weights=self.customer_weights)[0],
+            invoice_date=invoice_date,
+            due_date=due_date,
+            status='paid' if self.rng.random() < paid_probability else 'unpaid',
+        )
+        lines = []
+        for product_id, unit_price in self.pick_lines():
+            markup = Decimal(self.rng.uniform(0.9, 1.2)).quantize(Decimal('0.01'))
+            lines.append(InvoiceLineItem(
+                product_id=product_id,
+                quantity=max(1, int(self.rng.expovariate(0.3))),
+                price_each=(unit_price * markup).quantize(Decimal('0.01')),
+            ))
+        return invoice, lines
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ecommerce_app.profiling import measure_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a cold django.setup() in a fresh interpreter and list the slowest imports, "
+        "parsed from python -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Print this many modules.")
+        parser.add_argument(
+            '--sort', choices=['cumulative', 'self'], default='cumulative',
+            help="Rank modules by time including (cumulative) or excluding (self) their own imports.",
+        )
+        parser.add_argument('--urls', action='store_true', help="Also import the URLconf, as the first request does.")
+        parser.add_argument('--runs', type=int, default=3, help="Time this many cold starts and report the fastest.")
+
+    def handle(self, *args, **options):
+        seconds = min(measure_startup(urls=options['urls'])[0] for _ in range(max(options['runs'], 1)))
+        budget = settings.STARTUP_TIME_BUDGET
+        message = f"Startup took {seconds * 1000:.0f} ms (budget {budget * 1000:.0f} ms)"
+        self.stdout.write(self.style.SUCCESS(message) if seconds <= budget else self.style.WARNING(message))
+
+        if not options['top']:
+            return
+        _, modules, imports = measure_startup(urls=options['urls'], importtime=True)
+        column = 1 if options['sort'] == 'self' else 2
+        imports.sort(key=lambda row: row[column], reverse=True)
+        self.stdout.write(f"{len(modules)} modules loaded. Slowest imports ({options['sort']}, ms):")
+        self.stdout.write(f"{'self':>8} {'cumul.':>8}  module")
+        for module, self_us, cumulative_us, depth in imports[:options['top']]:
+            self.stdout.write(f"{self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}  {module}")
@@ -0,0 +1,222 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+from .routers import replica_state
+
+# Collapses IN (%s, %s, ...) lists so queries differing only in list length match.
+IN_LIST_RE = re.compile(r'\((?:%s|\?)(?:, (?:%s|\?))*\)')
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts queries, SQL time and repeated statements."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self, limit=5):
+        """The most repeated query fingerprints, as ``(fingerprint, count)`` pairs."""
+        fingerprints = Counter()
+        for sql, count in self.statements.items():
+            fingerprints[IN_LIST_RE.sub('(...)', sql)] += count
+        return [(sql, count) for sql, count in fingerprints.most_common(limit) if count > 1]
+
+
+class SlowRequestLog:
+    """Thread-safe ring buffer of the most recent requests over the slow threshold."""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+
+    def record(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+
+    def slowest(self):
+        with self.lock:
+            entries = list(self.entries)
+        return sorted(entries, key=lambda entry: entry['duration_ms'], reverse=True)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+slow_requests = SlowRequestLog(getattr(settings, 'REQUEST_INSTRUMENTATION_BUFFER_SIZE', 100))
+
+# The recorder for the current request. Context variables follow a request into
+# the threads that sync_to_async runs ORM calls in, unlike thread-locals.
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Hook ``record_query`` into every database connection once, whichever thread opens it."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Record query count, SQL time, duplicate queries and wall time for each request.
+
+    Works with ``DEBUG = False`` since it hooks in through
+    ``connection.execute_wrapper`` instead of ``connection.queries``. Results are
+    sent as a ``Server-Timing`` header and requests slower than
+    ``REQUEST_INSTRUMENTATION_SLOW_MS`` are kept in ``slow_requests``. Queries run
+    while a streaming response is being consumed are not counted.
+
+    Supports both sync and async requests, so it adds no thread switch under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    def finish(self, request, response, recorder, duration):
+        duplicates = recorder.duplicates()
+        timings = [
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'app;dur={duration * 1000:.1f}',
+        ]
+        if duplicates:
+            timings.append(f'dup;desc="{sum(count - 1 for sql, count in duplicates)} repeated queries"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        if duration * 1000 >= settings.REQUEST_INSTRUMENTATION_SLOW_MS:
+            slow_requests.record({
+                'timestamp': timezone.now(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'db_ms': round(recorder.duration * 1000, 1),
+                'queries': recorder.count,
+                'duplicates': duplicates,
+            })
+        return response
+
+
+# Sent after a request that wrote, so the client's next requests read from the primary.
+PIN_PRIMARY_COOKIE = 'pin_primary'
+
+# Requests that should not change anything, and so may read from the replica.
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let read-only requests read from the replica through ``PrimaryReplicaRouter``.
+
+    A GET, HEAD or OPTIONS request reads from the replica until it writes.
+    A request that wrote sets a short-lived cookie that keeps the client on
+    the primary for ``DATABASE_REPLICA_PIN_SECONDS``, covering the redirect
+    after a save. Streaming responses keep the request's routing while they
+    are consumed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = self.request_state(request)
+        token = replica_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_state.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state = self.request_state(request)
+        token = replica_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_state.reset(token)
+        return self.finish(response, state)
+
+    def request_state(self, request):
+        reads = request.method in READ_ONLY_METHODS and PIN_PRIMARY_COOKIE not in request.COOKIES
+        return {'reads': reads, 'wrote': False}
+
+    def finish(self, response, state):
+        if response.streaming and not response.is_async:
+            response.streaming_content = stream_with_state(response.streaming_content, state)
+        if state['wrote']:
+            response.set_cookie(
+                PIN_PRIMARY_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def stream_with_state(content, state):
+    """Yield from ``content`` with ``state`` as the routing state while each chunk is produced."""
+    iterator = iter(content)
+    while True:
+        token = replica_state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            replica_state.reset(token)
+        yield chunk
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:31
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Invoice = apps.get_model('ecommerce_app', 'Invoice')
+    InvoiceLineItem = apps.get_model('ecommerce_app', 'InvoiceLineItem')
+    PurchaseOrder = apps.get_model('ecommerce_app', 'PurchaseOrder')
+    PurchaseOrderLineItem = apps.get_model('ecommerce_app', 'PurchaseOrderLineItem')
+
+    for parent, line_model, fk, amount in (
+        (Invoice, InvoiceLineItem, 'invoice', F('quantity') * F('price_each')),
+        (PurchaseOrder, PurchaseOrderLineItem, 'purchase_order', F('cost')),
+    ):
+        lines = line_model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk)
+        parent.objects.update(
+            total=Coalesce(
+                Subquery(lines.annotate(s=Sum(amount)).values('s')),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            line_count=Coalesce(Subquery(lines.annotate(c=Count('pk')).values('c')), Value(0)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of line items, maintained as line items change.'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, help_text='Sum of quantity x price over line items, maintained as line items change.', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of line items, maintained as line items change.'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, help_text='Sum of line item costs, maintained as line items change.', max_digits=12),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0002_stored_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='When this invoice or one of its line items last changed.'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='When this purchase order or one of its line items last changed.'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicelineitem',
+            index=models.Index(fields=['invoice', 'product'], name='invline_invoice_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorderlineitem',
+            index=models.Index(fields=['purchase_order', 'product'], name='poline_po_product_idx'),
+        ),
+    ]
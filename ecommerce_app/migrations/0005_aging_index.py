@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'customer_name', 'due_date', 'total'], name='invoice_aging_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:38
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0005_aging_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_date',
+            field=models.DateField(default=datetime.date.today, editable=False, help_text='The date when the invoice was created.'),
+        ),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='order_date',
+            field=models.DateField(default=datetime.date.today, editable=False, help_text='The date when the order was placed.'),
+        ),
+    ]
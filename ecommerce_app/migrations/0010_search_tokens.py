@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-17 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0009_product_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='Model name of the indexed object.', max_length=50)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('token', models.CharField(max_length=64)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'token', 'object_id'], name='searchtoken_lookup_idx'), models.Index(fields=['model', 'object_id', 'token'], name='searchtoken_object_idx')],
+            },
+        ),
+    ]
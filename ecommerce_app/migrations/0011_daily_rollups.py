@@ -0,0 +1,81 @@
+# Generated by Django 5.1.4 on 2026-10-17 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0010_search_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('units', models.BigIntegerField()),
+                ('line_count', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyVendorSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('vendor', models.CharField(max_length=255)),
+                ('spend', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('units', models.BigIntegerField()),
+                ('line_count', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupDirtyDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['updated_at'], name='invoice_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['updated_at'], name='po_updated_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product'),
+        ),
+        migrations.AddField(
+            model_name='dailyvendorspend',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='rollupdirtydate',
+            constraint=models.UniqueConstraint(fields=('name', 'date'), name='rollup_dirty_name_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('date', 'product'), name='daily_sales_date_product_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyvendorspend',
+            constraint=models.UniqueConstraint(fields=('date', 'vendor', 'product'), name='daily_spend_date_vendor_product_uniq'),
+        ),
+    ]
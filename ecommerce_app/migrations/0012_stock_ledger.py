@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-17 05:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0011_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock', serialize=False, to='ecommerce_app.product')),
+                ('on_hand', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['on_hand', 'product'], name='stocklevel_on_hand_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('sale', 'Sale'), ('adjustment', 'Adjustment')], max_length=10)),
+                ('quantity', models.BigIntegerField(help_text='Units added (positive) or removed (negative).')),
+                ('source_id', models.PositiveBigIntegerField(blank=True, help_text='ID of the purchase order or invoice line item that caused the movement. A plain ID rather than a foreign key, so the ledger outlives the order.', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'id'], name='stockmovement_product_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'source_id'), name='stockmovement_source_uniq')],
+            },
+        ),
+    ]
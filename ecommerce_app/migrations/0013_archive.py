@@ -0,0 +1,96 @@
+# Generated by Django 5.1.4 on 2026-10-17 05:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0012_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedInvoice',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('customer_name', models.CharField(max_length=255)),
+                ('invoice_date', models.DateField()),
+                ('due_date', models.DateField()),
+                ('status', models.CharField(choices=[('unpaid', 'Unpaid'), ('paid', 'Paid')], max_length=10)),
+                ('updated_at', models.DateTimeField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('line_count', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(help_text='Also the rollup watermark for archived invoices.')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['invoice_date'], name='archived_invoice_date_idx'), models.Index(fields=['archived_at'], name='archived_invoice_at_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedInvoiceLineItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price_each', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='ecommerce_app.archivedinvoice')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPurchaseOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('vendor', models.CharField(max_length=255)),
+                ('order_date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('canceled', 'Canceled')], max_length=10)),
+                ('updated_at', models.DateTimeField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('line_count', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(help_text='Also the rollup watermark for archived purchase orders.')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order_date'], name='archived_po_date_idx'), models.Index(fields=['archived_at'], name='archived_po_at_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPurchaseOrderLineItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product')),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='ecommerce_app.archivedpurchaseorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedDailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('units', models.BigIntegerField()),
+                ('line_count', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='archived_sales_date_product_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedDailyVendorSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('vendor', models.CharField(max_length=255)),
+                ('spend', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('units', models.BigIntegerField()),
+                ('line_count', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ecommerce_app.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'vendor', 'product'), name='archived_spend_date_vendor_product_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-17 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0013_archive'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='stockmovement',
+            name='stockmovement_source_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='stockmovement',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind__in', ['receipt', 'sale'])), fields=('kind', 'source_id'), name='stockmovement_source_uniq'),
+        ),
+    ]
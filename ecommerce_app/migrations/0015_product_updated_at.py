@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0014_stock_adjustments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='When this product last changed; printed invoices showing it are re-rendered.'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:02
+
+from django.db import migrations, models
+
+
+def backfill_source_types(apps, schema_editor):
+    # Receipts come from purchase order lines and sales from invoice lines.
+    # Earlier adjustments cannot be told apart and are left blank.
+    StockMovement = apps.get_model('ecommerce_app', 'StockMovement')
+    StockMovement.objects.filter(kind='receipt').update(source_type='purchase_order_line')
+    StockMovement.objects.filter(kind='sale').update(source_type='invoice_line')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0015_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='source_type',
+            field=models.CharField(blank=True, choices=[('invoice_line', 'Invoice line item'), ('purchase_order_line', 'Purchase order line item')], help_text='Which kind of line item source_id refers to; their IDs overlap.', max_length=20, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['source_type', 'source_id'], name='stockmovement_source_idx'),
+        ),
+        migrations.RunPython(backfill_source_types, migrations.RunPython.noop),
+    ]
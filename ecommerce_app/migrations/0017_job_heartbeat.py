@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0016_stockmovement_source_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='When the worker running this job last reported progress.', null=True),
+        ),
+    ]
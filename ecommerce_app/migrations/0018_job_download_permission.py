@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0017_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='job',
+            options={'permissions': [('download_any_job', "Can download the result files of other users' jobs")]},
+        ),
+    ]
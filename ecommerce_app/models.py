@@ -1,18 +1,77 @@
 import datetime
-from datetime import datetime
-from django.db import models
-from django.db.models import F, Sum
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import Upper
+from django.utils import timezone
+from .stock import StockTrackingMixin
+
+def prefix_range(prefix):
+    """Return ``(low, high)`` such that strings starting with ``prefix`` are ``>= low`` and ``< high``."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def prefix_search(self, term):
+        """
+        Products whose SKU or name starts with ``term``, ignoring case.
+
+        Written as ranges on UPPER(sku) and UPPER(name) so the expression
+        indexes below are used; LIKE on an expression cannot use an index.
+        The ranges assume a binary collation (SQLite's default, PostgreSQL "C").
+        """
+        low, high = prefix_range(term.upper())
+        return self.alias(sku_upper=Upper('sku'), name_upper=Upper('name')).filter(
+            Q(sku_upper__gte=low, sku_upper__lt=high) | Q(name_upper__gte=low, name_upper__lt=high)
+        )
+
 
 class Product(models.Model):
     """Represents a product available for purchase."""
     name = models.CharField(max_length=255, unique=True, help_text="The name of the product.")
     sku = models.CharField(max_length=50, unique=True, help_text="Stock Keeping Unit (SKU) for the product.")
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Price per unit of the product.")
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="When this product last changed; printed invoices showing it are re-rendered."
+    )
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Case-insensitive prefix search, see ProductQuerySet.prefix_search.
+            models.Index(Upper('sku'), name='product_sku_upper_idx'),
+            models.Index(Upper('name'), name='product_name_upper_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
 
+class PurchaseOrderManager(models.Manager):
+    """Custom manager to handle queries for purchase orders."""
+
+    def including_archived(self, *fields, **filters):
+        """
+        ``fields`` of live and archived purchase orders matching ``filters``,
+        as dicts from one UNION ALL query. Only ``order_by()`` and slicing
+        can be applied to the result.
+        """
+        archived = ArchivedPurchaseOrder.objects.filter(**filters).values(*fields)
+        return self.filter(**filters).values(*fields).union(archived, all=True)
+
+    def with_line_items(self):
+        """Purchase orders with line items and products loaded in two queries."""
+        return self.prefetch_related(
+            Prefetch(
+                'line_items',
+                queryset=PurchaseOrderLineItem.objects.select_related('product').order_by('pk'),
+            )
+        )
+
+
 class PurchaseOrder(models.Model):
     """Represents a purchase order made to a vendor."""
     
@@ -23,44 +82,240 @@ class PurchaseOrder(models.Model):
     ]
     
     vendor = models.CharField(max_length=255, help_text="Name of the vendor.")
-    order_date = models.DateField(auto_now_add=True, help_text="The date when the order was placed.")
+    order_date = models.DateField(default=datetime.date.today, editable=False, help_text="The date when the order was placed.")
     status = models.CharField(
         max_length=10, 
         choices=STATUS_CHOICES, 
         default='pending', 
         help_text="The current status of the purchase order."
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="When this purchase order or one of its line items last changed."
+    )
+
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text="Sum of line item costs, maintained as line items change."
+    )
+    line_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of line items, maintained as line items change."
+    )
+
+    objects = PurchaseOrderManager()
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # Read under a row lock, so concurrent saves see each other's
+            # status changes in turn; the stock signals act on the change.
+            self._saved_from_status = None if self._state.adding else (
+                type(self)._base_manager.using(using).select_for_update()
+                .filter(pk=self.pk).values_list('status', flat=True).first()
+            )
+            super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the admin changelist, newest first.
+            models.Index(fields=['order_date', 'id'], name='po_order_date_id_idx'),
+            # Finding orders changed since the last rollup refresh.
+            models.Index(fields=['updated_at'], name='po_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"PO-{self.id} ({self.vendor}) - {self.get_status_display()}"
     
     def total_cost(self):
-        """Calculate total cost of all line items in this purchase order."""
-        return self.line_items.aggregate(total=Sum('cost'))['total'] or 0.00
+        """Return the stored total cost of all line items in this purchase order."""
+        return self.total
+
+
+class ParentTotalsMixin:
+    """
+    Keeps the stored ``total`` and ``line_count`` of a line item's parent in step.
+
+    Saves run in a transaction together with the parent update, which is applied
+    as an ``F()`` delta from the stored line item, read under a row lock, so
+    concurrent edits to the same line item or parent are not lost. Deletes are
+    handled by the ``pre_delete``/``post_delete`` receivers in ``signals.py`` so
+    that cascaded deletes are counted as well. ``QuerySet.update()`` and
+    ``bulk_create()`` bypass this; run ``reconcile_totals`` after using them.
+    """
+    parent_field = None
+
+    def amount(self):
+        """The amount this line item adds to its parent's total."""
+        raise NotImplementedError
+
+    def contribution(self):
+        """Return ``(parent_id, amount)``, or None if fields were deferred."""
+        parent_attname = self._meta.get_field(self.parent_field).attname
+        if self.get_deferred_fields():
+            return None
+        return getattr(self, parent_attname), self.amount()
+
+    def load_deferred_fields(self):
+        """Load fields left out with ``only()`` or ``defer()``, which the totals need."""
+        deferred = self.get_deferred_fields()
+        if deferred and not self._state.adding:
+            self.refresh_from_db(fields=deferred)
+
+    def select_saved(self, using=None):
+        """
+        The stored row of this line item, locked until the end of the current
+        transaction, or None if it is new or was deleted meanwhile.
+        """
+        if self._state.adding:
+            return None
+        using = using or router.db_for_write(type(self), instance=self)
+        return type(self)._base_manager.using(using).select_for_update().filter(pk=self.pk).first()
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self.load_deferred_fields()
+            # Not the row as it was loaded: a concurrent save may have changed it since.
+            saved = self.select_saved(using)
+            old = saved.contribution() if saved else None
+            super().save(*args, **kwargs)
+            new = self.contribution()
+            if old and old[0] == new[0]:
+                self.apply_to_parent(new[0], new[1] - old[1], 0)
+            else:
+                if old:
+                    self.apply_to_parent(old[0], -old[1], -1)
+                self.apply_to_parent(new[0], new[1], 1)
+
+    def apply_to_parent(self, parent_id, amount, count):
+        """Add ``amount`` and ``count`` to the stored totals of the given parent and touch it."""
+        field = self._meta.get_field(self.parent_field)
+        updated_at = timezone.now()
+        field.related_model._base_manager.filter(pk=parent_id).update(
+            total=F('total') + amount,
+            line_count=F('line_count') + count,
+            updated_at=updated_at,
+        )
+        # Keep an already loaded parent instance consistent with the database.
+        if field.is_cached(self):
+            parent = field.get_cached_value(self)
+            if parent is not None and parent.pk == parent_id:
+                parent.total += amount
+                parent.line_count += count
+                parent.updated_at = updated_at
 
 
-class PurchaseOrderLineItem(models.Model):
+class LineItemManager(models.Manager):
+
+    def including_archived(self, *fields, **filters):
+        """
+        ``fields`` of live and archived line items matching ``filters``, as
+        dicts from one UNION ALL query. Only ``order_by()``, ``values_list()``
+        of the same fields and slicing can be applied to the result.
+        """
+        archive_model = self.model._meta.apps.get_model(self.model._meta.app_label, self.model.archive_model)
+        archived = archive_model.objects.filter(**filters).values(*fields)
+        return self.filter(**filters).values(*fields).union(archived, all=True)
+
+
+class PurchaseOrderLineItem(StockTrackingMixin, ParentTotalsMixin, models.Model):
     """Represents a line item in a purchase order."""
     purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name="line_items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(help_text="The number of units ordered.")
     cost = models.DecimalField(max_digits=10, decimal_places=2, help_text="The total cost for this line item.")
 
+    parent_field = 'purchase_order'
+    archive_model = 'ArchivedPurchaseOrderLineItem'
+
+    objects = LineItemManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['purchase_order', 'product'], name='poline_po_product_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in PO-{self.purchase_order.id}"
 
+    def amount(self):
+        return self._meta.get_field('cost').to_python(self.cost)
+
+
+# Accounts-receivable aging buckets as (name, label, min days overdue, max days overdue).
+AGING_BUCKETS = (
+    ('current', 'Current', None, 0),
+    ('days_1_30', '1-30 days', 1, 30),
+    ('days_31_60', '31-60 days', 31, 60),
+    ('days_61_90', '61-90 days', 61, 90),
+    ('days_over_90', '90+ days', 91, None),
+)
+
 
 class InvoiceManager(models.Manager):
     """Custom manager to handle queries for invoices."""
+
+    def including_archived(self, *fields, **filters):
+        """
+        ``fields`` of live and archived invoices matching ``filters``, as
+        dicts from one UNION ALL query. Only ``order_by()`` and slicing can
+        be applied to the result.
+        """
+        archived = ArchivedInvoice.objects.filter(**filters).values(*fields)
+        return self.filter(**filters).values(*fields).union(archived, all=True)
+
+    def aging_by_customer(self, as_of=None):
+        """
+        Outstanding (unpaid) amounts per customer, split into the AGING_BUCKETS.
+
+        Runs as a single GROUP BY query. Buckets are expressed as due date ranges
+        so no date arithmetic is done per row.
+        """
+        as_of = as_of or datetime.date.today()
+        amount = DecimalField(max_digits=14, decimal_places=2)
+        buckets = {}
+        for name, label, min_days, max_days in AGING_BUCKETS:
+            condition = Q()
+            if min_days is not None:
+                condition &= Q(due_date__lte=as_of - datetime.timedelta(days=min_days))
+            if max_days is not None:
+                condition &= Q(due_date__gte=as_of - datetime.timedelta(days=max_days))
+            buckets[name] = Sum(Case(When(condition, then='total'), default=Value(0), output_field=amount))
+        return (
+            self.filter(status='unpaid')
+            .values('customer_name')
+            .annotate(**buckets)
+            .order_by('customer_name')
+        )
     
+    def with_line_items(self):
+        """Invoices with line items, products and per-line totals loaded in two queries."""
+        return self.prefetch_related(
+            Prefetch(
+                'line_items',
+                queryset=InvoiceLineItem.objects.select_related('product')
+                .annotate(line_total=F('quantity') * F('price_each'))
+                .order_by('pk'),
+            )
+        )
+
+    def for_printing(self):
+        return self.with_line_items()
+
     def overdue_and_above(self, threshold):
-        """Returns invoices that are overdue and total price is above the given threshold."""
+        """Returns unpaid invoices that are overdue and total price is above the given threshold."""
         return self.filter(
-            due_date__lt=datetime.date.today(),  # Overdue invoices
-            line_items__quantity__gt=0,  # Ensure line items exist
-        ).annotate(
-            total_price=Sum(F('line_items__quantity') * F('line_items__price_each'))
-        ).filter(total_price__gt=threshold)  # Invoices with total price above the threshold
+            Exists(InvoiceLineItem.objects.filter(invoice=OuterRef('pk'), quantity__gt=0)),  # Ensure line items exist
+            status='unpaid',  # Paid invoices are never overdue
+            due_date__lt=datetime.date.today(),  # Overdue invoices, served by invoice_status_due_idx
+            total__gt=threshold,  # Stored total, so no join or aggregate over line items
+        )
 
 
 class Invoice(models.Model):
@@ -73,7 +328,7 @@ class Invoice(models.Model):
     ]
     
     customer_name = models.CharField(max_length=255, help_text="Full name of the customer.")
-    invoice_date = models.DateField(auto_now_add=True, help_text="The date when the invoice was created.")
+    invoice_date = models.DateField(default=datetime.date.today, editable=False, help_text="The date when the invoice was created.")
     due_date = models.DateField(help_text="The due date by which payment should be made.")
     status = models.CharField(
         max_length=10, 
@@ -81,18 +336,45 @@ class Invoice(models.Model):
         default='unpaid', 
         help_text="The current status of the invoice."
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="When this invoice or one of its line items last changed."
+    )
+    
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text="Sum of quantity x price over line items, maintained as line items change."
+    )
+    line_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of line items, maintained as line items change."
+    )
     
     # Link custom manager
     objects = InvoiceManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+            # Covers InvoiceManager.aging_by_customer without reading the table.
+            models.Index(fields=['status', 'customer_name', 'due_date', 'total'], name='invoice_aging_idx'),
+            # Keyset pagination of the admin changelist, newest first.
+            models.Index(fields=['invoice_date', 'id'], name='invoice_date_id_idx'),
+            # Finding invoices changed since the last rollup refresh.
+            models.Index(fields=['updated_at'], name='invoice_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f"Invoice-{self.id} for {self.customer_name} ({self.get_status_display()})"
     
     def total_price(self):
-        """Calculate total price of all line items in this invoice."""
-        return self.line_items.aggregate(
-            total=Sum(F('quantity') * F('price_each'))
-        )['total'] or 0.00
+        """Return the stored total price of all line items in this invoice."""
+        return self.total
 
     def mark_as_paid(self):
         """Custom method to mark the invoice as paid."""
@@ -106,12 +388,384 @@ class Invoice(models.Model):
         return False
 
 
-class InvoiceLineItem(models.Model):
+class InvoiceLineItem(StockTrackingMixin, ParentTotalsMixin, models.Model):
     """Represents a line item in an invoice."""
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="line_items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(help_text="The number of units purchased.")
     price_each = models.DecimalField(max_digits=10, decimal_places=2, help_text="The price per unit for the product.")
 
+    parent_field = 'invoice'
+    archive_model = 'ArchivedInvoiceLineItem'
+
+    objects = LineItemManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['invoice', 'product'], name='invline_invoice_product_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Invoice-{self.invoice.id}"
+
+    def amount(self):
+        return int(self.quantity) * self._meta.get_field('price_each').to_python(self.price_each)
+
+
+class Job(models.Model):
+    """A long-running admin action, run in the background by the ``run_jobs`` command."""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text="Which handler in jobs.JOB_HANDLERS runs this job.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    query = models.BinaryField(
+        null=True, editable=False, help_text="Pickled query selecting the rows the job works on."
+    )
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the worker running this job last reported progress."
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+    total = models.PositiveIntegerField(default=0, help_text="Number of rows to process.")
+    processed = models.PositiveIntegerField(default=0, help_text="Number of rows processed so far.")
+    result_file = models.CharField(max_length=255, blank=True, help_text="Name of the output file in JOBS_DIR.")
+    error = models.TextField(blank=True)
+
+    class Meta:
+        permissions = [
+            ('download_any_job', "Can download the result files of other users' jobs"),
+        ]
+
+    def __str__(self):
+        return f"Job-{self.id} {self.kind} ({self.get_status_display()})"
+
+    def progress(self):
+        """Percentage of rows processed."""
+        if self.status == 'done':
+            return 100
+        return int(self.processed * 100 / self.total) if self.total else 0
+
+
+class SearchToken(models.Model):
+    """One normalized word from a searchable field of an object, see search.py."""
+    model = models.CharField(max_length=50, help_text="Model name of the indexed object.")
+    object_id = models.PositiveBigIntegerField()
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            # Prefix lookups return object IDs straight from the index.
+            models.Index(fields=['model', 'token', 'object_id'], name='searchtoken_lookup_idx'),
+            # Reindexing an object, and checking a candidate's other words.
+            models.Index(fields=['model', 'object_id', 'token'], name='searchtoken_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}-{self.object_id}: {self.token}"
+
+
+class DailyProductSalesManager(models.Manager):
+    """Sales report queries, answered from the daily rollup rather than the line items."""
+
+    def in_period(self, start, end):
+        return self.filter(date__gte=start, date__lte=end)
+
+    def by_product(self, start, end):
+        """Revenue and units per product over the period, best sellers first."""
+        return (
+            self.in_period(start, end)
+            .values('product_id', 'product__sku', 'product__name')
+            .annotate(revenue=Sum('revenue'), units=Sum('units'))
+            .order_by('-revenue', 'product_id')
+        )
+
+    def by_day(self, start, end):
+        """Revenue and units per day over the period."""
+        return (
+            self.in_period(start, end)
+            .values('date')
+            .annotate(revenue=Sum('revenue'), units=Sum('units'))
+            .order_by('date')
+        )
+
+
+class DailyProductSales(models.Model):
+    """Invoiced revenue and units per product and invoice date, maintained by ``refresh_rollups``."""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    units = models.BigIntegerField()
+    line_count = models.PositiveIntegerField()
+
+    objects = DailyProductSalesManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='daily_sales_date_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.revenue}"
+
+
+class DailyVendorSpendManager(models.Manager):
+    """Purchasing report queries, answered from the daily rollup rather than the line items."""
+
+    def in_period(self, start, end):
+        return self.filter(date__gte=start, date__lte=end)
+
+    def by_vendor(self, start, end):
+        """Spend and units per vendor over the period, largest first."""
+        return (
+            self.in_period(start, end)
+            .values('vendor')
+            .annotate(spend=Sum('spend'), units=Sum('units'))
+            .order_by('-spend', 'vendor')
+        )
+
+    def by_vendor_and_product(self, start, end):
+        """Spend and units per vendor and product over the period."""
+        return (
+            self.in_period(start, end)
+            .values('vendor', 'product_id', 'product__sku', 'product__name')
+            .annotate(spend=Sum('spend'), units=Sum('units'))
+            .order_by('vendor', '-spend', 'product_id')
+        )
+
+
+class DailyVendorSpend(models.Model):
+    """Purchase order spend and units per vendor, product and order date, maintained by ``refresh_rollups``."""
+    date = models.DateField()
+    vendor = models.CharField(max_length=255)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    spend = models.DecimalField(max_digits=14, decimal_places=2)
+    units = models.BigIntegerField()
+    line_count = models.PositiveIntegerField()
+
+    objects = DailyVendorSpendManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'vendor', 'product'], name='daily_spend_date_vendor_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.vendor} {self.product_id}: {self.spend}"
+
+
+class ArchivedDailyProductSales(models.Model):
+    """DailyProductSales for archived invoices, maintained by ``refresh_rollups``."""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    units = models.BigIntegerField()
+    line_count = models.PositiveIntegerField()
+
+    objects = DailyProductSalesManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='archived_sales_date_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.revenue}"
+
+
+class ArchivedDailyVendorSpend(models.Model):
+    """DailyVendorSpend for archived purchase orders, maintained by ``refresh_rollups``."""
+    date = models.DateField()
+    vendor = models.CharField(max_length=255)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    spend = models.DecimalField(max_digits=14, decimal_places=2)
+    units = models.BigIntegerField()
+    line_count = models.PositiveIntegerField()
+
+    objects = DailyVendorSpendManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'vendor', 'product'], name='archived_spend_date_vendor_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.vendor} {self.product_id}: {self.spend}"
+
+
+class RollupState(models.Model):
+    """How far a rollup has been refreshed: orders changed after ``watermark`` are not yet included."""
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+
+class RollupDirtyDate(models.Model):
+    """A date whose rollup rows must be recomputed because an order on it was deleted."""
+    name = models.CharField(max_length=50)
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'date'], name='rollup_dirty_name_date_uniq'),
+        ]
+
+
+class StockMovement(models.Model):
+    """
+    One change to a product's stock on hand. The ledger is append-only: it is
+    written by inventory.py and corrected with adjustments, never edited.
+    """
+
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('sale', 'Sale'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    SOURCE_TYPE_CHOICES = [
+        ('invoice_line', 'Invoice line item'),
+        ('purchase_order_line', 'Purchase order line item'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.BigIntegerField(help_text="Units added (positive) or removed (negative).")
+    source_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="ID of the purchase order or invoice line item that caused the movement. "
+        "A plain ID rather than a foreign key, so the ledger outlives the order."
+    )
+    source_type = models.CharField(
+        max_length=20,
+        choices=SOURCE_TYPE_CHOICES,
+        null=True,
+        blank=True,
+        help_text="Which kind of line item source_id refers to; their IDs overlap."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # A line item is received or sold once; also finds its movement.
+            # Edits and deletes add any number of adjustments.
+            models.UniqueConstraint(
+                fields=['kind', 'source_id'], condition=Q(kind__in=['receipt', 'sale']), name='stockmovement_source_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'id'], name='stockmovement_product_idx'),
+            # A line item's movements, adjustments included.
+            models.Index(fields=['source_type', 'source_id'], name='stockmovement_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.quantity} x {self.product_id}"
+
+
+class StockLevelManager(models.Manager):
+
+    def low_stock(self, threshold=None):
+        """Stocked products with at most ``threshold`` units on hand, fewest first."""
+        if threshold is None:
+            threshold = settings.LOW_STOCK_THRESHOLD
+        return self.filter(on_hand__lte=threshold).select_related('product').order_by('on_hand', 'product_id')
+
+
+class StockLevel(models.Model):
+    """
+    Stock on hand per product: the sum of its StockMovement rows, kept in step
+    by inventory.py. Products never received or sold have no row.
+    """
+    product = models.OneToOneField(Product, primary_key=True, on_delete=models.CASCADE, related_name='stock')
+    on_hand = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StockLevelManager()
+
+    class Meta:
+        indexes = [
+            # Low-stock listings.
+            models.Index(fields=['on_hand', 'product'], name='stocklevel_on_hand_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.on_hand} on hand"
+
+
+# Archive tables. Settled orders are moved here by archive.py, keeping their
+# IDs, so the live tables and their indexes only hold orders still in use.
+
+class ArchivedInvoice(models.Model):
+    """A paid invoice moved out of Invoice. Same columns, plus when it was archived."""
+    id = models.BigIntegerField(primary_key=True)
+    customer_name = models.CharField(max_length=255)
+    invoice_date = models.DateField()
+    due_date = models.DateField()
+    status = models.CharField(max_length=10, choices=Invoice.STATUS_CHOICES)
+    updated_at = models.DateTimeField()
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    line_count = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(help_text="Also the rollup watermark for archived invoices.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['invoice_date'], name='archived_invoice_date_idx'),
+            models.Index(fields=['archived_at'], name='archived_invoice_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Invoice-{self.id} for {self.customer_name} (archived)"
+
+
+class ArchivedInvoiceLineItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    invoice = models.ForeignKey(ArchivedInvoice, on_delete=models.CASCADE, related_name='line_items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+    price_each = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in Invoice-{self.invoice_id} (archived)"
+
+
+class ArchivedPurchaseOrder(models.Model):
+    """A completed or canceled purchase order moved out of PurchaseOrder. Same columns, plus when it was archived."""
+    id = models.BigIntegerField(primary_key=True)
+    vendor = models.CharField(max_length=255)
+    order_date = models.DateField()
+    status = models.CharField(max_length=10, choices=PurchaseOrder.STATUS_CHOICES)
+    updated_at = models.DateTimeField()
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    line_count = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(help_text="Also the rollup watermark for archived purchase orders.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date'], name='archived_po_date_idx'),
+            models.Index(fields=['archived_at'], name='archived_po_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"PO-{self.id} ({self.vendor}) (archived)"
+
+
+class ArchivedPurchaseOrderLineItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    purchase_order = models.ForeignKey(ArchivedPurchaseOrder, on_delete=models.CASCADE, related_name='line_items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+    cost = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in PO-{self.purchase_order_id} (archived)"
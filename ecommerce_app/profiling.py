@@ -0,0 +1,168 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PROFILE_SUFFIX = '.prof'
+
+# Run in a fresh interpreter by measure_startup. Prints the setup time and the loaded modules.
+STARTUP_SCRIPT = '''
+import importlib, json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+if {urls!r}:
+    from django.conf import settings
+    importlib.import_module(settings.ROOT_URLCONF)
+print(json.dumps({{'seconds': time.perf_counter() - started, 'modules': sorted(sys.modules)}}))
+'''
+
+# One line of ``python -X importtime`` output: self and cumulative microseconds, then the module.
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def profile_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_profile(profiler, label):
+    """Write ``profiler``'s stats to the profile directory and prune old files."""
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-')[:80] or 'root'
+    path = profile_dir() / f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**6:06d}-{slug}{PROFILE_SUFFIX}"
+    profiler.dump_stats(path)
+    for stale in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        stale.unlink(missing_ok=True)
+    return path
+
+
+def list_profiles():
+    """Saved profiles, newest first."""
+    try:
+        paths = [entry for entry in os.scandir(settings.PROFILING_DIR) if entry.name.endswith(PROFILE_SUFFIX)]
+    except FileNotFoundError:
+        return []
+    paths.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [Path(entry.path) for entry in paths]
+
+
+def get_profile(name):
+    """Return the saved profile called ``name``, or None. Only bare file names are accepted."""
+    if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+        return None
+    path = Path(settings.PROFILING_DIR) / name
+    return path if path.is_file() else None
+
+
+def top_functions(path, limit=40, sort='cumulative'):
+    """The ``limit`` most expensive functions in a saved profile, as pstats text."""
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def measure_startup(urls=False, importtime=False):
+    """
+    Time a cold ``django.setup()`` (and URLconf import, with ``urls``) in a
+    new interpreter, as ``manage.py`` and worker boot do.
+
+    Returns ``(seconds, modules, imports)``: the modules loaded afterwards,
+    and with ``importtime`` the per-module import times as
+    ``(module, self_us, cumulative_us, depth)``. Import timing slows the
+    run, so don't compare its ``seconds`` with a run without it.
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+    result = subprocess.run(
+        command + ['-c', STARTUP_SCRIPT.format(urls=urls)],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR, check=True,
+    )
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return output['seconds'], output['modules'], imports
+
+
+def start_profiler():
+    """Return an enabled profiler, or None if another one is already active in this thread."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+class ProfilingMiddleware:
+    """
+    Profile a sample of requests with cProfile and save the stats to PROFILING_DIR.
+
+    A request is profiled with probability PROFILING_SAMPLE_RATE, or on demand
+    when a staff user sends an ``X-Profile`` header or a ``_profile`` query
+    parameter. Must come after AuthenticationMiddleware.
+
+    Under ASGI only the event loop thread is profiled, so time spent in ORM
+    calls shows up as waiting rather than as the functions that ran.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def requested(self, request):
+        return 'X-Profile' in request.headers or '_profile' in request.GET
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not (self.sampled() or (self.requested(request) and request.user.is_staff)):
+            return self.get_response(request)
+        profiler = start_profiler()
+        if profiler is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        return self.finish(request, response, profiler)
+
+    async def __acall__(self, request):
+        if not (self.sampled() or (self.requested(request) and (await request.auser()).is_staff)):
+            return await self.get_response(request)
+        profiler = start_profiler()
+        if profiler is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        return self.finish(request, response, profiler)
+
+    def finish(self, request, response, profiler):
+        path = save_profile(profiler, f"{request.method} {request.path}")
+        response['X-Profile-File'] = path.name
+        return response
@@ -0,0 +1,196 @@
+import datetime
+from itertools import islice
+from .models import AGING_BUCKETS, Invoice, InvoiceLineItem, Product, PurchaseOrder, PurchaseOrderLineItem
+
+# Rows read per query chunk when loading line items into DataFrames.
+READ_CHUNK_SIZE = 20000
+
+# Invoice lines whose unit price is this many robust standard deviations from
+# the product's median price are reported as outliers.
+OUTLIER_THRESHOLD = 3.5
+
+
+def aging_report(as_of=None):
+    """
+    Build the accounts-receivable aging report.
+
+    The per-customer bucket sums come from ``Invoice.objects.aging_by_customer``;
+    row totals, bucket totals and each bucket's share of the outstanding amount
+    are then computed on the resulting matrix with NumPy.
+    """
+    import numpy as np
+
+    as_of = as_of or datetime.date.today()
+    names = [name for name, label, min_days, max_days in AGING_BUCKETS]
+    rows = list(Invoice.objects.aging_by_customer(as_of).values_list('customer_name', *names))
+
+    customers = [row[0] for row in rows]
+    amounts = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(names))
+    customer_totals = amounts.sum(axis=1)
+    bucket_totals = amounts.sum(axis=0)
+    grand_total = float(bucket_totals.sum())
+    shares = bucket_totals / grand_total * 100 if grand_total else np.zeros(len(names))
+    # Customers with the oldest debt first, then by amount outstanding.
+    oldest = np.where(amounts > 0, np.arange(len(names)), -1).max(axis=1, initial=-1)
+    order = np.lexsort((-customer_totals, -oldest))
+
+    return {
+        'as_of': as_of,
+        'buckets': [label for name, label, min_days, max_days in AGING_BUCKETS],
+        'rows': [
+            {
+                'customer_name': customers[i],
+                'amounts': amounts[i].round(2).tolist(),
+                'total': round(float(customer_totals[i]), 2),
+            }
+            for i in order
+        ],
+        'bucket_totals': bucket_totals.round(2).tolist(),
+        'bucket_shares': shares.round(1).tolist(),
+        'grand_total': round(grand_total, 2),
+    }
+
+
+def read_frame(queryset, columns, chunk_size=READ_CHUNK_SIZE):
+    """
+    Load line item columns into a DataFrame, ``chunk_size`` rows at a time.
+
+    ``columns`` maps DataFrame column names to ``(lookup, dtype)``. Each chunk
+    is converted to its dtypes as it is read, so Decimal and date objects for
+    the whole table never exist at once.
+    """
+    import pandas as pd
+
+    names = list(columns)
+    dtypes = {name: dtype for name, (lookup, dtype) in columns.items()}
+    rows = queryset.values_list(*[lookup for lookup, dtype in columns.values()]).iterator(chunk_size=chunk_size)
+    frames = []
+    while chunk := list(islice(rows, chunk_size)):
+        frames.append(pd.DataFrame.from_records(chunk, columns=names).astype(dtypes))
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in dtypes.items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def margin_report(start=None, end=None):
+    """
+    Realized margin per product on invoices dated ``start`` to ``end`` (inclusive).
+
+    Each invoice line is costed at the product's cumulative weighted average
+    purchase cost as of the invoice date: total cost over total units of all
+    non-canceled purchase orders up to that day, joined with ``merge_asof``.
+    Archived orders are read too, so archiving does not change the figures.
+    Lines for products not yet purchased have no cost and are left out of
+    the margin figures. Invoice lines whose unit price is far from the
+    product's median price (by median absolute deviation) are flagged as
+    outliers. Everything after the two chunked reads is vectorized.
+    """
+    import numpy as np
+    import pandas as pd
+
+    end = end or datetime.date.today()
+    start = start or end - datetime.timedelta(days=364)
+
+    purchase_columns = {
+        'product_id': ('product_id', 'int64'), 'date': ('purchase_order__order_date', 'datetime64[ns]'),
+        'quantity': ('quantity', 'int64'), 'cost': ('cost', 'float64'),
+    }
+    purchases = read_frame(
+        PurchaseOrderLineItem.objects.including_archived(
+            *[lookup for lookup, dtype in purchase_columns.values()],
+            purchase_order__status__in=[status for status, label in PurchaseOrder.STATUS_CHOICES if status != 'canceled'],
+            purchase_order__order_date__lte=end,
+        ),
+        purchase_columns,
+    )
+    sale_columns = {
+        'invoice_id': ('invoice_id', 'int64'), 'product_id': ('product_id', 'int64'),
+        'date': ('invoice__invoice_date', 'datetime64[ns]'), 'quantity': ('quantity', 'int64'),
+        'price': ('price_each', 'float64'),
+    }
+    sales = read_frame(
+        InvoiceLineItem.objects.including_archived(
+            *[lookup for lookup, dtype in sale_columns.values()],
+            invoice__invoice_date__gte=start, invoice__invoice_date__lte=end,
+        ),
+        sale_columns,
+    )
+
+    # Cumulative units and cost bought per product at the end of each purchase day.
+    bought = purchases.groupby(['product_id', 'date'], as_index=False)[['quantity', 'cost']].sum()
+    bought = bought.sort_values(['product_id', 'date'])
+    bought[['cum_quantity', 'cum_cost']] = bought.groupby('product_id')[['quantity', 'cost']].cumsum()
+    bought = bought[bought['cum_quantity'] > 0]
+    bought['avg_cost'] = bought['cum_cost'] / bought['cum_quantity']
+
+    sales = pd.merge_asof(
+        sales.sort_values('date'),
+        bought[['product_id', 'date', 'avg_cost']].sort_values('date'),
+        on='date', by='product_id', direction='backward',
+    )
+    sales['revenue'] = sales['quantity'] * sales['price']
+    sales['cogs'] = sales['quantity'] * sales['avg_cost']
+    costed = sales[sales['avg_cost'].notna()]
+
+    # Robust z-score of each line's unit price against its product's prices.
+    median = sales.groupby('product_id')['price'].transform('median')
+    mad = (sales['price'] - median).abs().groupby(sales['product_id']).transform('median')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(mad > 0, 0.6745 * (sales['price'] - median) / mad, 0.0)
+    sales['median_price'], sales['score'] = median, score
+    outliers = sales[np.abs(sales['score']) > OUTLIER_THRESHOLD]
+    outliers = outliers.reindex(outliers['score'].abs().sort_values(ascending=False).index).head(50)
+
+    per_product = costed.groupby('product_id').agg(
+        units=('quantity', 'sum'), revenue=('revenue', 'sum'), cogs=('cogs', 'sum'),
+    )
+    per_product['margin'] = per_product['revenue'] - per_product['cogs']
+    per_product['avg_price'] = per_product['revenue'] / per_product['units']
+    per_product['avg_cost'] = per_product['cogs'] / per_product['units']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_product['margin_pct'] = np.where(
+            per_product['revenue'] > 0, per_product['margin'] / per_product['revenue'] * 100, np.nan
+        )
+    per_product = per_product.sort_values('margin', ascending=False)
+
+    monthly = costed.groupby(costed['date'].dt.to_period('M'))[['revenue', 'cogs']].sum()
+    monthly['margin'] = monthly['revenue'] - monthly['cogs']
+
+    products = dict(
+        (pk, (sku, name)) for pk, sku, name in Product.objects.filter(
+            pk__in=set(per_product.index) | set(outliers['product_id'])
+        ).values_list('pk', 'sku', 'name')
+    )
+    totals = costed[['revenue', 'cogs']].sum()
+
+    def money(value):
+        return round(float(value), 2)
+
+    return {
+        'start': start,
+        'end': end,
+        'products': [
+            {
+                'sku': products[pk][0], 'name': products[pk][1], 'units': int(row.units),
+                'avg_price': money(row.avg_price), 'avg_cost': money(row.avg_cost),
+                'revenue': money(row.revenue), 'cogs': money(row.cogs), 'margin': money(row.margin),
+                'margin_pct': None if np.isnan(row.margin_pct) else round(float(row.margin_pct), 1),
+            }
+            for pk, row in per_product.iterrows()
+        ],
+        'monthly': [
+            {'month': str(month), 'revenue': money(row.revenue), 'cogs': money(row.cogs), 'margin': money(row.margin)}
+            for month, row in monthly.iterrows()
+        ],
+        'outliers': [
+            {
+                'invoice_id': int(row.invoice_id), 'sku': products[row.product_id][0], 'date': row.date.date(),
+                'price': money(row.price), 'median_price': money(row.median_price), 'score': round(float(row.score), 1),
+            }
+            for row in outliers.itertuples()
+        ],
+        'revenue': money(totals['revenue']),
+        'cogs': money(totals['cogs']),
+        'margin': money(totals['revenue'] - totals['cogs']),
+        'uncosted_lines': int(sales['avg_cost'].isna().sum()),
+    }
@@ -0,0 +1,148 @@
+import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from .models import (
+    ArchivedDailyProductSales, ArchivedDailyVendorSpend, ArchivedInvoice, ArchivedInvoiceLineItem,
+    ArchivedPurchaseOrder, ArchivedPurchaseOrderLineItem, DailyProductSales, DailyVendorSpend, Invoice,
+    InvoiceLineItem, PurchaseOrder, PurchaseOrderLineItem, RollupDirtyDate, RollupState,
+)
+
+# How each rollup is built: the orders and line items it summarizes, the
+# order date it is bucketed by, the field that tells which orders changed
+# since the last refresh, the columns it is grouped by (as lookups from the
+# line item) and the amount it sums. Archived orders have their own rollups;
+# they only change when more orders are archived.
+ROLLUPS = {
+    'sales': {
+        'parent': Invoice,
+        'line_model': InvoiceLineItem,
+        'fk': 'invoice',
+        'date_field': 'invoice_date',
+        'changed_field': 'updated_at',
+        'model': DailyProductSales,
+        'keys': {'product_id': 'product_id'},
+        'amount': ('revenue', F('quantity') * F('price_each')),
+    },
+    'purchasing': {
+        'parent': PurchaseOrder,
+        'line_model': PurchaseOrderLineItem,
+        'fk': 'purchase_order',
+        'date_field': 'order_date',
+        'changed_field': 'updated_at',
+        'model': DailyVendorSpend,
+        'keys': {'vendor': 'purchase_order__vendor', 'product_id': 'product_id'},
+        'amount': ('spend', F('cost')),
+    },
+    'archived_sales': {
+        'parent': ArchivedInvoice,
+        'line_model': ArchivedInvoiceLineItem,
+        'fk': 'invoice',
+        'date_field': 'invoice_date',
+        'changed_field': 'archived_at',
+        'model': ArchivedDailyProductSales,
+        'keys': {'product_id': 'product_id'},
+        'amount': ('revenue', F('quantity') * F('price_each')),
+    },
+    'archived_purchasing': {
+        'parent': ArchivedPurchaseOrder,
+        'line_model': ArchivedPurchaseOrderLineItem,
+        'fk': 'purchase_order',
+        'date_field': 'order_date',
+        'changed_field': 'archived_at',
+        'model': ArchivedDailyVendorSpend,
+        'keys': {'vendor': 'purchase_order__vendor', 'product_id': 'product_id'},
+        'amount': ('spend', F('cost')),
+    },
+}
+
+
+def rollup_for_parent(parent_model):
+    """Return the name of the rollup summarizing ``parent_model``, or None."""
+    for name, spec in ROLLUPS.items():
+        if spec['parent'] is parent_model:
+            return name
+    return None
+
+
+def refresh_rollup(name, full=False):
+    """
+    Bring the ``name`` rollup up to date and return the number of days recomputed.
+
+    Every line item change bumps its order's ``updated_at`` (``archived_at``
+    for archived orders), so the days to recompute are the dates of orders
+    changed since the last refresh's watermark, plus the dates of deleted orders noted in ``RollupDirtyDate``.
+    Each affected day is rebuilt from its line items, so a refresh costs
+    O(line items on changed days). The watermark is moved back by
+    ``ROLLUP_WATERMARK_OVERLAP`` to catch transactions that committed late;
+    recomputing a day twice is harmless. ``full`` recomputes every day.
+    """
+    spec = ROLLUPS[name]
+    state, created = RollupState.objects.get_or_create(name=name)
+    started = timezone.now()
+
+    parents = spec['parent'].objects.all()
+    if state.watermark and not full:
+        since = state.watermark - datetime.timedelta(seconds=settings.ROLLUP_WATERMARK_OVERLAP)
+        parents = parents.filter(**{f"{spec['changed_field']}__gt": since})
+    dates = set(parents.order_by().values_list(spec['date_field'], flat=True).distinct())
+    dirty = list(RollupDirtyDate.objects.filter(name=name).values_list('pk', 'date'))
+    dates.update(date for pk, date in dirty)
+    if full:
+        dates.update(spec['model'].objects.order_by().values_list('date', flat=True).distinct())
+
+    dates = sorted(dates)
+    for i in range(0, len(dates), settings.ROLLUP_CHUNK_DAYS):
+        recompute_days(spec, dates[i:i + settings.ROLLUP_CHUNK_DAYS])
+    RollupDirtyDate.objects.filter(pk__in=[pk for pk, date in dirty]).delete()
+    state.watermark = started
+    state.save(update_fields=['watermark'])
+    return len(dates)
+
+
+def recompute_days(spec, dates):
+    """Replace the rollup rows for ``dates`` with fresh sums over their line items."""
+    amount_field, amount = spec['amount']
+    order_date = f"{spec['fk']}__{spec['date_field']}"
+    rows = (
+        spec['line_model'].objects.filter(**{f"{order_date}__in": dates})
+        .values(
+            *[key for key, lookup in spec['keys'].items() if key == lookup],
+            date=F(order_date),
+            **{key: F(lookup) for key, lookup in spec['keys'].items() if key != lookup},
+        )
+        .annotate(amount=Sum(amount), units=Sum('quantity'), line_count=Count('pk'))
+        .order_by()
+    )
+    with transaction.atomic():
+        spec['model'].objects.filter(date__in=dates).delete()
+        spec['model'].objects.bulk_create(
+            [
+                spec['model'](
+                    **{key: row[key] for key in ('date', *spec['keys'], 'units', 'line_count')},
+                    **{amount_field: row['amount']},
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+def merge_rows(keys, *row_lists):
+    """
+    Add up the rows of several rollup queries, such as a live rollup and its
+    archive, that share the grouping ``keys``. Returns dicts in first-seen order.
+    """
+    merged = {}
+    for rows in row_lists:
+        for row in rows:
+            key = tuple(row[name] for name in keys)
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            for name, value in row.items():
+                if name not in keys and isinstance(value, (int, Decimal)):
+                    merged[key][name] += value
+    return list(merged.values())
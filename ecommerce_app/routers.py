@@ -0,0 +1,42 @@
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set by ReplicaRoutingMiddleware for the current request: ``reads`` says
+# whether reads may go to the replica, ``wrote`` whether anything was written.
+# A mutable dict so that writes made in sync_to_async threads are seen here.
+replica_state = ContextVar('replica_state', default=None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to ``settings.DATABASE_REPLICA`` and writes to the primary.
+
+    Only requests that ReplicaRoutingMiddleware marked as read-only read
+    from the replica; management commands, jobs and anything outside a
+    request always use the primary. The first write pins the rest of the
+    request to the primary, so it reads its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = replica_state.get()
+        if settings.DATABASE_REPLICA and state is not None and state['reads']:
+            return settings.DATABASE_REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = replica_state.get()
+        if state is not None:
+            state['reads'] = False
+            state['wrote'] = True
+        # Explicit, since Django would otherwise save an instance read from
+        # the replica back to the replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema from the primary.
+        return db != settings.DATABASE_REPLICA
@@ -0,0 +1,159 @@
+import hashlib
+import re
+import unicodedata
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from .models import Invoice, Product, PurchaseOrder, SearchToken, prefix_range
+
+# The fields whose words are indexed for each searchable model.
+SEARCH_FIELDS = {
+    Invoice: ('customer_name',),
+    PurchaseOrder: ('vendor',),
+    Product: ('sku', 'name'),
+}
+
+# Fields also indexed with their words run together, so that codes are found
+# whatever punctuation the search has: "LAP-1" finds LAP123, "lap12" LAP-123.
+COMPACT_FIELDS = {
+    Product: ('sku',),
+}
+
+TOKEN_MAX_LENGTH = SearchToken._meta.get_field('token').max_length
+
+# Matches counted per word to find the rarest word of a multi-word search.
+SELECTIVITY_SAMPLE = 1000
+
+PRODUCT_SEARCH_VERSION_KEY = 'product-search-version'
+
+# Cached for searches matching more than PRODUCT_SEARCH_CACHE_MAX_RESULTS products.
+TOO_MANY = 'too-many'
+
+
+def words(text):
+    """The casefolded, accent-free words of letters and digits in ``text``, in any script, in order."""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return re.findall(r'[^\W_]+', text)
+
+
+def tokenize(text):
+    """Split ``text`` into casefolded, accent-free words of letters and digits, in any script."""
+    return {word[:TOKEN_MAX_LENGTH] for word in words(text)}
+
+
+def compact(text):
+    """The words of ``text`` run together as one token, e.g. "lap123" for "LAP-123"."""
+    return ''.join(words(text))[:TOKEN_MAX_LENGTH]
+
+
+def object_tokens(model, obj):
+    tokens = set().union(*(tokenize(getattr(obj, field)) for field in SEARCH_FIELDS[model]))
+    tokens.update(compact(getattr(obj, field)) for field in COMPACT_FIELDS.get(model, ()))
+    tokens.discard('')
+    return sorted(tokens)
+
+
+def build_tokens(model, objects):
+    return [
+        SearchToken(model=model._meta.model_name, object_id=obj.pk, token=token)
+        for obj in objects
+        for token in object_tokens(model, obj)
+    ]
+
+
+def index_objects(model, objects, replace=True):
+    """Write the search tokens of saved ``objects``, replacing their old tokens unless ``replace`` is False."""
+    objects = list(objects)
+    if not replace:
+        SearchToken.objects.bulk_create(build_tokens(model, objects), batch_size=1000)
+        return
+    with transaction.atomic():
+        unindex_objects(model, [obj.pk for obj in objects])
+        SearchToken.objects.bulk_create(build_tokens(model, objects), batch_size=1000)
+
+
+def unindex_objects(model, pks):
+    SearchToken.objects.filter(model=model._meta.model_name, object_id__in=pks).delete()
+
+
+def search(queryset, term):
+    """
+    Filter ``queryset`` to objects that have a word starting with each word of ``term``.
+
+    Each word is a range scan on the token index. The rarest word, found with
+    capped counts, supplies the candidate IDs and the other words are checked
+    per candidate, so the cost follows the number of matches rather than the
+    table size. For models with ``COMPACT_FIELDS``, the term's words run
+    together also match as one word. A numeric term also matches the object
+    ID. A term with no words matches nothing.
+    """
+    model_name = queryset.model._meta.model_name
+
+    def matching(word):
+        low, high = prefix_range(word)
+        return SearchToken.objects.filter(model=model_name, token__gte=low, token__lt=high)
+
+    words = sorted(tokenize(term))
+    if len(words) > 1:
+        words.sort(key=lambda word: matching(word)[:SELECTIVITY_SAMPLE].count())
+    is_id = term.strip().isdigit()
+    if not words and not is_id:
+        return queryset.none()
+    condition = Q()
+    if words:
+        rarest, *others = words
+        condition = Q(pk__in=matching(rarest).values('object_id'))
+        for word in others:
+            condition &= Q(Exists(matching(word).filter(object_id=OuterRef('pk'))))
+    if len(words) > 1 and queryset.model in COMPACT_FIELDS:
+        condition |= Q(pk__in=matching(compact(term)).values('object_id'))
+    if is_id:
+        condition |= Q(pk=int(term))
+    return queryset.filter(condition)
+
+
+def rebuild_index(model, batch_size=1000):
+    """Replace all search tokens of ``model``, reading it in primary key order. Returns the number indexed."""
+    SearchToken.objects.filter(model=model._meta.model_name).delete()
+    fields = SEARCH_FIELDS[model]
+    indexed = last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:batch_size])
+        if not batch:
+            return indexed
+        index_objects(model, batch, replace=False)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+def product_search_version():
+    return cache.get_or_set(PRODUCT_SEARCH_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def invalidate_product_search():
+    """Forget all cached product searches, e.g. after a product is added or renamed."""
+    cache.set(PRODUCT_SEARCH_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def cached_product_ids(term):
+    """
+    IDs of the products matching the search ``term``, from the cache.
+
+    Typed prefixes repeat a lot in the autocomplete widgets, so their matches
+    are cached until a product changes. Returns None when a search matches
+    too many products to be worth caching; run the indexed query instead.
+    """
+    # The compact form tells apart terms with the same words in another order.
+    digest = hashlib.sha1(f"{' '.join(sorted(tokenize(term)))}|{compact(term)}".encode()).hexdigest()
+    cache_key = f"product-search:{product_search_version()}:{digest}"
+    ids = cache.get(cache_key)
+    if ids is None:
+        limit = settings.PRODUCT_SEARCH_CACHE_MAX_RESULTS
+        ids = list(search(Product.objects.all(), term).values_list('pk', flat=True)[:limit + 1])
+        if len(ids) > limit:
+            ids = TOO_MANY
+        cache.set(cache_key, ids, settings.PRODUCT_SEARCH_CACHE_TIMEOUT)
+    return None if ids == TOO_MANY else ids
@@ -0,0 +1,84 @@
+from decimal import Decimal
+from rest_framework import serializers
+from .models import Invoice, InvoiceLineItem, Product, PurchaseOrder, PurchaseOrderLineItem
+
+
+class SparseFieldsMixin:
+    """Limit the serialized fields to those listed in ``?fields=a,b,c``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        # Only the top-level serializer reacts; nested ones keep their fields.
+        if request is None or self.parent is not None:
+            return
+        wanted = requested_fields(request)
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+def requested_fields(request):
+    """The set of fields named in ``?fields=``, or None if all fields are wanted."""
+    fields = request.query_params.get('fields')
+    return {name.strip() for name in fields.split(',') if name.strip()} if fields else None
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'sku', 'name', 'unit_price']
+
+
+class InvoiceLineItemSerializer(serializers.ModelSerializer):
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = InvoiceLineItem
+        fields = ['id', 'invoice', 'product', 'sku', 'product_name', 'quantity', 'price_each', 'line_total']
+
+
+class PurchaseOrderLineItemSerializer(serializers.ModelSerializer):
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = PurchaseOrderLineItem
+        fields = ['id', 'purchase_order', 'product', 'sku', 'product_name', 'quantity', 'cost']
+
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    line_items = InvoiceLineItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Invoice
+        fields = [
+            'id', 'customer_name', 'invoice_date', 'due_date', 'status',
+            'total', 'line_count', 'updated_at', 'line_items',
+        ]
+
+
+class PurchaseOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    line_items = PurchaseOrderLineItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = ['id', 'vendor', 'order_date', 'status', 'total', 'line_count', 'updated_at', 'line_items']
+
+
+class NewInvoiceLineItemSerializer(serializers.Serializer):
+    # A plain integer rather than a related field, so validating a batch does
+    # not look up each product; the view checks them all with one query.
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0)
+    price_each = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+
+
+class NewInvoiceSerializer(serializers.Serializer):
+    customer_name = serializers.CharField(max_length=255)
+    invoice_date = serializers.DateField(required=False)
+    due_date = serializers.DateField()
+    status = serializers.ChoiceField(choices=Invoice.STATUS_CHOICES, default='unpaid')
+    line_items = NewInvoiceLineItemSerializer(many=True, allow_empty=True)
@@ -0,0 +1,137 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from . import inventory
+from .models import Invoice, Product, PurchaseOrder, PurchaseOrderLineItem, InvoiceLineItem, RollupDirtyDate
+from .rollups import ROLLUPS, rollup_for_parent
+from .search import SEARCH_FIELDS, index_objects, invalidate_product_search, unindex_objects
+
+# True while suppress_order_signals() is active.
+order_signals_suppressed = ContextVar('order_signals_suppressed', default=False)
+
+
+@contextmanager
+def suppress_order_signals():
+    """
+    Skip the per-row bookkeeping of the order delete receivers below: parent
+    totals, search tokens and rollup dates. For code that deletes orders in
+    bulk and does that bookkeeping itself, such as archive.py.
+    """
+    token = order_signals_suppressed.set(True)
+    try:
+        yield
+    finally:
+        order_signals_suppressed.reset(token)
+
+
+@receiver(pre_delete, sender=PurchaseOrderLineItem)
+@receiver(pre_delete, sender=InvoiceLineItem)
+def lock_deleted_line_item(sender, instance, using, **kwargs):
+    """
+    Keep the stored row of a line item about to be deleted, locked until the
+    deletion commits, for the ``post_delete`` receivers below to undo.
+    """
+    if order_signals_suppressed.get():
+        return
+    instance._deleted_row = instance.select_saved(using)
+
+
+@receiver(post_delete, sender=PurchaseOrderLineItem)
+@receiver(post_delete, sender=InvoiceLineItem)
+def subtract_deleted_line_item(sender, instance, **kwargs):
+    """Remove a deleted line item from its parent's stored totals.
+
+    Runs inside the deletion transaction, including for cascaded deletes
+    (e.g. when a product is removed). A line item already deleted by a
+    concurrent transaction is not subtracted twice.
+    """
+    if order_signals_suppressed.get() or instance._deleted_row is None:
+        return
+    old = instance._deleted_row.contribution()
+    instance.apply_to_parent(old[0], -old[1], -1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """Drop cached product searches, which may now be missing or listing this product."""
+    invalidate_product_search()
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_save, sender=Product)
+def index_saved_object(sender, instance, created, update_fields, **kwargs):
+    """Refresh the search tokens of a saved object, unless none of its searchable fields were saved."""
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS[sender]):
+        return
+    index_objects(sender, [instance], replace=not created)
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=PurchaseOrder)
+@receiver(post_delete, sender=Product)
+def unindex_deleted_object(sender, instance, **kwargs):
+    if order_signals_suppressed.get():
+        return
+    unindex_objects(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=PurchaseOrder)
+def mark_rollup_date_dirty(sender, instance, **kwargs):
+    """Note the date of a deleted order, which the rollup watermark cannot see."""
+    if order_signals_suppressed.get():
+        return
+    name = rollup_for_parent(sender)
+    date = getattr(instance, ROLLUPS[name]['date_field'])
+    RollupDirtyDate.objects.bulk_create([RollupDirtyDate(name=name, date=date)], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=InvoiceLineItem)
+def sell_stock(sender, instance, created, **kwargs):
+    """Take a new invoice line's units out of stock; edits to a sold line are corrected with adjustments."""
+    if created:
+        inventory.record_movements(inventory.sale_movements([instance]))
+    elif instance._saved_stock != instance.stock_position() and inventory.in_stock(instance):
+        inventory.record_movements(inventory.adjustment_movements(instance, instance._saved_stock, instance.stock_position()))
+
+
+@receiver(post_save, sender=PurchaseOrderLineItem)
+def receive_added_line(sender, instance, created, **kwargs):
+    """Put a line added to an already completed purchase order into stock, and adjust for edits to received lines."""
+    if created:
+        if instance.purchase_order.status == 'completed':
+            inventory.record_movements(inventory.receipt_movements([instance]))
+    elif instance._saved_stock != instance.stock_position() and inventory.in_stock(instance):
+        inventory.record_movements(inventory.adjustment_movements(instance, instance._saved_stock, instance.stock_position()))
+
+
+@receiver(post_delete, sender=PurchaseOrderLineItem)
+@receiver(post_delete, sender=InvoiceLineItem)
+def return_deleted_line_stock(sender, instance, origin=None, **kwargs):
+    """
+    Undo a deleted line item's effect on stock, including for lines deleted
+    with their order. Not for archived orders, nor for deleted products,
+    whose ledger and stock level go with them.
+    """
+    if order_signals_suppressed.get() or isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        return
+    saved = instance._deleted_row
+    if saved is not None and inventory.in_stock(saved):
+        inventory.record_movements(inventory.adjustment_movements(saved, saved.stock_position(), None))
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def receive_completed_order(sender, instance, created, **kwargs):
+    """Put a purchase order's line items into stock when it becomes completed, and take them out if it is reopened."""
+    # A new order has no line items yet; they are received as they are added.
+    previous = getattr(instance, '_saved_from_status', None)
+    if created or previous == instance.status or 'completed' not in (previous, instance.status):
+        return
+    if instance.status == 'completed':
+        inventory.receive_purchase_order(instance.pk)
+    else:
+        inventory.reopen_purchase_order(instance.pk)
+    instance._saved_from_status = instance.status
@@ -0,0 +1,20 @@
+class StockTrackingMixin:
+    """
+    Remembers a line item's stored effect on stock across a save, as
+    ``_saved_stock``, for the stock receivers in ``signals.py`` to turn edits
+    into ledger adjustments; inventory.py writes the ledger.
+
+    Comes before ``ParentTotalsMixin`` in the bases and reuses the stored row it
+    reads under a lock, so tracking stock costs no queries of its own.
+    """
+
+    def stock_position(self):
+        """Return ``(product_id, quantity)``, or None if fields were deferred."""
+        if self.get_deferred_fields():
+            return None
+        return self.product_id, int(self.quantity)
+
+    def select_saved(self, using=None):
+        saved = super().select_saved(using)
+        self._saved_stock = saved.stock_position() if saved else None
+        return saved
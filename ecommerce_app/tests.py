@@ -1,8 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from decimal import Decimal
 from django.db import models
 from django.utils.timezone import now, timedelta
 from .models import Product, PurchaseOrder, PurchaseOrderLineItem, Invoice, InvoiceLineItem
 
+class AdminTestCase(TestCase):
+    """Runs each test with an empty cache and the test client logged in as a superuser, ``self.user``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
 class ECommerceTestCase(TestCase):
     
     def setUp(self):
@@ -114,4 +128,1574 @@ class ECommerceTestCase(TestCase):
         """Test that the status of the purchase order updates correctly."""
         self.purchase_order.status = 'completed'  # Directly setting status
         self.purchase_order.save()
-        self.assertEqual(self.purchase_order.status, 'completed')
\ No newline at end of file
+        self.assertEqual(self.purchase_order.status, 'completed')
+
+class AdminChangelistQueryCountTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Create a product for the orders."""
+        super().setUp()
+        self.product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+
+    def create_orders(self, count):
+        for i in range(count):
+            invoice = Invoice.objects.create(
+                customer_name=f"Customer {i}",
+                due_date=now().date() - timedelta(days=1),
+            )
+            InvoiceLineItem.objects.create(invoice=invoice, product=self.product, quantity=2, price_each=50.00)
+            InvoiceLineItem.objects.create(invoice=invoice, product=self.product, quantity=1, price_each=25.00)
+            purchase_order = PurchaseOrder.objects.create(vendor=f"Vendor {i}")
+            PurchaseOrderLineItem.objects.create(purchase_order=purchase_order, product=self.product, quantity=5, cost=500.00)
+
+    def test_invoice_changelist_query_count_is_constant(self):
+        """Test that the invoice changelist does not run a query per row."""
+        self.create_orders(3)
+        with self.assertNumQueries(5):
+            response = self.client.get("/admin/ecommerce_app/invoice/")
+        self.assertContains(response, "$125.00")
+        self.create_orders(30)
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get("/admin/ecommerce_app/invoice/")
+
+    def test_purchase_order_changelist_query_count_is_constant(self):
+        """Test that the purchase order changelist does not run a query per row."""
+        self.create_orders(3)
+        with self.assertNumQueries(5):
+            response = self.client.get("/admin/ecommerce_app/purchaseorder/")
+        self.assertContains(response, "$500.00")
+        self.create_orders(30)
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get("/admin/ecommerce_app/purchaseorder/")
+
+    def test_invoice_changelist_sorts_and_filters_by_total(self):
+        """Test ordering and range filtering on the stored invoice total."""
+        self.create_orders(1)
+        large = Invoice.objects.create(customer_name="Big Spender", due_date=now().date())
+        InvoiceLineItem.objects.create(invoice=large, product=self.product, quantity=3, price_each=1000.00)
+
+        response = self.client.get("/admin/ecommerce_app/invoice/", {"total_range": "1000-10000"})
+        self.assertEqual([obj.pk for obj in response.context["cl"].result_list], [large.pk])
+
+        response = self.client.get("/admin/ecommerce_app/invoice/", {"o": "6"})
+        totals = [obj.total for obj in response.context["cl"].result_list]
+        self.assertEqual(totals, sorted(totals))
+
+
+class StoredTotalsTestCase(TestCase):
+
+    def setUp(self):
+        """Set up an invoice and purchase order with one line item each."""
+        self.product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.invoice = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        self.line_item = InvoiceLineItem.objects.create(invoice=self.invoice, product=self.product, quantity=2, price_each=100.00)
+        self.purchase_order = PurchaseOrder.objects.create(vendor="TechSupplier")
+        self.po_line_item = PurchaseOrderLineItem.objects.create(
+            purchase_order=self.purchase_order, product=self.product, quantity=5, cost=500.00
+        )
+
+    def test_totals_follow_line_item_create_update_and_delete(self):
+        """Test that stored totals track line item changes."""
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (200, 1))
+
+        item = InvoiceLineItem.objects.get(pk=self.line_item.pk)
+        item.quantity = 3
+        item.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (300, 1))
+
+        item.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (0, 0))
+
+    def test_deferred_fields_are_loaded_before_save_and_delete(self):
+        """Test that line items loaded with only() or defer() still update the totals."""
+        item = InvoiceLineItem.objects.only("quantity").get(pk=self.line_item.pk)
+        item.quantity = 4
+        item.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (400, 1))
+        InvoiceLineItem.objects.defer("price_each").get(pk=self.line_item.pk).delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (0, 0))
+
+    def test_stale_instances_apply_deltas_to_the_stored_line(self):
+        """Test that saves and deletes through instances loaded before another edit keep the totals right."""
+        first = InvoiceLineItem.objects.get(pk=self.line_item.pk)
+        second = InvoiceLineItem.objects.get(pk=self.line_item.pk)
+        first.quantity = 3
+        first.save()
+        second.quantity = 5
+        second.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (500, 1))
+        first.delete()
+        second.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.line_count), (0, 0))
+
+    def test_moving_line_item_between_parents(self):
+        """Test that reassigning a line item moves its amount to the new parent."""
+        other = PurchaseOrder.objects.create(vendor="OtherSupplier")
+        self.po_line_item.purchase_order = other
+        self.po_line_item.save()
+        self.purchase_order.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.purchase_order.total, self.purchase_order.line_count), (0, 0))
+        self.assertEqual((other.total, other.line_count), (500, 1))
+
+    def test_cascade_delete_updates_totals(self):
+        """Test that deleting a product removes its lines from the totals."""
+        self.product.delete()
+        self.invoice.refresh_from_db()
+        self.purchase_order.refresh_from_db()
+        self.assertEqual(self.invoice.total, 0)
+        self.assertEqual(self.purchase_order.total, 0)
+
+    def test_reconcile_totals_corrects_drift(self):
+        """Test that reconcile_totals reports and corrects drift from bulk updates."""
+        from io import StringIO
+        from django.core.management import call_command
+        InvoiceLineItem.objects.filter(pk=self.line_item.pk).update(quantity=7)
+        out = StringIO()
+        call_command("reconcile_totals", stdout=out)
+        self.assertIn("1 drifted", out.getvalue())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total, 700)
+
+
+class InvoiceXlsxExportTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up two invoices with line items."""
+        super().setUp()
+        product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.invoices = []
+        for quantity in (1, 3):
+            invoice = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+            InvoiceLineItem.objects.create(invoice=invoice, product=product, quantity=quantity, price_each=10.00)
+            self.invoices.append(invoice)
+
+    def test_export_xlsx_action_streams_workbook(self):
+        """Test that the export action streams a workbook with one row per invoice."""
+        from io import BytesIO
+        from openpyxl import load_workbook
+        response = self.client.post("/admin/ecommerce_app/invoice/", {
+            "action": "export_xlsx",
+            "_selected_action": [invoice.pk for invoice in self.invoices],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('filename="invoices.xlsx"', response["Content-Disposition"])
+        rows = list(load_workbook(BytesIO(b"".join(response.streaming_content))).active.values)
+        self.assertEqual(rows[0][0], "Invoice ID")
+        self.assertEqual([(row[0], row[5]) for row in rows[1:]], [(self.invoices[0].pk, 10), (self.invoices[1].pk, 30)])
+
+
+class StreamingExportTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up two invoices and a purchase order with line items."""
+        super().setUp()
+        self.product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.unpaid = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        InvoiceLineItem.objects.create(invoice=self.unpaid, product=self.product, quantity=2, price_each=10.00)
+        InvoiceLineItem.objects.create(invoice=self.unpaid, product=self.product, quantity=1, price_each=5.00)
+        self.paid = Invoice.objects.create(customer_name="Jane Roe", due_date=now().date(), status="paid")
+        purchase_order = PurchaseOrder.objects.create(vendor="TechSupplier")
+        PurchaseOrderLineItem.objects.create(purchase_order=purchase_order, product=self.product, quantity=5, cost=500.00)
+
+    def test_invoice_csv_has_one_row_per_line_item(self):
+        """Test the CSV export flattens line items under their invoice."""
+        import csv
+        response = self.client.get("/export/invoices.csv")
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:2], ["id", "customer_name"])
+        self.assertIn("line_product_sku", rows[0])
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.unpaid.pk)] * 2 + [str(self.paid.pk)])
+
+    def test_ndjson_nests_line_items_and_filters_by_status(self):
+        """Test the NDJSON export nests line items and honours the status filter."""
+        import json
+        response = self.client.get("/export/invoices.ndjson", {"status": "unpaid"})
+        documents = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([doc["id"] for doc in documents], [self.unpaid.pk])
+        self.assertEqual([line["quantity"] for line in documents[0]["line_items"]], [2, 1])
+        self.assertEqual(documents[0]["total"], "25.00")
+
+    def test_purchase_order_export_and_date_filters(self):
+        """Test the purchase order export and date range validation."""
+        import json
+        today = now().date().isoformat()
+        response = self.client.get("/export/purchase-orders.ndjson", {"date_from": today, "date_to": today})
+        documents = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(documents[0]["line_items"][0]["product__sku"], "LAP123")
+        self.assertEqual(self.client.get("/export/invoices.csv", {"date_from": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get("/export/invoices.xml").status_code, 404)
+
+    def test_export_requires_staff(self):
+        """Test that anonymous users are redirected to the admin login."""
+        self.client.logout()
+        self.assertEqual(self.client.get("/export/invoices.csv").status_code, 302)
+
+
+class PrintInvoiceTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up an invoice with several line items for printing."""
+        super().setUp()
+        self.invoice = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        for i in range(5):
+            product = Product.objects.create(name=f"Product {i}", sku=f"SKU{i}", unit_price=10.00)
+            InvoiceLineItem.objects.create(invoice=self.invoice, product=product, quantity=i + 1, price_each=2.50)
+        self.url = f"/invoice/{self.invoice.pk}/print/"
+
+    def test_print_renders_line_totals_in_fixed_queries(self):
+        """Test the print view loads everything in a fixed number of queries."""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, "$12.50")  # 5 x 2.50
+        self.assertContains(response, "Total: $37.50")
+        with self.assertNumQueries(1):
+            self.client.get(self.url)  # Served from the cache
+
+    def test_conditional_get_returns_not_modified(self):
+        """Test that repeat requests with a matching ETag get a 304."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        with self.assertNumQueries(1):
+            repeat = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_line_item_change_invalidates_print(self):
+        """Test that editing a line item changes the ETag and the rendered total."""
+        response = self.client.get(self.url)
+        item = self.invoice.line_items.first()
+        item.quantity = 10
+        item.save()
+        updated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(updated.status_code, 200)
+        self.assertContains(updated, "Total: $60.00")
+
+    def test_product_rename_invalidates_print(self):
+        """Test that renaming a product on the invoice changes the ETag and the cached printout."""
+        response = self.client.get(self.url)
+        product = self.invoice.line_items.first().product
+        product.name = "Renamed Product"
+        product.save()
+        updated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(updated.status_code, 200)
+        self.assertContains(updated, "Renamed Product")
+
+    def test_missing_invoice_returns_404(self):
+        """Test that printing an unknown invoice returns a 404."""
+        self.assertEqual(self.client.get("/invoice/999/print/").status_code, 404)
+
+
+class BatchPrintTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up several invoices with line items."""
+        super().setUp()
+        self.invoices = []
+        for i in range(6):
+            product = Product.objects.create(name=f"Product {i}", sku=f"SKU{i}", unit_price=10.00)
+            invoice = Invoice.objects.create(customer_name=f"Customer {i}", due_date=now().date())
+            InvoiceLineItem.objects.create(invoice=invoice, product=product, quantity=2, price_each=3.00)
+            InvoiceLineItem.objects.create(invoice=invoice, product=product, quantity=1, price_each=4.00)
+            self.invoices.append(invoice)
+
+    def get_batch(self, invoices):
+        return self.client.get("/invoice/print/", {"ids": ",".join(str(invoice.pk) for invoice in invoices)})
+
+    def test_batch_query_count_matches_single_invoice(self):
+        """Test a batch costs the same number of queries as a single invoice."""
+        with self.assertNumQueries(4):
+            self.get_batch(self.invoices[:1])
+        with self.assertNumQueries(4):
+            response = self.get_batch(self.invoices)
+        self.assertContains(response, 'class="invoice-page"', count=6)
+        self.assertContains(response, "Total: $10.00", count=6)
+
+    def test_parallel_rendering_keeps_requested_order(self):
+        """Test that thread pool rendering keeps invoices in the requested order."""
+        from django.test import override_settings
+        ordered = list(reversed(self.invoices))
+        with override_settings(INVOICE_PRINT_PARALLEL_THRESHOLD=2, INVOICE_PRINT_WORKERS=3):
+            content = self.get_batch(ordered).content.decode()
+        positions = [content.index(f"Invoice #{invoice.pk}<") for invoice in ordered]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_batch_size_cap_and_bad_ids(self):
+        """Test the batch size cap and validation of the ids parameter."""
+        from django.test import override_settings
+        with override_settings(INVOICE_PRINT_BATCH_MAX=5):
+            self.assertEqual(self.get_batch(self.invoices).status_code, 400)
+        self.assertEqual(self.client.get("/invoice/print/", {"ids": "1,x"}).status_code, 400)
+
+    def test_admin_action_redirects_to_batch(self):
+        """Test that the admin action redirects to the batch print URL."""
+        response = self.client.post("/admin/ecommerce_app/invoice/", {
+            "action": "print_selected",
+            "_selected_action": [invoice.pk for invoice in self.invoices[:2]],
+        })
+        self.assertRedirects(
+            response, f"/invoice/print/?ids={self.invoices[0].pk},{self.invoices[1].pk}", fetch_redirect_response=False
+        )
+
+
+class OverdueQueryIndexTestCase(TestCase):
+
+    def setUp(self):
+        """Set up overdue paid, unpaid and empty invoices."""
+        product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.overdue = Invoice.objects.create(customer_name="John Doe", due_date=now().date() - timedelta(days=5))
+        InvoiceLineItem.objects.create(invoice=self.overdue, product=product, quantity=2, price_each=1200.00)
+        self.paid = Invoice.objects.create(customer_name="Jane Roe", due_date=now().date() - timedelta(days=5), status="paid")
+        InvoiceLineItem.objects.create(invoice=self.paid, product=product, quantity=2, price_each=1200.00)
+        self.not_due = Invoice.objects.create(customer_name="Max Mustermann", due_date=now().date() + timedelta(days=5))
+        InvoiceLineItem.objects.create(invoice=self.not_due, product=product, quantity=2, price_each=1200.00)
+
+    def test_overdue_and_above_excludes_paid_invoices(self):
+        """Test that only unpaid overdue invoices above the threshold are returned."""
+        self.assertEqual(list(Invoice.objects.overdue_and_above(1000)), [self.overdue])
+        self.assertEqual(list(Invoice.objects.overdue_and_above(5000)), [])
+
+    def test_overdue_query_uses_composite_indexes(self):
+        """Test on SQLite that the overdue query is served by the new indexes."""
+        from django.db import connection
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN output is SQLite specific.")
+        plan = Invoice.objects.overdue_and_above(1000).explain()
+        self.assertIn("USING INDEX invoice_status_due_idx", plan)
+        self.assertIn("invline_invoice_product_idx", plan)
+        self.assertNotIn("SCAN ecommerce_app_invoicelineitem", plan)
+
+
+class AgingReportTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up unpaid invoices for two customers spread over the aging buckets."""
+        super().setUp()
+        self.product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.today = now().date()
+        for customer, days_overdue, amount in (
+            ("John Doe", -5, 100), ("John Doe", 0, 50), ("John Doe", 15, 200),
+            ("John Doe", 95, 400), ("Jane Roe", 45, 300), ("Jane Roe", 61, 80),
+        ):
+            self.create_invoice(customer, days_overdue, amount)
+        self.create_invoice("Jane Roe", 200, 999, status="paid")
+
+    def create_invoice(self, customer, days_overdue, amount, status="unpaid"):
+        invoice = Invoice.objects.create(
+            customer_name=customer, due_date=self.today - timedelta(days=days_overdue), status=status
+        )
+        InvoiceLineItem.objects.create(invoice=invoice, product=self.product, quantity=1, price_each=amount)
+
+    def test_aging_by_customer_buckets_in_one_query(self):
+        """Test the bucketed amounts per customer come from a single query."""
+        with self.assertNumQueries(1):
+            rows = {row["customer_name"]: row for row in Invoice.objects.aging_by_customer(self.today)}
+        self.assertEqual(rows["John Doe"]["current"], 150)
+        self.assertEqual(rows["John Doe"]["days_1_30"], 200)
+        self.assertEqual(rows["John Doe"]["days_over_90"], 400)
+        self.assertEqual(rows["Jane Roe"]["days_31_60"], 300)
+        self.assertEqual(rows["Jane Roe"]["days_61_90"], 80)
+        self.assertEqual(rows["Jane Roe"]["days_over_90"], 0)  # Paid invoices are excluded
+
+    def test_aging_report_totals_and_shares(self):
+        """Test the report's row totals, bucket totals and ordering."""
+        from ecommerce_app.reports import aging_report
+        report = aging_report(self.today)
+        self.assertEqual([row["customer_name"] for row in report["rows"]], ["John Doe", "Jane Roe"])
+        self.assertEqual(report["rows"][0]["total"], 750)
+        self.assertEqual(report["bucket_totals"], [150, 200, 300, 80, 400])
+        self.assertEqual(report["grand_total"], 1130)
+        self.assertAlmostEqual(sum(report["bucket_shares"]), 100, places=0)
+
+    def test_aging_report_admin_page(self):
+        """Test that the aging report renders in the admin."""
+        response = self.client.get("/admin/ecommerce_app/invoice/aging/", {"as_of": self.today.isoformat()})
+        self.assertContains(response, "Accounts receivable aging")
+        self.assertContains(response, "$1130.00")
+
+
+class ImportOrdersTestCase(TestCase):
+
+    def setUp(self):
+        """Set up products and a scratch directory for import files."""
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        Product.objects.create(name="Phone", sku="PH123", unit_price=500.00)
+
+    def write(self, name, content):
+        import os
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def import_orders(self, path, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        out, err = StringIO(), StringIO()
+        call_command("import_orders", path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl_sets_totals_and_rejects_bad_orders(self):
+        """Test a JSONL import with valid and invalid orders."""
+        import json
+        records = [
+            {"type": "invoice", "customer_name": "John Doe", "invoice_date": "2024-01-05", "due_date": "2024-02-05",
+             "line_items": [{"sku": "LAP123", "quantity": 2, "price_each": "999.50"}, {"sku": "PH123", "quantity": 1, "price_each": 400}]},
+            {"type": "purchase_order", "vendor": "TechSupplier", "order_date": "2024-01-01", "status": "completed",
+             "line_items": [{"sku": "PH123", "quantity": 10, "cost": "4000.00"}]},
+            {"type": "invoice", "customer_name": "Jane Roe", "due_date": "2024-02-05",
+             "line_items": [{"sku": "NOPE", "quantity": 1, "price_each": 1}]},
+            {"type": "invoice", "customer_name": "Max", "due_date": "not a date", "line_items": []},
+        ]
+        path = self.write("orders.jsonl", "\n".join(json.dumps(r) for r in records) + "\n{broken\n")
+        out, err = self.import_orders(path, batch_size=1)
+        self.assertIn("Imported 1 invoices, 1 purchase orders and 3 line items", out)
+        self.assertIn("3 rejected", out)
+        self.assertIn("Line 3: rejected, unknown SKU 'NOPE'", err)
+        self.assertIn("Line 4: rejected, invalid due_date", err)
+
+        invoice = Invoice.objects.get()
+        self.assertEqual((invoice.total, invoice.line_count), (Decimal("2399.00"), 2))
+        self.assertEqual(invoice.invoice_date.isoformat(), "2024-01-05")
+        purchase_order = PurchaseOrder.objects.get()
+        self.assertEqual((purchase_order.total, purchase_order.status), (Decimal("4000.00"), "completed"))
+
+    def test_import_jsonl_rejects_malformed_records(self):
+        """Test that records and line items of the wrong shape are rejected without stopping the import."""
+        import json
+        valid = {"type": "invoice", "customer_name": "John Doe", "due_date": "2024-02-05",
+                 "line_items": [{"sku": "LAP123", "quantity": 1, "price_each": 1000}]}
+        records = [
+            valid, [1, 2], "x",
+            {**valid, "line_items": ["LAP123"]},
+            {**valid, "line_items": [{"sku": ["LAP123"], "quantity": 1, "price_each": 1}]},
+            {**valid, "line_items": "LAP123"},
+            {**valid, "status": ["paid"]},
+            valid,
+        ]
+        path = self.write("orders.jsonl", "\n".join(json.dumps(r) for r in records))
+        out, err = self.import_orders(path, batch_size=1)
+        self.assertIn("Imported 2 invoices, 0 purchase orders and 2 line items", out)
+        self.assertIn("6 rejected", out)
+        self.assertIn("Line 2: rejected, expected an object, got list", err)
+        self.assertIn("Line 3: rejected, expected an object, got str", err)
+        self.assertIn("Line 4: rejected, line item is not an object: 'LAP123'", err)
+        self.assertIn("Line 5: rejected, unknown SKU ['LAP123']", err)
+
+    def test_import_csv_groups_rows_into_orders(self):
+        """Test a CSV import groups consecutive rows with the same ref into one order."""
+        path = self.write("orders.csv", (
+            "type,ref,customer_name,vendor,date,due_date,status,sku,quantity,price_each,cost\n"
+            "invoice,A1,John Doe,,2024-03-01,2024-04-01,paid,LAP123,1,1000,\n"
+            "invoice,A1,John Doe,,2024-03-01,2024-04-01,paid,PH123,2,450,\n"
+            "purchase_order,P1,,TechSupplier,2024-02-01,,,LAP123,3,,2500\n"
+            "invoice,A2,Jane Roe,,2024-03-02,2024-04-02,,PH123,-1,450,\n"
+        ))
+        out, err = self.import_orders(path)
+        self.assertIn("Imported 1 invoices, 1 purchase orders and 3 line items", out)
+        self.assertIn("Line 5: rejected, invalid quantity", err)
+        invoice = Invoice.objects.get()
+        self.assertEqual((invoice.customer_name, invoice.status, invoice.total), ("John Doe", "paid", Decimal("1900.00")))
+        self.assertEqual(PurchaseOrder.objects.get().line_items.get().cost, Decimal("2500.00"))
+
+
+class SeedDataTestCase(TestCase):
+
+    def test_seed_data_creates_consistent_orders(self):
+        """Test the seeder creates the requested rows with correct stored totals."""
+        from io import StringIO
+        from django.core.management import call_command
+        call_command("seed_data", products=20, purchase_orders=15, invoices=30, batch_size=7, stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(PurchaseOrder.objects.count(), 15)
+        self.assertEqual(Invoice.objects.count(), 30)
+        out = StringIO()
+        call_command("reconcile_totals", dry_run=True, stdout=out)
+        self.assertNotIn("drifted (", out.getvalue())
+        self.assertEqual(out.getvalue().count(", 0 drifted"), 2)
+
+
+class RequestInstrumentationTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Clear the slow request log."""
+        from ecommerce_app.middleware import slow_requests
+        super().setUp()
+        slow_requests.clear()
+
+    def test_server_timing_header_reports_queries(self):
+        """Test that responses carry the query count and timings."""
+        response = self.client.get("/admin/ecommerce_app/invoice/")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="4 queries", app;dur=[\d.]+')
+
+    def test_slow_requests_are_recorded_with_repeated_queries(self):
+        """Test that slow requests are kept with their repeated query fingerprints."""
+        from django.test import override_settings
+        from ecommerce_app.middleware import slow_requests
+        with override_settings(REQUEST_INSTRUMENTATION_SLOW_MS=0):
+            self.client.get("/admin/ecommerce_app/product/")
+        entry = slow_requests.slowest()[0]
+        self.assertEqual((entry["path"], entry["queries"]), ("/admin/ecommerce_app/product/", 5))
+        # The default changelist counts the same queryset twice (page count and full count).
+        self.assertEqual(entry["duplicates"][0][1], 2)
+        self.assertContains(self.client.get("/admin/slow-requests/"), "/admin/ecommerce_app/product/")
+
+    def test_recorder_groups_in_lists(self):
+        """Test that IN lists of different lengths share one fingerprint."""
+        from ecommerce_app.middleware import QueryRecorder
+        recorder = QueryRecorder()
+        execute = lambda sql, params, many, context: None
+        recorder(execute, "SELECT 1 WHERE id IN (%s, %s)", (1, 2), False, {})
+        recorder(execute, "SELECT 1 WHERE id IN (%s)", (3,), False, {})
+        self.assertEqual(recorder.duplicates(), [("SELECT 1 WHERE id IN (...)", 2)])
+
+
+class ProfilingTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Point the profile directory at a scratch directory."""
+        import tempfile
+        from django.test import override_settings
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        settings_override = override_settings(PROFILING_DIR=tmpdir.name, PROFILING_MAX_FILES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_staff_can_request_a_profile(self):
+        """Test that staff requests with _profile are profiled and listed in the admin."""
+        from ecommerce_app.profiling import list_profiles
+        response = self.client.get("/admin/ecommerce_app/invoice/", {"_profile": "1"})
+        name = response["X-Profile-File"]
+        self.assertEqual([path.name for path in list_profiles()], [name])
+        self.assertContains(self.client.get("/admin/profiles/"), name)
+        self.assertContains(self.client.get(f"/admin/profiles/{name}/"), "cumulative")
+
+    def test_requests_are_not_profiled_by_default(self):
+        """Test that unflagged and anonymous requests are not profiled."""
+        from ecommerce_app.profiling import list_profiles
+        self.client.get("/admin/ecommerce_app/invoice/")
+        self.client.logout()
+        self.client.get("/admin/login/", HTTP_X_PROFILE="1")
+        self.assertEqual(list_profiles(), [])
+
+    def test_profile_directory_is_bounded(self):
+        """Test that only the newest PROFILING_MAX_FILES profiles are kept."""
+        from ecommerce_app.profiling import list_profiles
+        for _ in range(4):
+            self.client.get("/admin/", HTTP_X_PROFILE="1")
+        self.assertEqual(len(list_profiles()), 2)
+
+    def test_profile_command_and_path_traversal(self):
+        """Test profiling a management command and rejecting non-profile paths."""
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command("profile_command", "reconcile_totals", "--", "--dry-run", stdout=out)
+        self.assertIn("Profile saved to", out.getvalue())
+        self.assertEqual(self.client.get("/admin/profiles/..%2Fsettings.py/").status_code, 404)
+
+
+class AsyncReadViewsTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up an invoice with line items."""
+        super().setUp()
+        self.product = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.invoice = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        InvoiceLineItem.objects.create(invoice=self.invoice, product=self.product, quantity=3, price_each=2.50)
+
+    async def test_async_print_view_and_conditional_get(self):
+        """Test the async print view renders, caches and answers 304s."""
+        from django.test import AsyncRequestFactory
+        from ecommerce_app.views import aprint_invoice
+        factory = AsyncRequestFactory()
+        response = await aprint_invoice(factory.get("/"), self.invoice.pk)
+        self.assertContains(response, "Total: $7.50")
+        repeat = await aprint_invoice(factory.get("/", headers={"If-None-Match": response["ETag"]}), self.invoice.pk)
+        self.assertEqual(repeat.status_code, 304)
+        from django.http import Http404
+        with self.assertRaises(Http404):
+            await aprint_invoice(factory.get("/"), 999)
+
+    async def test_sync_and_async_print_views_agree(self):
+        """Test the async print view sends the same validators as the sync one."""
+        from django.test import AsyncRequestFactory
+        from asgiref.sync import sync_to_async
+        from ecommerce_app.views import aprint_invoice
+        sync_response = await sync_to_async(self.client.get)(f"/invoice/{self.invoice.pk}/print/")
+        async_response = await aprint_invoice(AsyncRequestFactory().get("/"), self.invoice.pk)
+        self.assertEqual(sync_response["ETag"], async_response["ETag"])
+        self.assertEqual(sync_response["Last-Modified"], async_response["Last-Modified"])
+
+    async def test_lookup_endpoints(self):
+        """Test the async product and invoice lookups."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/lookup/products/", {"q": "lap"})
+        self.assertEqual([p["sku"] for p in response.json()["results"]], ["LAP123"])
+        response = await self.async_client.get(f"/lookup/invoices/{self.invoice.pk}/")
+        self.assertEqual(response.json()["total"], "7.50")
+        self.assertEqual(response.json()["line_items"][0]["line_total"], "7.50")
+        response = await self.async_client.get("/lookup/invoices/999/")
+        self.assertEqual(response.status_code, 404)
+
+
+class ReadApiTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up products and invoices with line items."""
+        super().setUp()
+        self.products = [
+            Product.objects.create(name=f"Product {i}", sku=f"SKU{i}", unit_price=10.00) for i in range(3)
+        ]
+        for i in range(12):
+            invoice = Invoice.objects.create(
+                customer_name=f"Customer {i}", due_date=now().date(), status="paid" if i % 3 == 0 else "unpaid"
+            )
+            for product in self.products:
+                InvoiceLineItem.objects.create(invoice=invoice, product=product, quantity=3, price_each=2.50)
+        order = PurchaseOrder.objects.create(vendor="Acme")
+        PurchaseOrderLineItem.objects.create(purchase_order=order, product=self.products[0], quantity=2, cost=15.00)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Test a page of invoices with line items costs the same queries at any size."""
+        with self.assertNumQueries(4):
+            small = self.client.get("/api/invoices/", {"page_size": 2})
+        with self.assertNumQueries(4):
+            large = self.client.get("/api/invoices/", {"page_size": 10})
+        self.assertEqual(len(small.json()["results"]), 2)
+        self.assertEqual(len(large.json()["results"]), 10)
+        line = large.json()["results"][0]["line_items"][0]
+        self.assertEqual((line["sku"], line["line_total"]), ("SKU0", "7.50"))
+        self.assertEqual(large.json()["results"][0]["total"], "22.50")
+
+    def test_cursor_pagination_walks_every_invoice(self):
+        """Test following next links visits each invoice once, without a count."""
+        seen, url, params = [], "/api/invoices/", {"page_size": 5}
+        while url:
+            data = self.client.get(url, params).json()
+            self.assertNotIn("count", data)
+            seen.extend(invoice["id"] for invoice in data["results"])
+            url, params = data["next"], None
+        self.assertEqual(seen, list(Invoice.objects.order_by("pk").values_list("pk", flat=True)))
+
+    def test_sparse_fields_skip_line_items(self):
+        """Test ?fields= trims the output and skips the line item prefetch."""
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/invoices/", {"fields": "id,total", "status": "paid"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 4)
+        self.assertEqual(set(results[0]), {"id", "total"})
+
+    def test_purchase_orders_and_products(self):
+        """Test the purchase order and product endpoints."""
+        order = self.client.get("/api/purchase-orders/").json()["results"][0]
+        self.assertEqual((order["total"], order["line_items"][0]["sku"]), ("15.00", "SKU0"))
+        products = self.client.get("/api/products/", {"fields": "sku"}).json()["results"]
+        self.assertEqual(products, [{"sku": "SKU0"}, {"sku": "SKU1"}, {"sku": "SKU2"}])
+
+    def test_bulk_create_uses_fixed_statements(self):
+        """Test bulk invoice creation runs the same statements for any batch size and sets totals."""
+        import json
+        payload = [
+            {
+                "customer_name": f"Bulk {i}",
+                "due_date": str(now().date()),
+                "line_items": [{"product": product.pk, "quantity": 2, "price_each": "1.25"} for product in self.products],
+            }
+            for i in range(20)
+        ]
+        with self.assertNumQueries(13):
+            response = self.client.post("/api/invoices/bulk/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        created = Invoice.objects.filter(pk__in=response.json()["created"])
+        self.assertEqual(created.count(), 20)
+        self.assertEqual({(invoice.total, invoice.line_count) for invoice in created}, {(Decimal("7.50"), 3)})
+
+    def test_bulk_create_rejects_unknown_products(self):
+        """Test bulk creation fails as a whole when a product does not exist."""
+        import json
+        payload = [{"customer_name": "Bulk", "due_date": str(now().date()),
+                    "line_items": [{"product": 999, "quantity": 1, "price_each": "1.00"}]}]
+        response = self.client.post("/api/invoices/bulk/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Invoice.objects.filter(customer_name="Bulk").exists())
+
+    def test_api_requires_staff(self):
+        """Test anonymous users cannot use the API."""
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/invoices/").status_code, 403)
+
+
+class KeysetChangeListTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up 250 invoices spread over a few dates."""
+        super().setUp()
+        today = now().date()
+        Invoice.objects.bulk_create(
+            Invoice(customer_name=f"Customer {i}", invoice_date=today - timedelta(days=i % 7), due_date=today)
+            for i in range(250)
+        )
+        self.expected = list(Invoice.objects.order_by("-invoice_date", "-pk").values_list("pk", flat=True))
+        self.url = "/admin/ecommerce_app/invoice/"
+
+    def page(self, url, params=None):
+        cl = self.client.get(url, params).context["cl"]
+        return [obj.pk for obj in cl.result_list], cl
+
+    def test_next_and_previous_links_walk_every_invoice(self):
+        """Test the cursor links visit each invoice once, in order, both ways."""
+        seen, cl = self.page(self.url)
+        self.assertIn("after=", cl.next_url)
+        pages = [seen]
+        while cl.next_url:
+            pks, cl = self.page(self.url + cl.next_url)
+            pages.append(pks)
+        self.assertEqual([pk for pks in pages for pk in pks], self.expected)
+        self.assertEqual(len(pages), 3)
+        for expected in reversed(pages[:-1]):
+            pks, cl = self.page(self.url + cl.previous_url)
+            self.assertEqual(pks, expected)
+        self.assertIsNone(cl.previous_url)
+
+    def test_deep_page_costs_the_same_as_the_first(self):
+        """Test that a deep page runs the same queries as the first and no COUNT once cached."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        cl = self.page(self.url)[1]
+        with self.assertNumQueries(4):
+            cl = self.page(self.url + cl.next_url)[1]
+        with CaptureQueriesContext(connection) as queries:
+            self.page(self.url + cl.next_url)
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])
+
+    def test_count_is_capped(self):
+        """Test that large results show a capped count."""
+        from django.test import override_settings
+        with override_settings(ADMIN_CHANGELIST_COUNT_CAP=100):
+            response = self.client.get(self.url)
+        self.assertContains(response, "100+ invoices")
+        self.assertEqual(self.client.get(self.url, {"status__exact": "paid"}).context["cl"].result_count, 0)
+
+    def test_other_orderings_use_offsets(self):
+        """Test that sorting by another column pages with ?p= in that order."""
+        first, cl = self.page(self.url, {"o": "2"})
+        second, cl = self.page(self.url + cl.next_url)
+        ordered = list(Invoice.objects.order_by("customer_name", "-pk").values_list("pk", flat=True))
+        self.assertEqual(first + second, ordered[:200])
+
+    def test_bad_cursor_is_rejected(self):
+        """Test that a malformed cursor redirects with the admin's error flag."""
+        response = self.client.get(self.url, {"after": "yesterday,1"})
+        self.assertRedirects(response, self.url + "?e=1", fetch_redirect_response=False)
+
+
+class BackgroundJobTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Point the jobs directory at a scratch directory and set up unpaid invoices."""
+        import tempfile
+        from django.test import override_settings
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        settings_override = override_settings(JOBS_DIR=tmpdir.name, JOBS_CHUNK_SIZE=4)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Invoice.objects.bulk_create(Invoice(customer_name=f"Customer {i}", due_date=now().date()) for i in range(10))
+
+    def run_action_across(self, action, **filters):
+        return self.client.post(f"/admin/ecommerce_app/invoice/?{'&'.join(f'{k}={v}' for k, v in filters.items())}", {
+            "action": action,
+            "select_across": "1",
+            "_selected_action": [Invoice.objects.first().pk],
+        })
+
+    def run_jobs(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command("run_jobs", "--once", stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_mark_as_paid_across_pages_runs_as_a_job(self):
+        """Test select-all mark as paid is queued, then run in chunks by the worker."""
+        from ecommerce_app.models import Job
+        paid = Invoice.objects.first()
+        paid.mark_as_paid()
+        response = self.run_action_across("mark_as_paid", status__exact="unpaid")
+        job = Job.objects.get()
+        self.assertRedirects(response, f"/admin/ecommerce_app/job/{job.pk}/change/", fetch_redirect_response=False)
+        self.assertEqual(Invoice.objects.filter(status="unpaid").count(), 9)  # Nothing changed yet
+
+        self.assertIn("9 rows", self.run_jobs())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.processed, job.progress()), ("done", 9, 9, 100))
+        self.assertFalse(Invoice.objects.filter(status="unpaid").exists())
+        self.assertContains(self.client.get(f"/admin/ecommerce_app/job/{job.pk}/change/"), "100% (9 of 9)")
+
+    def test_export_across_pages_produces_a_download(self):
+        """Test select-all XLSX export is written by the worker and downloadable from the job page."""
+        from io import BytesIO
+        from openpyxl import load_workbook
+        from ecommerce_app.models import Job
+        self.run_action_across("export_xlsx")
+        self.run_jobs()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.processed), ("done", 10))
+        download_url = f"/admin/ecommerce_app/job/{job.pk}/download/"
+        self.assertContains(self.client.get(f"/admin/ecommerce_app/job/{job.pk}/change/"), download_url)
+        response = self.client.get(download_url)
+        rows = list(load_workbook(BytesIO(b"".join(response.streaming_content))).active.values)
+        self.assertEqual(len(rows), 11)  # Header plus one row per invoice
+
+    def test_job_results_are_downloaded_by_their_owner(self):
+        """Test that other staff users need the download_any_job permission to download a job's result."""
+        from django.contrib.auth.models import Permission, User
+        from ecommerce_app.models import Job
+        self.run_action_across("export_xlsx")
+        self.run_jobs()
+        download_url = f"/admin/ecommerce_app/job/{Job.objects.get().pk}/download/"
+        clerk = User.objects.create_user("clerk", "clerk@example.com", "password", is_staff=True)
+        clerk.user_permissions.add(Permission.objects.get(codename="view_job"))
+        self.client.force_login(clerk)
+        self.assertEqual(self.client.get(download_url).status_code, 403)
+        clerk.user_permissions.add(Permission.objects.get(codename="download_any_job"))
+        clerk = User.objects.get(pk=clerk.pk)  # Drop the cached permissions
+        self.client.force_login(clerk)
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_failed_job_records_error(self):
+        """Test that a failing job is marked failed with its traceback."""
+        from ecommerce_app import jobs
+        job = jobs.enqueue("export_invoices_xlsx", Invoice.objects.all())
+        job.query = b"not a pickle"
+        job.save()
+        self.assertIn("failed", self.run_jobs())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Traceback", job.error)
+        self.assertEqual(self.client.get(f"/admin/ecommerce_app/job/{job.pk}/download/").status_code, 404)
+
+    def test_a_job_is_claimed_once(self):
+        """Test that a claimed job cannot be claimed again."""
+        from ecommerce_app import jobs
+        job = jobs.enqueue("mark_invoices_paid", Invoice.objects.all())
+        self.assertEqual(jobs.claim_next_job().pk, job.pk)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_stale_running_job_is_failed(self):
+        """Test that a running job whose worker stopped reporting progress is marked failed."""
+        from datetime import timedelta
+        from ecommerce_app import jobs
+        from ecommerce_app.models import Job
+        stale, alive = (jobs.enqueue("mark_invoices_paid", Invoice.objects.all()) for _ in range(2))
+        jobs.claim_next_job()
+        jobs.claim_next_job()
+        Job.objects.filter(pk=stale.pk).update(heartbeat_at=now() - timedelta(seconds=601))
+        self.assertIsNone(jobs.claim_next_job())
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((stale.status, alive.status), ("failed", "running"))
+        self.assertIn("stopped reporting progress", stale.error)
+
+
+class ProductAutocompleteTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up a catalog of products and an invoice using one of them."""
+        super().setUp()
+        from ecommerce_app.search import index_objects
+        widgets = Product.objects.bulk_create(
+            Product(name=f"Widget {i:03}", sku=f"WID{i:03}", unit_price=1) for i in range(200)
+        )
+        index_objects(Product, widgets, replace=False)
+        self.laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.invoice = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        InvoiceLineItem.objects.create(invoice=self.invoice, product=self.laptop, quantity=1, price_each=1000.00)
+
+    def autocomplete(self, term, model_name="invoicelineitem"):
+        response = self.client.get("/admin/autocomplete/", {
+            "app_label": "ecommerce_app", "model_name": model_name, "field_name": "product", "term": term,
+        })
+        return [result["text"] for result in response.json()["results"]]
+
+    def test_prefix_search_ignores_case(self):
+        """Test that prefix search matches SKU or name starts, ignoring case."""
+        self.assertEqual(list(Product.objects.prefix_search("lap")), [self.laptop])
+        self.assertEqual(Product.objects.prefix_search("widget 01").count(), 10)
+        self.assertFalse(Product.objects.prefix_search("top").exists())
+
+    def test_change_form_does_not_list_the_catalog(self):
+        """Test the invoice form renders only the chosen product, not every product."""
+        response = self.client.get(f"/admin/ecommerce_app/invoice/{self.invoice.pk}/change/")
+        self.assertContains(response, "Laptop (LAP123)")
+        self.assertNotContains(response, "WID150")
+        self.assertContains(response, "admin-autocomplete")
+
+    def test_autocomplete_searches_by_prefix(self):
+        """Test the inline autocomplete endpoints for invoices and purchase orders."""
+        self.assertEqual(self.autocomplete("lap"), ["Laptop (LAP123)"])
+        self.assertEqual(len(self.autocomplete("wid19")), 10)
+        self.assertEqual(self.autocomplete("lap", model_name="purchaseorderlineitem"), ["Laptop (LAP123)"])
+
+    def test_hot_prefixes_are_cached_until_products_change(self):
+        """Test that repeated prefixes skip the search query and see new products."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.autocomplete("lap")
+        with CaptureQueriesContext(connection) as queries:
+            self.autocomplete("lap")
+        self.assertFalse([q for q in queries if "searchtoken" in q["sql"]])
+        Product.objects.create(name="Lamp", sku="LAP999", unit_price=20)
+        self.assertEqual(self.autocomplete("lap"), ["Laptop (LAP123)", "Lamp (LAP999)"])
+
+    def test_broad_prefixes_are_not_cached(self):
+        """Test that prefixes with many matches fall back to the indexed query."""
+        from ecommerce_app.search import cached_product_ids
+        self.assertIsNone(cached_product_ids("w"))
+        self.assertEqual(len(self.autocomplete("w")), 20)  # First page
+
+
+class SearchIndexTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up a few searchable invoices, purchase orders and products."""
+        super().setUp()
+        self.jose = Invoice.objects.create(customer_name="José Álvarez", due_date=now().date())
+        self.jane = Invoice.objects.create(customer_name="Jane O'Brien", due_date=now().date())
+        self.acme = PurchaseOrder.objects.create(vendor="ACME Supplies Ltd.")
+
+    def changelist(self, model_name, term, **params):
+        response = self.client.get(f"/admin/ecommerce_app/{model_name}/", {"q": term, **params})
+        return [obj.pk for obj in response.context["cl"].result_list]
+
+    def test_tokenize_normalizes_words(self):
+        """Test that tokens are lowercase words without accents or punctuation."""
+        from ecommerce_app.search import tokenize
+        self.assertEqual(tokenize("José Álvarez-Díaz, LAP-123"), {"jose", "alvarez", "diaz", "lap", "123"})
+        self.assertEqual(tokenize("Иван Straße_東京"), {"иван", "strasse", "東京"})
+
+    def test_search_in_other_scripts_and_without_words(self):
+        """Test that names in non-Latin scripts are found, and that a term with no words matches nothing."""
+        ivan = Invoice.objects.create(customer_name="Иван Петров", due_date=now().date())
+        self.assertEqual(self.changelist("invoice", "иван"), [ivan.pk])
+        self.assertEqual(self.changelist("invoice", "ПЕТ"), [ivan.pk])
+        self.assertEqual(self.changelist("invoice", "--"), [])
+
+    def test_admin_search_matches_word_prefixes(self):
+        """Test that changelist search matches the start of any word, ignoring case and accents."""
+        self.assertEqual(self.changelist("invoice", "alv"), [self.jose.pk])
+        self.assertEqual(self.changelist("invoice", "obrien"), [])
+        self.assertEqual(self.changelist("invoice", "JANE o"), [self.jane.pk])
+        self.assertEqual(self.changelist("invoice", str(self.jane.pk)), [self.jane.pk])
+        self.assertEqual(self.changelist("purchaseorder", "supp acme"), [self.acme.pk])
+
+    def test_product_search_ignores_sku_punctuation(self):
+        """Test that product SKUs are found by their prefix with or without the punctuation."""
+        laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        cable = Product.objects.create(name="Cable", sku="CAB-12-X", unit_price=10.00)
+        self.assertEqual(self.changelist("product", "LAP-1"), [laptop.pk])
+        self.assertEqual(self.changelist("product", "cab12"), [cable.pk])
+        self.assertEqual(self.changelist("product", "CAB-12-X"), [cable.pk])
+        self.assertEqual(self.changelist("product", "12 cab"), [cable.pk])
+        self.assertEqual(self.changelist("product", "1-LAP"), [])
+
+    def test_search_combines_with_filters(self):
+        """Test that search results still respect the changelist filters."""
+        self.jane.mark_as_paid()
+        self.assertEqual(self.changelist("invoice", "jane", status__exact="unpaid"), [])
+        self.assertEqual(self.changelist("invoice", str(self.jane.pk), status__exact="unpaid"), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        """Test that renames and deletes update the index, and unrelated saves leave it alone."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from ecommerce_app.models import SearchToken
+        self.jane.customer_name = "Janet Smith"
+        self.jane.save()
+        self.assertEqual(self.changelist("invoice", "smith"), [self.jane.pk])
+        self.assertEqual(self.changelist("invoice", "brien"), [])
+        with CaptureQueriesContext(connection) as queries:
+            self.jane.save(update_fields=["status"])
+        self.assertFalse([q for q in queries if "searchtoken" in q["sql"]])
+        self.jane.delete()
+        self.assertFalse(SearchToken.objects.filter(model="invoice", object_id=self.jane.pk).exists())
+
+    def test_bulk_created_orders_are_indexed(self):
+        """Test that the bulk order writer indexes what it creates."""
+        from ecommerce_app.bulk import bulk_create_orders
+        invoice = bulk_create_orders("invoice", [(Invoice(customer_name="Bulk Buyer", due_date=now().date()), [])])[0]
+        self.assertEqual(self.changelist("invoice", "bulk"), [invoice.pk])
+
+    def test_rebuild_command_repopulates_the_index(self):
+        """Test that rebuild_search_index restores missing tokens."""
+        from io import StringIO
+        from django.core.management import call_command
+        from ecommerce_app.models import SearchToken
+        SearchToken.objects.all().delete()
+        Invoice.objects.filter(pk=self.jose.pk).update(customer_name="Zed Zulu")
+        out = StringIO()
+        call_command("rebuild_search_index", "--batch-size", "1", stdout=out)
+        self.assertIn("invoices: indexed 2", out.getvalue())
+        self.assertEqual(self.changelist("invoice", "zulu"), [self.jose.pk])
+        self.assertEqual(self.changelist("purchaseorder", "acme"), [self.acme.pk])
+
+
+class DailyRollupTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up invoices and purchase orders on two days."""
+        super().setUp()
+        self.today = now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.mouse = Product.objects.create(name="Mouse", sku="MOU1", unit_price=20.00)
+        self.invoice = Invoice.objects.create(customer_name="John Doe", invoice_date=self.yesterday, due_date=self.today)
+        InvoiceLineItem.objects.create(invoice=self.invoice, product=self.laptop, quantity=2, price_each=900.00)
+        InvoiceLineItem.objects.create(invoice=self.invoice, product=self.mouse, quantity=3, price_each=20.00)
+        other = Invoice.objects.create(customer_name="Jane Doe", invoice_date=self.today, due_date=self.today)
+        InvoiceLineItem.objects.create(invoice=other, product=self.laptop, quantity=1, price_each=1000.00)
+        self.order = PurchaseOrder.objects.create(vendor="Acme", order_date=self.yesterday)
+        PurchaseOrderLineItem.objects.create(purchase_order=self.order, product=self.laptop, quantity=5, cost=3500.00)
+
+    def refresh(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command("refresh_rollups", *args, stdout=out)
+        return out.getvalue()
+
+    def sales(self):
+        from ecommerce_app.models import DailyProductSales
+        return {
+            (row.date, row.product.sku): (row.revenue, row.units)
+            for row in DailyProductSales.objects.select_related("product")
+        }
+
+    def test_refresh_builds_daily_rows(self):
+        """Test the first refresh sums line items per day and product."""
+        from ecommerce_app.models import DailyProductSales, DailyVendorSpend
+        self.assertIn("sales: recomputed 2 day(s)", self.refresh())
+        self.assertEqual(self.sales(), {
+            (self.yesterday, "LAP123"): (Decimal("1800.00"), 2),
+            (self.yesterday, "MOU1"): (Decimal("60.00"), 3),
+            (self.today, "LAP123"): (Decimal("1000.00"), 1),
+        })
+        self.assertEqual(
+            list(DailyProductSales.objects.by_product(self.yesterday, self.today).values_list("product__sku", "revenue", "units")),
+            [("LAP123", Decimal("2800.00"), 3), ("MOU1", Decimal("60.00"), 3)],
+        )
+        self.assertEqual(
+            list(DailyVendorSpend.objects.by_vendor(self.yesterday, self.today).values_list("vendor", "spend", "units")),
+            [("Acme", Decimal("3500.00"), 5)],
+        )
+
+    def test_refresh_only_recomputes_changed_days(self):
+        """Test that later refreshes pick up edits and deletes on the affected days only."""
+        from django.test import override_settings
+        self.refresh()
+        with override_settings(ROLLUP_WATERMARK_OVERLAP=0):
+            self.assertIn("sales: recomputed 0 day(s)", self.refresh())
+            item = self.invoice.line_items.get(product=self.mouse)
+            item.quantity = 5
+            item.save()
+            self.assertIn("sales: recomputed 1 day(s)", self.refresh())
+            self.assertEqual(self.sales()[(self.yesterday, "MOU1")], (Decimal("100.00"), 5))
+
+            self.invoice.delete()
+            self.assertIn("sales: recomputed 1 day(s)", self.refresh())
+            self.assertEqual(self.sales(), {(self.today, "LAP123"): (Decimal("1000.00"), 1)})
+
+    def test_vendor_change_moves_spend(self):
+        """Test that renaming a purchase order's vendor moves its spend on refresh."""
+        from ecommerce_app.models import DailyVendorSpend
+        self.refresh()
+        self.order.vendor = "Globex"
+        self.order.save()
+        self.refresh("purchasing")
+        self.assertEqual(list(DailyVendorSpend.objects.values_list("vendor", "spend")), [("Globex", Decimal("3500.00"))])
+
+    def test_bulk_created_orders_are_picked_up(self):
+        """Test that orders written by bulk_create_orders reach the rollup."""
+        from ecommerce_app.bulk import bulk_create_orders
+        self.refresh()
+        bulk_create_orders("invoice", [(
+            Invoice(customer_name="Bulk", invoice_date=self.today, due_date=self.today),
+            [InvoiceLineItem(product=self.mouse, quantity=10, price_each=15)],
+        )])
+        self.refresh()
+        self.assertEqual(self.sales()[(self.today, "MOU1")], (Decimal("150.00"), 10))
+
+    def test_dashboard_reads_the_rollups(self):
+        """Test the dashboard renders from the rollups in a fixed number of queries."""
+        self.refresh()
+        with self.assertNumQueries(9):
+            response = self.client.get("/admin/sales/")
+        self.assertContains(response, "Revenue: $2860.00 from 6 units")
+        self.assertContains(response, "Acme")
+        self.assertNotContains(response, "ecommerce_app_invoicelineitem")
+
+
+class MarginReportTestCase(AdminTestCase):
+
+    def setUp(self):
+        """Set up purchases at rising costs and sales in between."""
+        super().setUp()
+        self.today = now().date()
+        self.laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.cable = Product.objects.create(name="Cable", sku="CAB1", unit_price=5.00)
+        self.buy(self.laptop, 30, 10, 6000.00)  # 10 at 600
+        self.buy(self.laptop, 10, 10, 8000.00)  # 10 at 800
+        self.buy(self.laptop, 5, 100, 1.00, status="canceled")  # Ignored
+        self.sell(self.laptop, 20, 2, 1000.00)  # Costed at 600
+        self.sell(self.laptop, 5, 1, 1000.00)   # Costed at (6000 + 8000) / 20 = 700
+        self.sell(self.cable, 5, 4, 5.00)       # Never purchased
+
+    def buy(self, product, days_ago, quantity, cost, status="completed"):
+        order = PurchaseOrder.objects.create(vendor="Acme", order_date=self.today - timedelta(days=days_ago), status=status)
+        PurchaseOrderLineItem.objects.create(purchase_order=order, product=product, quantity=quantity, cost=cost)
+
+    def sell(self, product, days_ago, quantity, price):
+        invoice = Invoice.objects.create(
+            customer_name="John Doe", invoice_date=self.today - timedelta(days=days_ago), due_date=self.today
+        )
+        InvoiceLineItem.objects.create(invoice=invoice, product=product, quantity=quantity, price_each=price)
+        return invoice
+
+    def test_margin_uses_weighted_average_cost_as_of_sale(self):
+        """Test each sale is costed at the average purchase cost up to its date."""
+        from ecommerce_app.reports import margin_report
+        report = margin_report()
+        self.assertEqual(report["products"], [{
+            "sku": "LAP123", "name": "Laptop", "units": 3, "avg_price": 1000.0, "avg_cost": 633.33,
+            "revenue": 3000.0, "cogs": 1900.0, "margin": 1100.0, "margin_pct": 36.7,
+        }])
+        self.assertEqual((report["margin"], report["uncosted_lines"]), (1100.0, 1))
+
+    def test_period_limits_sales_but_not_cost_history(self):
+        """Test that only sales in the period count, costed with earlier purchases."""
+        from ecommerce_app.reports import margin_report
+        report = margin_report(start=self.today - timedelta(days=7), end=self.today)
+        self.assertEqual((report["revenue"], report["cogs"]), (1000.0, 700.0))
+        self.assertEqual(margin_report(start=self.today, end=self.today)["products"], [])
+
+    def test_archived_orders_still_count(self):
+        """Test that archiving old orders does not change the cost basis or the sales in the report."""
+        from ecommerce_app.archive import archive_orders
+        from ecommerce_app.reports import margin_report
+        Invoice.objects.update(status="paid")
+        before = margin_report()
+        for name in ("invoices", "purchase_orders"):
+            archive_orders(name, self.today, 100)
+        self.assertFalse(PurchaseOrderLineItem.objects.exists())
+        self.assertEqual(margin_report(), before)
+
+    def test_price_outliers(self):
+        """Test that a line priced far from the product's usual price is flagged."""
+        from ecommerce_app.reports import margin_report
+        for price in (900, 950, 1050, 1100):
+            self.sell(self.laptop, 3, 1, price)
+        odd = self.sell(self.laptop, 2, 1, 99.00)
+        outliers = margin_report()["outliers"]
+        self.assertEqual([line["invoice_id"] for line in outliers], [odd.pk])
+
+    def test_admin_report(self):
+        """Test the admin margin report page."""
+        response = self.client.get("/admin/ecommerce_app/product/margins/")
+        self.assertContains(response, "margin $1100.00")
+        self.assertContains(response, "36.7%")
+        self.assertContains(response, "1 line(s) for products not yet purchased")
+
+
+class StockLedgerTestCase(TestCase):
+
+    def setUp(self):
+        self.laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.mouse = Product.objects.create(name="Mouse", sku="MOU1", unit_price=20.00)
+        self.order = PurchaseOrder.objects.create(vendor="Acme", status="pending")
+        PurchaseOrderLineItem.objects.create(purchase_order=self.order, product=self.laptop, quantity=10, cost=6000.00)
+        PurchaseOrderLineItem.objects.create(purchase_order=self.order, product=self.mouse, quantity=5, cost=50.00)
+
+    def on_hand(self):
+        from ecommerce_app.models import StockLevel
+        return dict(StockLevel.objects.values_list("product__sku", "on_hand"))
+
+    def test_completing_purchase_order_receives_stock_once(self):
+        """Test that stock arrives when an order is completed, and only once."""
+        self.assertEqual(self.on_hand(), {})
+        order = PurchaseOrder.objects.get(pk=self.order.pk)
+        order.status = "completed"
+        order.save()
+        order.save()
+        PurchaseOrder.objects.get(pk=self.order.pk).save()
+        self.assertEqual(self.on_hand(), {"LAP123": 10, "MOU1": 5})
+        PurchaseOrderLineItem.objects.create(purchase_order=order, product=self.mouse, quantity=2, cost=20.00)
+        self.assertEqual(self.on_hand(), {"LAP123": 10, "MOU1": 7})
+
+    def test_invoice_lines_take_stock(self):
+        """Test that invoice lines are taken out of stock, with edits and deletes recorded as adjustments."""
+        from ecommerce_app.models import StockMovement
+        invoice = Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        line = InvoiceLineItem.objects.create(invoice=invoice, product=self.laptop, quantity=3, price_each=1000.00)
+        line.quantity = 4
+        line.save()
+        self.assertEqual(self.on_hand(), {"LAP123": -4})
+        self.assertEqual(
+            list(StockMovement.objects.order_by("pk").values_list("kind", "quantity", "source_type", "source_id")),
+            [("sale", -3, "invoice_line", line.pk), ("adjustment", -1, "invoice_line", line.pk)],
+        )
+        line = InvoiceLineItem.objects.get(pk=line.pk)
+        line.product = self.mouse
+        line.save()
+        self.assertEqual(self.on_hand(), {"LAP123": 0, "MOU1": -4})
+        line.delete()
+        self.assertEqual(self.on_hand(), {"LAP123": 0, "MOU1": 0})
+        InvoiceLineItem.objects.create(invoice=invoice, product=self.laptop, quantity=2, price_each=1000.00)
+        invoice.delete()
+        self.assertEqual(self.on_hand(), {"LAP123": 0, "MOU1": 0})
+
+    def test_purchase_order_edits_and_reopening(self):
+        """Test that edits to received lines adjust stock, and that reopening an order takes its stock back out."""
+        from django.core.management import call_command
+        from io import StringIO
+        from ecommerce_app.models import StockMovement
+        order = PurchaseOrder.objects.get(pk=self.order.pk)
+        pending_line = order.line_items.get(product=self.mouse)
+        pending_line.quantity = 6
+        pending_line.save()
+        self.assertEqual(self.on_hand(), {})
+        order.status = "completed"
+        order.save()
+        self.assertEqual(self.on_hand(), {"LAP123": 10, "MOU1": 6})
+        line = order.line_items.get(product=self.laptop)
+        line.quantity = 12
+        line.save()
+        self.assertEqual(
+            list(StockMovement.objects.filter(kind="adjustment").values_list("source_type", "source_id", "quantity")),
+            [("purchase_order_line", line.pk, 2)],
+        )
+        order.line_items.get(product=self.mouse).delete()
+        self.assertEqual(self.on_hand(), {"LAP123": 12, "MOU1": 0})
+        order.status = "pending"
+        order.save()
+        self.assertEqual(self.on_hand(), {"LAP123": 0, "MOU1": 0})
+        order.status = "completed"
+        order.save()
+        self.assertEqual(self.on_hand(), {"LAP123": 12, "MOU1": 0})
+        out = StringIO()
+        call_command("rebuild_stock", stdout=out)
+        self.assertIn("0 drifted", out.getvalue())
+        order.delete()
+        self.assertEqual(self.on_hand(), {"LAP123": 0, "MOU1": 0})
+
+    def test_bulk_orders_and_low_stock(self):
+        """Test bulk-created orders move stock, and the low-stock listing."""
+        from ecommerce_app.bulk import bulk_create_orders
+        from ecommerce_app.models import StockLevel
+        bulk_create_orders("purchase_order", [
+            (PurchaseOrder(vendor="Acme", status="completed"),
+             [PurchaseOrderLineItem(product=self.laptop, quantity=50, cost=1.00)]),
+            (PurchaseOrder(vendor="Acme", status="pending"),
+             [PurchaseOrderLineItem(product=self.mouse, quantity=50, cost=1.00)]),
+        ])
+        bulk_create_orders("invoice", [
+            (Invoice(customer_name="John Doe", due_date=now().date()),
+             [InvoiceLineItem(product=self.laptop, quantity=45, price_each=1.00),
+              InvoiceLineItem(product=self.mouse, quantity=1, price_each=1.00)]),
+        ])
+        self.assertEqual(self.on_hand(), {"LAP123": 5, "MOU1": -1})
+        with self.assertNumQueries(1):
+            low = [(level.product.sku, level.on_hand) for level in StockLevel.objects.low_stock(threshold=5)]
+        self.assertEqual(low, [("MOU1", -1), ("LAP123", 5)])
+
+    def test_rebuild_stock(self):
+        """Test that rebuild_stock backfills the ledger and repairs drifted levels."""
+        from django.core.management import call_command
+        from io import StringIO
+        from ecommerce_app.models import StockLevel, StockMovement
+        PurchaseOrder.objects.filter(pk=self.order.pk).update(status="completed")  # Bypasses the signals
+        StockLevel.objects.create(product=self.mouse, on_hand=99)
+        out = StringIO()
+        call_command("rebuild_stock", "--dry-run", stdout=out)
+        self.assertIn("1 drifted", out.getvalue())
+        self.assertEqual(self.on_hand(), {"MOU1": 99})
+        call_command("rebuild_stock", "--backfill", stdout=out)
+        self.assertEqual(self.on_hand(), {"LAP123": 10, "MOU1": 5})
+        self.assertEqual(StockMovement.objects.count(), 2)
+        call_command("rebuild_stock", stdout=out)
+        self.assertIn("checked 2 products, 0 drifted", out.getvalue())
+
+
+class ReplicaRoutingTestCase(TestCase):
+
+    def setUp(self):
+        from django.http import HttpResponse
+        from ecommerce_app.routers import PrimaryReplicaRouter
+        self.router = PrimaryReplicaRouter()
+        self.seen = []
+
+        def view(request):
+            self.seen.append(self.router.db_for_read(Product))
+            if request.method == "POST" or "write" in request.GET:
+                self.seen.append(self.router.db_for_write(Product))
+                self.seen.append(self.router.db_for_read(Product))
+            return HttpResponse()
+
+        self.view = view
+
+    def request(self, method="get", data=None, cookies=None):
+        from django.test import RequestFactory
+        from ecommerce_app.middleware import ReplicaRoutingMiddleware
+        request = getattr(RequestFactory(), method)("/", data or {})
+        request.COOKIES.update(cookies or {})
+        self.seen = []
+        return ReplicaRoutingMiddleware(self.view)(request)
+
+    def test_reads_use_primary_without_replica(self):
+        """Test that everything goes to the primary when no replica is configured."""
+        self.request()
+        self.assertEqual(self.seen, ["default"])
+
+    def test_read_only_requests_read_from_replica(self):
+        """Test GET requests read from the replica and other requests and code outside requests don't."""
+        with self.settings(DATABASE_REPLICA="replica"):
+            response = self.request()
+            self.assertEqual(self.seen, ["replica"])
+            self.assertNotIn("pin_primary", response.cookies)
+            self.request("post")
+            self.assertEqual(self.seen, ["default", "default", "default"])
+            self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_writes_pin_to_primary(self):
+        """Test a request reads its own writes and pins the client to the primary for a while."""
+        with self.settings(DATABASE_REPLICA="replica"):
+            response = self.request(data={"write": "1"})
+            self.assertEqual(self.seen, ["replica", "default", "default"])
+            self.assertEqual(response.cookies["pin_primary"]["max-age"], 5)
+            self.request(cookies={"pin_primary": "1"})
+            self.assertEqual(self.seen, ["default"])
+
+    def test_streaming_response_keeps_routing(self):
+        """Test that reads made while a streaming response is consumed still go to the replica."""
+        from django.http import StreamingHttpResponse
+        from django.test import RequestFactory
+        from ecommerce_app.middleware import ReplicaRoutingMiddleware
+
+        def rows():
+            yield self.router.db_for_read(Product)
+
+        with self.settings(DATABASE_REPLICA="replica"):
+            response = ReplicaRoutingMiddleware(lambda request: StreamingHttpResponse(rows()))(RequestFactory().get("/"))
+            self.assertEqual(b"".join(response.streaming_content), b"replica")
+
+
+class StartupTestCase(AdminTestCase):
+
+    def test_startup_skips_export_dependencies(self):
+        """Test a cold django.setup() stays within budget and leaves spreadsheet and analysis packages unloaded."""
+        from django.conf import settings
+        from ecommerce_app.profiling import measure_startup
+        seconds, modules, imports = measure_startup()
+        self.assertFalse({"openpyxl", "tablib", "import_export.admin", "pandas", "numpy"} & set(modules))
+        # Best of a few runs, so a busy machine doesn't fail the test.
+        if seconds > settings.STARTUP_TIME_BUDGET:
+            seconds = min(seconds, *(measure_startup()[0] for _ in range(2)))
+        self.assertLessEqual(seconds, settings.STARTUP_TIME_BUDGET)
+
+    def test_admin_export_loads_on_first_use(self):
+        """Test the invoice changelist links to the export page, which still works."""
+        Invoice.objects.create(customer_name="John Doe", due_date=now().date())
+        response = self.client.get("/admin/ecommerce_app/invoice/?status__exact=unpaid")
+        self.assertContains(response, 'href="/admin/ecommerce_app/invoice/export/?status__exact=unpaid"')
+        response = self.client.get("/admin/ecommerce_app/invoice/export/")
+        self.assertContains(response, "Format")
+        response = self.client.post("/admin/ecommerce_app/invoice/export/", {
+            "format": "0", "invoiceresource_customer_name": "on", "resource": "0",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"John Doe", response.content)
+
+
+class ArchiveTestCase(AdminTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = now().date()
+        self.old = self.today - timedelta(days=3 * 365)
+        self.laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        self.paid = self.invoice("Old Customer", self.old, "paid", quantity=2)
+        self.unpaid = self.invoice("Old Customer", self.old, "unpaid", quantity=1)
+        self.recent = self.invoice("New Customer", self.today, "paid", quantity=3)
+        self.completed = PurchaseOrder.objects.create(vendor="Acme", order_date=self.old, status="completed")
+        PurchaseOrderLineItem.objects.create(purchase_order=self.completed, product=self.laptop, quantity=5, cost=3000.00)
+        self.pending = PurchaseOrder.objects.create(vendor="Acme", order_date=self.old, status="pending")
+
+    def invoice(self, customer_name, invoice_date, status, quantity):
+        invoice = Invoice.objects.create(
+            customer_name=customer_name, invoice_date=invoice_date, due_date=invoice_date, status=status
+        )
+        InvoiceLineItem.objects.create(invoice=invoice, product=self.laptop, quantity=quantity, price_each=1000.00)
+        return invoice
+
+    def archive(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command("archive_orders", *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_settled_old_orders_with_line_items(self):
+        """Test only paid or completed orders past the cutoff are moved, keeping IDs and totals."""
+        from ecommerce_app.models import ArchivedInvoice, ArchivedPurchaseOrder
+        self.assertIn("invoices: 1 dated before", self.archive("--dry-run"))
+        output = self.archive("--batch-size", "1")
+        self.assertIn("invoices: archived 1 with 1 line items", output)
+        self.assertIn("purchase_orders: archived 1 with 1 line items", output)
+        self.assertEqual(set(Invoice.objects.values_list("pk", flat=True)), {self.unpaid.pk, self.recent.pk})
+        self.assertEqual(set(PurchaseOrder.objects.values_list("pk", flat=True)), {self.pending.pk})
+        archived = ArchivedInvoice.objects.get()
+        self.assertEqual((archived.pk, archived.total, archived.line_count), (self.paid.pk, Decimal("2000.00"), 1))
+        self.assertEqual(list(archived.line_items.values_list("quantity", flat=True)), [2])
+        self.assertEqual(ArchivedPurchaseOrder.objects.get().line_items.get().cost, Decimal("3000.00"))
+        self.assertFalse(InvoiceLineItem.objects.filter(invoice_id=self.paid.pk).exists())
+        self.assertIn("archived 0", self.archive())
+
+    def test_including_archived(self):
+        """Test that live and archived rows can be read together, and that search only covers live orders."""
+        from ecommerce_app.search import search
+        self.archive()
+        rows = Invoice.objects.including_archived("id", "total", customer_name="Old Customer").order_by("id")
+        self.assertEqual(
+            list(rows), [{"id": self.paid.pk, "total": Decimal("2000.00")}, {"id": self.unpaid.pk, "total": Decimal("1000.00")}]
+        )
+        self.assertEqual(PurchaseOrder.objects.including_archived("id").count(), 2)
+        self.assertEqual(list(search(Invoice.objects.all(), "old")), [self.unpaid])
+
+    def test_exports_include_archived(self):
+        """Test that the streaming export lists archived orders after live ones, unless left out."""
+        import json
+        self.archive()
+        response = self.client.get("/export/invoices.ndjson")
+        ids = [json.loads(line)["id"] for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(ids, [self.unpaid.pk, self.recent.pk, self.paid.pk])
+        response = self.client.get("/export/invoices.ndjson", {"archived": "0"})
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 2)
+
+    def test_reports_add_archived_rollups(self):
+        """Test that archiving moves revenue from the live rollup to the archived one, and the dashboard adds them up."""
+        from ecommerce_app.models import ArchivedDailyProductSales, DailyProductSales
+        from ecommerce_app.rollups import ROLLUPS, refresh_rollup
+        for name in ROLLUPS:
+            refresh_rollup(name)
+        self.archive()
+        self.assertEqual(DailyProductSales.objects.get(date=self.old).revenue, Decimal("1000.00"))
+        self.assertEqual(ArchivedDailyProductSales.objects.get(date=self.old).revenue, Decimal("2000.00"))
+        response = self.client.get("/admin/sales/", {"start": self.old, "end": self.today})
+        self.assertContains(response, "Revenue: $6000.00 from 6 units")
+        self.assertContains(response, "$3000.00")
+
+
+class ExportShardsTestCase(TestCase):
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from datetime import date
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output, True)
+        laptop = Product.objects.create(name="Laptop", sku="LAP123", unit_price=1000.00)
+        for month, quantity in ((1, 2), (1, 1), (2, 3)):
+            invoice = Invoice.objects.create(
+                customer_name="Customer", invoice_date=date(2023, month, 10), due_date=date(2023, month, 20)
+            )
+            InvoiceLineItem.objects.create(invoice=invoice, product=laptop, quantity=quantity, price_each=1000.00)
+            InvoiceLineItem.objects.create(invoice=invoice, product=laptop, quantity=1, price_each=50.00)
+        Invoice.objects.create(customer_name="No Lines", invoice_date=date(2023, 2, 11), due_date=date(2023, 2, 21))
+
+    def export(self, *args):
+        import json
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        call_command("export_shards", "invoices", "--workers", "1", "--output", self.output, *args, stdout=StringIO())
+        if "--zip" in args:
+            return None
+        with open(os.path.join(self.output, "manifest.json")) as fileobj:
+            return json.load(fileobj)
+
+    def test_pk_shards_with_line_totals_and_checksums(self):
+        """Test that pk shards cover every order once, with line totals, and that the manifest matches the files."""
+        import csv
+        import hashlib
+        import os
+        manifest = self.export("--shards", "2")
+        self.assertEqual(len(manifest["files"]), 2)
+        self.assertEqual(manifest["totals"], {"invoices": {"orders": 4, "rows": 7}})
+        totals = []
+        for entry in manifest["files"]:
+            path = os.path.join(self.output, entry["file"])
+            with open(path, "rb") as fileobj:
+                self.assertEqual(hashlib.sha256(fileobj.read()).hexdigest(), entry["sha256"])
+            with open(path, newline="") as fileobj:
+                rows = list(csv.DictReader(fileobj))
+            self.assertEqual(len(rows), entry["rows"])
+            totals += [Decimal(row["line_line_total"]) for row in rows if row["line_line_total"]]
+        self.assertEqual(sorted(totals), [Decimal("50.00")] * 3 + [Decimal(v) for v in ("1000.00", "2000.00", "3000.00")])
+
+    def test_month_shards_and_date_range(self):
+        """Test one shard per month, limited to the date range."""
+        manifest = self.export("--shard-by", "month", "--date-from", "2023-02-01")
+        self.assertEqual([entry["file"] for entry in manifest["files"]], ["invoices-2023-02.csv"])
+        self.assertEqual((manifest["files"][0]["orders"], manifest["files"][0]["rows"]), (2, 3))
+
+    def test_month_shards_keep_mid_month_bounds(self):
+        """Test that a mid-month date range limits the month shards instead of widening to whole months."""
+        manifest = self.export("--shard-by", "month", "--date-from", "2023-02-11")
+        self.assertEqual(manifest["totals"], {"invoices": {"orders": 1, "rows": 1}})
+        manifest = self.export("--shard-by", "month", "--date-to", "2023-02-10")
+        self.assertEqual(
+            [(entry["file"], entry["orders"]) for entry in manifest["files"]],
+            [("invoices-2023-01.csv", 2), ("invoices-2023-02.csv", 1)],
+        )
+
+    def test_archived_orders_get_their_own_shards(self):
+        """Test that archived orders are exported to separate shards, and left out with --live-only."""
+        from datetime import date
+        from ecommerce_app.archive import archive_orders
+        Invoice.objects.filter(invoice_date__month=1).update(status="paid")
+        archive_orders("invoices", date(2024, 1, 1), 100)
+        manifest = self.export("--shard-by", "month")
+        self.assertEqual(
+            [(entry["file"], entry["orders"]) for entry in manifest["files"]],
+            [("invoices-2023-02.csv", 2), ("invoices-archived-2023-01.csv", 2)],
+        )
+        self.assertEqual(manifest["totals"], {"invoices": {"orders": 4, "rows": 7}})
+        manifest = self.export("--shard-by", "month", "--live-only")
+        self.assertEqual(manifest["totals"], {"invoices": {"orders": 2, "rows": 3}})
+
+    def test_xlsx_zip(self):
+        """Test that --zip merges the XLSX shards and manifest into one archive."""
+        import os
+        import zipfile
+        self.export("--format", "xlsx", "--shard-by", "month", "--zip")
+        with zipfile.ZipFile(f"{self.output}.zip") as archive:
+            self.assertEqual(sorted(archive.namelist()), ["invoices-2023-01.xlsx", "invoices-2023-02.xlsx", "manifest.json"])
+        os.remove(f"{self.output}.zip")
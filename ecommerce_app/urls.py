@@ -1,6 +1,26 @@
-from django.urls import path
-from .views import print_invoice
+from django.conf import settings
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from . import api
+from .views import (
+    aprint_invoice, export_stream, invoice_lookup, print_invoice, print_invoice_batch, product_lookup,
+)
+
+# ASGI deployments serve the read paths with async views (see asgi.py).
+print_view = aprint_invoice if settings.ASYNC_READ_VIEWS else print_invoice
+
+router = DefaultRouter()
+router.register('products', api.ProductViewSet)
+router.register('invoices', api.InvoiceViewSet, basename='invoice')
+router.register('purchase-orders', api.PurchaseOrderViewSet, basename='purchaseorder')
+router.register('invoice-line-items', api.InvoiceLineItemViewSet)
+router.register('purchase-order-line-items', api.PurchaseOrderLineItemViewSet)
 
 urlpatterns = [
-    path('invoice/<int:invoice_id>/print/', print_invoice, name='print_invoice'),
+    path('invoice/<int:invoice_id>/print/', print_view, name='print_invoice'),
+    path('invoice/print/', print_invoice_batch, name='print_invoice_batch'),
+    path('export/<str:kind>.<str:fmt>', export_stream, name='export_stream'),
+    path('lookup/products/', product_lookup, name='product_lookup'),
+    path('lookup/invoices/<int:invoice_id>/', invoice_lookup, name='invoice_lookup'),
+    path('api/', include(router.urls)),
 ]
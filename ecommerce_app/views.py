@@ -1,6 +1,187 @@
-from django.shortcuts import render, get_object_or_404
-from .models import Invoice
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+from .exports import STREAM_EXPORTS, STREAM_FORMATS, export_querysets
+from .models import Invoice, Product
 
+CENTS = Decimal('0.01')
+
+def last_modified_query(invoice_id):
+    """
+    The invoice's ``updated_at`` and the latest ``updated_at`` of the products
+    on it, whose names and SKUs are printed too, in one query.
+    """
+    return Invoice.objects.filter(pk=invoice_id).annotate(
+        products_updated_at=Max('line_items__product__updated_at')
+    ).values_list('updated_at', 'products_updated_at')
+
+def latest(row):
+    return max(value for value in row if value is not None) if row else None
+
+def invoice_last_modified(request, invoice_id):
+    """Return when the invoice or a product on it last changed, looked up once per request."""
+    if not hasattr(request, '_invoice_last_modified'):
+        request._invoice_last_modified = latest(last_modified_query(invoice_id).first())
+    return request._invoice_last_modified
+
+def invoice_etag(request, invoice_id):
+    return etag_for_invoice(invoice_id, invoice_last_modified(request, invoice_id))
+
+def etag_for_invoice(invoice_id, last_modified):
+    if last_modified is None:
+        return None
+    return f"invoice-{invoice_id}-{last_modified.timestamp()}"
+
+def invoice_print_response(html):
+    response = HttpResponse(html)
+    # Browsers keep their copy but revalidate it, which costs a single query.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@condition(etag_func=invoice_etag, last_modified_func=invoice_last_modified)
 def print_invoice(request, invoice_id):
-    invoice = get_object_or_404(Invoice, id=invoice_id)
-    return render(request, 'ecommerce_project/invoice_print.html', {'invoice': invoice})
+    etag = invoice_etag(request, invoice_id)
+    if etag is None:
+        raise Http404("No Invoice matches the given query.")
+    # The key changes whenever the invoice, its line items or their products
+    # do, so stale entries are never served and simply expire.
+    cache_key = f"print:{etag}"
+    html = cache.get(cache_key)
+    if html is None:
+        invoice = get_object_or_404(Invoice.objects.for_printing(), pk=invoice_id)
+        html = render_to_string('ecommerce_project/invoice_print.html', {'invoice': invoice}, request)
+        cache.set(cache_key, html, settings.INVOICE_PRINT_CACHE_TIMEOUT)
+    return invoice_print_response(html)
+
+async def aprint_invoice(request, invoice_id):
+    """Async version of ``print_invoice`` for ASGI deployments.
+
+    The view and the conditional GET handling stay on the event loop. Django's
+    async ORM and cache APIs still run each query in a worker thread.
+    """
+    last_modified = latest(await last_modified_query(invoice_id).afirst())
+    etag = etag_for_invoice(invoice_id, last_modified)
+    if etag is None:
+        raise Http404("No Invoice matches the given query.")
+    not_modified = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=int(last_modified.timestamp())
+    )
+    if not_modified is not None:
+        return not_modified
+    cache_key = f"print:{etag}"
+    html = await cache.aget(cache_key)
+    if html is None:
+        try:
+            invoice = await Invoice.objects.for_printing().aget(pk=invoice_id)
+        except Invoice.DoesNotExist:
+            raise Http404("No Invoice matches the given query.")
+        html = render_to_string('ecommerce_project/invoice_print.html', {'invoice': invoice}, request)
+        await cache.aset(cache_key, html, settings.INVOICE_PRINT_CACHE_TIMEOUT)
+    response = invoice_print_response(html)
+    response.headers['ETag'] = quote_etag(etag)
+    response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+@staff_member_required
+async def product_lookup(request):
+    """Up to 20 products whose SKU or name starts with ``?q=``, as JSON."""
+    q = request.GET.get('q', '').strip()
+    if not q:
+        return JsonResponse({'results': []})
+    products = Product.objects.prefix_search(q).order_by('sku')
+    results = [product async for product in products.values('id', 'sku', 'name', 'unit_price')[:20]]
+    return JsonResponse({'results': results})
+
+@staff_member_required
+async def invoice_lookup(request, invoice_id):
+    """An invoice with its line items and totals, as JSON."""
+    try:
+        invoice = await Invoice.objects.for_printing().aget(pk=invoice_id)
+    except Invoice.DoesNotExist:
+        raise Http404("No Invoice matches the given query.")
+    return JsonResponse({
+        'id': invoice.pk,
+        'customer_name': invoice.customer_name,
+        'invoice_date': invoice.invoice_date,
+        'due_date': invoice.due_date,
+        'status': invoice.status,
+        'total': invoice.total,
+        'line_items': [
+            {
+                'product_id': item.product_id,
+                'sku': item.product.sku,
+                'name': item.product.name,
+                'quantity': item.quantity,
+                'price_each': item.price_each,
+                'line_total': item.line_total.quantize(CENTS),
+            }
+            for item in invoice.line_items.all()
+        ],
+    })
+
+def render_invoice_page(invoice):
+    return mark_safe(render_to_string('ecommerce_project/_invoice_body.html', {'invoice': invoice}))
+
+@staff_member_required
+def print_invoice_batch(request):
+    """Render the invoices in ``?ids=1,2,3`` as one printable document, one invoice per page.
+
+    Line items and products for the whole batch are loaded with two queries.
+    Large batches are rendered on a thread pool; the template does no queries.
+    """
+    try:
+        ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()]
+    except ValueError:
+        return HttpResponseBadRequest("ids must be a comma-separated list of invoice IDs.")
+    if not ids:
+        return HttpResponseBadRequest("No invoice IDs given.")
+    if len(ids) > settings.INVOICE_PRINT_BATCH_MAX:
+        return HttpResponseBadRequest(f"At most {settings.INVOICE_PRINT_BATCH_MAX} invoices can be printed at once.")
+
+    invoices = Invoice.objects.for_printing().in_bulk(ids)
+    invoices = [invoices[pk] for pk in dict.fromkeys(ids) if pk in invoices]
+    if len(invoices) >= settings.INVOICE_PRINT_PARALLEL_THRESHOLD:
+        with ThreadPoolExecutor(max_workers=settings.INVOICE_PRINT_WORKERS) as executor:
+            pages = list(executor.map(render_invoice_page, invoices))
+    else:
+        pages = [render_invoice_page(invoice) for invoice in invoices]
+    html = render_to_string('ecommerce_project/invoice_print_batch.html', {'pages': pages}, request)
+    return HttpResponse(html)
+
+@staff_member_required
+def export_stream(request, kind, fmt):
+    """Stream invoices or purchase orders with their line items as CSV or NDJSON.
+
+    Supports ``date_from``/``date_to`` (inclusive, YYYY-MM-DD) and ``status``
+    filters. Archived orders follow the live ones unless ``archived=0``.
+    """
+    if kind not in STREAM_EXPORTS or fmt not in STREAM_FORMATS:
+        raise Http404("Unknown export.")
+    spec = STREAM_EXPORTS[kind]
+    filters = {}
+
+    for param, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+        if request.GET.get(param):
+            value = parse_date(request.GET[param])
+            if value is None:
+                return HttpResponseBadRequest(f"Invalid {param}, expected YYYY-MM-DD.")
+            filters[f"{spec['date_field']}__{lookup}"] = value
+    if request.GET.get('status'):
+        filters['status'] = request.GET['status']
+    querysets = export_querysets(spec, request.GET.get('archived') != '0', **filters)
+
+    stream, content_type = STREAM_FORMATS[fmt]
+    response = StreamingHttpResponse(stream(spec, querysets), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
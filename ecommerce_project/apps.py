@@ -0,0 +1,18 @@
+from importlib import import_module
+from django.apps import apps
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.utils.module_loading import module_has_submodule
+
+# Apps whose admin module registers nothing and is only needed on first use.
+# import_export.admin loads tablib and openpyxl, a large part of startup time.
+LAZY_ADMIN_APPS = {'import_export'}
+
+
+class AdminConfig(SimpleAdminConfig):
+    """The admin, autodiscovering every app's admin module except LAZY_ADMIN_APPS."""
+
+    def ready(self):
+        super().ready()
+        for app_config in apps.get_app_configs():
+            if app_config.name not in LAZY_ADMIN_APPS and module_has_submodule(app_config.module, 'admin'):
+                import_module(f'{app_config.name}.admin')
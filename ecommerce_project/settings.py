@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,7 +32,8 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # django.contrib.admin, minus import_export's admin module until an export.
+    'ecommerce_project.apps.AdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -39,14 +41,20 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'ecommerce_app',  # Our new app
     'import_export',
+    'rest_framework',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings include the other middleware's queries.
+    'ecommerce_app.middleware.RequestInstrumentationMiddleware',
+    # Before anything that queries, such as the session and auth middleware.
+    'ecommerce_app.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ecommerce_app.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,13 +85,61 @@ WSGI_APPLICATION = 'ecommerce_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+def database_from_env(prefix, default_name):
+    """
+    A DATABASES entry read from ``{prefix}_*`` environment variables.
+
+    ``{prefix}_ENGINE`` is ``sqlite3`` (the default) or ``postgresql``.
+    Connections are kept open for ``DB_CONN_MAX_AGE`` seconds and checked
+    before reuse. SQLite runs in WAL mode so readers don't block the writer.
+    """
+    engine = os.environ.get(f'{prefix}_ENGINE', 'sqlite3')
+    database = {
+        'ENGINE': f'django.db.backends.{engine}',
+        'NAME': os.environ.get(f'{prefix}_NAME', default_name),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
+    if engine == 'sqlite3':
+        database['OPTIONS'] = {
+            # synchronous=NORMAL is safe with WAL; cache_size is in KiB when negative.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA cache_size=-65536',
+            # Take the write lock when a transaction starts rather than failing
+            # with "database is locked" when a reader later tries to write.
+            'transaction_mode': 'IMMEDIATE',
+        }
+    else:
+        database.update({
+            'USER': os.environ.get(f'{prefix}_USER', ''),
+            'PASSWORD': os.environ.get(f'{prefix}_PASSWORD', ''),
+            'HOST': os.environ.get(f'{prefix}_HOST', ''),
+            'PORT': os.environ.get(f'{prefix}_PORT', ''),
+        })
+    return database
+
+
+DATABASES = {
+    'default': database_from_env('DB', BASE_DIR / 'db.sqlite3'),
 }
 
+# Setting DB_REPLICA_NAME (and the other DB_REPLICA_* variables) adds a
+# read replica. Reads in GET requests go there, see ecommerce_app.routers.
+# Locally a copy of the SQLite file will do, refreshed with e.g.
+# sqlite3 db.sqlite3 ".backup db-replica.sqlite3".
+if os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = database_from_env('DB_REPLICA', None)
+    # Tests use the default database for the replica too.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICA = 'replica'
+else:
+    DATABASE_REPLICA = None
+
+DATABASE_ROUTERS = ['ecommerce_app.routers.PrimaryReplicaRouter']
+
+# After a request writes, the client's reads stay on the primary for this
+# many seconds, so a redirect after a save shows the saved data.
+DATABASE_REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -125,3 +181,128 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Async views
+
+# Route the invoice print view to its async version (ASYNC_READ_VIEWS=1).
+# Off by default, ASGI included: benchmarks/asgi_vs_wsgi.py measured it slower
+# than the sync view run in a worker thread.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '') == '1'
+
+
+# Invoice printing
+
+# Seconds a rendered invoice print stays cached. Entries are keyed on the
+# invoice's last change, so this only bounds how long stale ones linger.
+INVOICE_PRINT_CACHE_TIMEOUT = 60 * 60
+
+# Maximum number of invoices in one batch print request.
+INVOICE_PRINT_BATCH_MAX = 500
+
+# Batches of at least this many invoices are rendered on a thread pool.
+INVOICE_PRINT_PARALLEL_THRESHOLD = 50
+INVOICE_PRINT_WORKERS = 4
+
+
+# Admin changelists
+
+# Invoice and purchase order changelists count matching rows only up to this
+# many ("10000+" beyond), and cache the count per filter combination.
+ADMIN_CHANGELIST_COUNT_CAP = 10000
+ADMIN_CHANGELIST_COUNT_CACHE_TIMEOUT = 5 * 60
+
+
+# Product search
+
+# Product prefix searches (admin search and autocomplete) with at most this
+# many matches are cached until a product changes, or for the timeout.
+PRODUCT_SEARCH_CACHE_MAX_RESULTS = 100
+PRODUCT_SEARCH_CACHE_TIMEOUT = 60 * 60
+
+
+# Rollups
+
+# refresh_rollups also rereads orders changed up to this many seconds before
+# its last run, to catch transactions that committed after it started.
+ROLLUP_WATERMARK_OVERLAP = 5 * 60
+
+# Days recomputed per transaction.
+ROLLUP_CHUNK_DAYS = 31
+
+
+# Archival
+
+# archive_orders moves paid invoices and completed or canceled purchase
+# orders dated more than this many days ago to the archive tables.
+ARCHIVE_AFTER_DAYS = 2 * 365
+
+# Orders moved per transaction.
+ARCHIVE_BATCH_SIZE = 1000
+
+
+# Inventory
+
+# Products with at most this many units on hand are listed as low stock.
+LOW_STOCK_THRESHOLD = 10
+
+
+# Background jobs
+
+# Output files of finished jobs, such as exports, are written here.
+JOBS_DIR = BASE_DIR / 'jobs'
+
+# Rows handled per transaction by bulk update jobs, which keeps each write
+# lock short, and between progress updates.
+JOBS_CHUNK_SIZE = 1000
+
+# Seconds an idle run_jobs worker waits before checking for new jobs.
+JOBS_POLL_INTERVAL = 2
+
+# A running job that reports no progress for this many seconds is taken to
+# have lost its worker and is marked failed instead of running forever.
+JOBS_STALE_AFTER = 600
+
+
+# Sharded exports
+
+# export_shards writes each run's shard files and manifest to a timestamped
+# directory under here.
+EXPORTS_DIR = BASE_DIR / 'exports'
+
+
+# Request instrumentation
+
+# Requests at least this slow are kept for the admin's slow request page.
+REQUEST_INSTRUMENTATION_SLOW_MS = 500
+
+# How many slow requests are kept in memory (per process).
+REQUEST_INSTRUMENTATION_BUFFER_SIZE = 100
+
+
+# Profiling
+
+# Fraction of requests profiled with cProfile. Staff can also request a
+# profile with an X-Profile header or a _profile query parameter.
+PROFILING_SAMPLE_RATE = 0.0
+
+# Where captured profiles are saved, and how many of the newest are kept.
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 200
+
+# A cold django.setup(), as run by every manage.py command and worker boot,
+# should take at most this many seconds. See the startup_profile command.
+STARTUP_TIME_BUDGET = 0.8
+
+
+# REST API
+
+# The API is for staff tools and integrations. Its list endpoints use
+# ecommerce_app.api.KeysetPagination so deep pages cost the same as the first.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAdminUser'],
+}
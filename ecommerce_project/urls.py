@@ -16,8 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
+from ecommerce_app import admin_views
 
 urlpatterns = [
+    # Registered ahead of the admin, whose catch-all would otherwise match them.
+    path('admin/slow-requests/', admin.site.admin_view(admin_views.slow_requests), name='slow_requests'),
+    path('admin/profiles/', admin.site.admin_view(admin_views.profiles), name='profiles'),
+    path('admin/profiles/<str:name>/', admin.site.admin_view(admin_views.profile_detail), name='profile_detail'),
+    path('admin/sales/', admin.site.admin_view(admin_views.sales_dashboard), name='sales_dashboard'),
     path('admin/', admin.site.urls),
      path('', include('ecommerce_app.urls')),
 ]